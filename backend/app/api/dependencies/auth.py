@@ -1,9 +1,9 @@
 from typing import Optional
 from fastapi import Depends, HTTPException, status, Request
 import jwt
-from jwt import PyJWKClient
 from pydantic import BaseModel
-from app.settings import Settings, load_settings
+from app.settings import Settings, get_settings
+from app.services.token_verifier import get_claims_cache, get_jwks_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,12 +14,41 @@ class CurrentUser(BaseModel):
     email: Optional[str] = None
 
 
-def get_settings() -> Settings:
-    # Simple non-cached settings loader; FastAPI will reuse in process
-    return load_settings()
+async def _verify_token(token: str, settings: Settings, request: Request) -> Optional[dict]:
+    try:
+        header = jwt.get_unverified_header(token)
+    except Exception:
+        logger.debug("auth_header_decode_failed", extra={"path": request.url.path})
+        return None
+
+    # Local API secret (HS256) tokens
+    if header.get("alg") == "HS256":
+        try:
+            return jwt.decode(token, settings.api_secret_key, algorithms=["HS256"], options={"verify_aud": False})
+        except Exception:
+            logger.debug("auth_hs256_decode_failed", extra={"path": request.url.path})
+            return None
+
+    # Supabase JWT via the shared, background-rotated JWKS (RS256)
+    if not settings.supabase_url:
+        return None
+    jwks = get_jwks_cache(settings.supabase_url.rstrip("/") + "/auth/v1/jwks")
+    try:
+        signing_key = await jwks.get_signing_key(header.get("kid"))
+        if signing_key is None:
+            raise jwt.PyJWKClientError(f"Unable to find a signing key that matches: {header.get('kid')}")
+        return jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=["RS256"],
+            options={"verify_aud": False},  # Supabase uses aud="authenticated"
+        )
+    except Exception as e:
+        logger.warning("auth_rs256_decode_failed", extra={"path": request.url.path, "error": str(e)})
+        return None
 
 
-def get_current_user(
+async def get_current_user(
     request: Request,
     settings: Settings = Depends(get_settings),
 ) -> CurrentUser:
@@ -31,29 +60,13 @@ def get_current_user(
         )
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
     token = auth.split(" ", 1)[1]
-    # First try local API secret (HS256) tokens
-    data = None
-    try:
-        data = jwt.decode(token, settings.api_secret_key, algorithms=["HS256"], options={"verify_aud": False})
-    except Exception:
-        logger.debug("auth_hs256_decode_failed", extra={"path": request.url.path})
-        data = None
-
-    # If HS256 failed, attempt Supabase JWT via JWKs (RS256)
-    if data is None and settings.supabase_url:
-        jwks_url = settings.supabase_url.rstrip("/") + "/auth/v1/jwks"
-        try:
-            jwk_client = PyJWKClient(jwks_url)
-            signing_key = jwk_client.get_signing_key_from_jwt(token)
-            data = jwt.decode(
-                token,
-                signing_key.key,
-                algorithms=["RS256"],
-                options={"verify_aud": False},  # Supabase uses aud="authenticated"
-            )
-        except Exception as e:
-            logger.warning("auth_rs256_decode_failed", extra={"path": request.url.path, "error": str(e)})
-            data = None
+    # Tokens verified before are served from the claims cache until they expire
+    claims_cache = get_claims_cache()
+    data = claims_cache.get(token)
+    if data is None:
+        data = await _verify_token(token, settings, request)
+        if data is not None:
+            claims_cache.put(token, data)
 
     if data is None:
         logger.warning("auth_invalid_token", extra={"path": request.url.path})
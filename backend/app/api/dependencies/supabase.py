@@ -0,0 +1,14 @@
+from typing import Any, Optional
+from fastapi import Depends
+from app.repositories.supabase_client import get_postgrest_client
+from app.settings import Settings, get_settings
+
+
+def get_supabase(settings: Settings = Depends(get_settings)) -> Optional[Any]:
+    """Shared async PostgREST client using the service role key, or the anon key if unset."""
+    return get_postgrest_client(settings.supabase_url, settings.supabase_service_role_key or settings.supabase_anon_key)
+
+
+def get_service_supabase(settings: Settings = Depends(get_settings)) -> Optional[Any]:
+    """Shared async PostgREST client for routes that need the service role key."""
+    return get_postgrest_client(settings.supabase_url, settings.supabase_service_role_key)
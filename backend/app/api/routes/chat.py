@@ -1,7 +1,8 @@
 """
 Chat API routes with mode-based functionality.
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import json
@@ -9,6 +10,7 @@ import re
 import logging
 import hashlib
 import asyncio
+from contextvars import ContextVar
 
 logger = logging.getLogger(__name__)
 
@@ -19,23 +21,21 @@ from app.schemas import MathProblemRequest, MathSolutionResponse
 from app.services.math_solver_service import MathSolverService
 from app.services.lesson_service import LessonService
 from app.services.quiz_service import QuizService
-from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.repositories.cache_repository import get_cache_repository
 
 # Initialize services
-_CACHE = MemoryCacheRepository()
-_lesson_service = LessonService()
+_CACHE = get_cache_repository()
+_lesson_service = LessonService(_CACHE)
 _quiz_service = QuizService()
 
+# Where the current request's lesson came from (cache, stale, store, llm, stub), for X-Content-Source
+_lesson_source: ContextVar[Optional[str]] = ContextVar("lesson_source", default=None)
+
 # Conversation history storage (in-memory for now, could be extended to use Redis or database)
 _conversation_histories: Dict[str, List[Dict[str, str]]] = {}
 
-# Try to import Groq
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    Groq = None
-    GROQ_AVAILABLE = False
+# Shared async Groq gateway
+from app.services.llm_gateway import GROQ_AVAILABLE, chat_completion, get_groq_client, stream_chat_completion
 
 class ChatRequest(BaseModel):
     """Request model for chat messages."""
@@ -87,6 +87,112 @@ def add_to_history(user_id: str, role: str, content: str):
     if len(_conversation_histories[user_id]) > 20:
         _conversation_histories[user_id] = _conversation_histories[user_id][-20:]
 
+def _build_chat_messages(text: str, user_id: str, age: Optional[int] = None) -> List[Dict[str, str]]:
+    """Build the chat-mode prompt, including the user's recent conversation history."""
+    # Get conversation history for context
+    history = get_user_history(user_id)
+    
+    # Create age-appropriate system prompt
+    age_context = ""
+    if age is not None:
+        if age <= 5:
+            age_context = "The user is a young child. Use simple words, short sentences, and be playful."
+        elif age <= 12:
+            age_context = "The user is a child. Use clear explanations, examples, and be encouraging."
+        elif age <= 18:
+            age_context = "The user is a teenager. You can use more complex concepts and be relatable."
+        else:
+            age_context = "The user is an adult. You can use advanced vocabulary and deeper insights."
+    
+    # Personalize based on user's conversation history
+    personalization = ""
+    if history:
+        personalization = "Remember the ongoing conversation with the user and reference previous messages when relevant."
+    
+    system_prompt = f"""You are Lana AI, a friendly and knowledgeable educational assistant. 
+{age_context} {personalization}
+Respond in a conversational, helpful tone. Keep the conversation natural and engaging, like a human tutor would. 
+Do not offer to generate quizzes or structured lessons unless specifically asked.
+Be personalized and remember previous interactions."""
+
+    # Prepare messages with history context
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    # Add conversation history
+    for hist_item in history:
+        messages.append({"role": hist_item["role"], "content": hist_item["content"]})
+    
+    # Add current user message
+    messages.append({"role": "user", "content": text})
+    return messages
+
+def _build_quick_messages(text: str, age: Optional[int] = None) -> List[Dict[str, str]]:
+    """Build the quick-answer prompt tuned for 2-3 sentence replies."""
+    # Create highly targeted age-appropriate system prompt for concise answers
+    if age is not None:
+        if age <= 5:
+            # For young children - very simple language and short answers
+            system_prompt = (
+                "You are Lana, a helpful AI assistant for young children. "
+                "Provide extremely simple, clear answers in just 2-3 short sentence. "
+                "Use basic words a 5-year-old can understand. "
+                "No markdown, no formatting, just plain text. "
+                "Example: 'The sky looks blue because of light.'"
+            )
+        elif age <= 12:
+            # For children - clear explanations in 1-2 sentences
+            system_prompt = (
+                "You are Lana, a helpful AI assistant for children. "
+                "Give clear, simple answers in 2-3 short sentences. "
+                "Use words a child can understand. "
+                "No markdown, no formatting, just plain text. "
+                "Example: 'Plants need sunlight, water, and soil to grow healthy.'"
+            )
+        elif age <= 18:
+            # For teenagers - slightly more detailed but still concise
+            system_prompt = (
+                "You are Lana, a helpful AI assistant for teenagers. "
+                "Provide concise answers in 2-3 sentences. "
+                "Be clear and to the point. "
+                "No markdown, no formatting, just plain text. "
+                "Example: 'Photosynthesis is how plants convert sunlight into energy to grow.'"
+            )
+        else:
+            # For adults - concise but complete explanations
+            system_prompt = (
+                "You are Lana, a helpful AI assistant. "
+                "Give concise, accurate answers in 2-3 sentences. "
+                "Be informative but brief. "
+                "No markdown, no formatting, just plain text. "
+                "Example: 'Quantum computing uses quantum bits (qubits) that can exist in multiple states simultaneously, unlike classical bits.'"
+            )
+    else:
+        # Default concise answer prompt for unknown age
+        system_prompt = (
+            "You are Lana, a helpful AI assistant. "
+            "Provide concise, clear answers in exactly 2-3 sentences. "
+            "Be direct and avoid unnecessary elaboration. "
+            "No markdown, no formatting, just plain text. "
+            "Example: 'The Earth orbits the Sun due to gravitational attraction.'"
+        )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": text}
+    ]
+
+# Completion parameters per mode, shared by the blocking and streaming endpoints
+_CHAT_COMPLETION_PARAMS: Dict[str, Any] = {
+    "temperature": 0.7,
+    "max_tokens": 500,
+}
+_QUICK_COMPLETION_PARAMS: Dict[str, Any] = {
+    "temperature": 0.2,        # Low temperature for consistent, factual responses
+    "max_tokens": 150,         # Strict limit for brevity
+    "top_p": 0.8,              # Moderate diversity
+    "frequency_penalty": 0.3,  # Penalize repetition
+    "presence_penalty": 0.0,   # Neutral on topic exploration
+}
+
 async def structured_lesson_handler(text: str, age: Optional[int] = None, groq_client=None) -> tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]:
     """Handle structured lesson mode - generates full topic walkthrough with quiz."""
     if not text:
@@ -95,6 +201,7 @@ async def structured_lesson_handler(text: str, age: Optional[int] = None, groq_c
     try:
         # Use the centralized lesson service
         lesson, src = await _lesson_service.generate_structured_lesson(text, age, groq_client, "lesson")
+        _lesson_source.set(src)
         
         # Extract quiz if available
         quiz_data = None
@@ -120,12 +227,7 @@ async def maths_tutor_handler(text: str, age: Optional[int] = None, groq_client=
     try:
         # Try to initialize Groq client if not provided and available
         if groq_client is None and GROQ_AVAILABLE:
-            try:
-                from main import settings
-                if settings.groq_api_key:
-                    groq_client = Groq(api_key=settings.groq_api_key)
-            except Exception:
-                pass
+            groq_client = get_groq_client()
         
         # Initialize math solver service
         math_service = MathSolverService(cache_repo=_CACHE, groq_client=groq_client)
@@ -167,57 +269,18 @@ async def chat_handler(text: str, user_id: str, age: Optional[int] = None, groq_
     try:
         # Try to initialize Groq client if not provided and available
         if groq_client is None and GROQ_AVAILABLE:
-            try:
-                from main import settings
-                if settings.groq_api_key:
-                    groq_client = Groq(api_key=settings.groq_api_key)
-            except Exception:
-                pass
+            groq_client = get_groq_client()
         
         if not groq_client:
             return "Chat mode requires the AI service to be configured.", None
         
-        # Get conversation history for context
-        history = get_user_history(user_id)
-        
-        # Create age-appropriate system prompt
-        age_context = ""
-        if age is not None:
-            if age <= 5:
-                age_context = "The user is a young child. Use simple words, short sentences, and be playful."
-            elif age <= 12:
-                age_context = "The user is a child. Use clear explanations, examples, and be encouraging."
-            elif age <= 18:
-                age_context = "The user is a teenager. You can use more complex concepts and be relatable."
-            else:
-                age_context = "The user is an adult. You can use advanced vocabulary and deeper insights."
-        
-        # Personalize based on user's conversation history
-        personalization = ""
-        if history:
-            personalization = "Remember the ongoing conversation with the user and reference previous messages when relevant."
-        
-        system_prompt = f"""You are Lana AI, a friendly and knowledgeable educational assistant. 
-{age_context} {personalization}
-Respond in a conversational, helpful tone. Keep the conversation natural and engaging, like a human tutor would. 
-Do not offer to generate quizzes or structured lessons unless specifically asked.
-Be personalized and remember previous interactions."""
+        messages = _build_chat_messages(text, user_id, age)
 
-        # Prepare messages with history context
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history
-        for hist_item in history:
-            messages.append({"role": hist_item["role"], "content": hist_item["content"]})
-        
-        # Add current user message
-        messages.append({"role": "user", "content": text})
-        
-        response = groq_client.chat.completions.create(
+        response = await chat_completion(
+            groq_client,
             model="llama-3.1-8b-instant",
             messages=messages,
-            temperature=0.7,
-            max_tokens=500
+            **_CHAT_COMPLETION_PARAMS
         )
         
         reply = response.choices[0].message.content
@@ -240,76 +303,17 @@ async def quick_answer_handler(text: str, age: Optional[int] = None, groq_client
     try:
         # Try to initialize Groq client if not provided and available
         if groq_client is None and GROQ_AVAILABLE:
-            try:
-                from main import settings
-                if settings.groq_api_key:
-                    groq_client = Groq(api_key=settings.groq_api_key)
-            except Exception:
-                pass
+            groq_client = get_groq_client()
         
         if not groq_client:
             return "Quick answer mode requires the AI service to be configured.", None
         
-        # Create highly targeted age-appropriate system prompt for concise answers
-        if age is not None:
-            if age <= 5:
-                # For young children - very simple language and short answers
-                system_prompt = (
-                    "You are Lana, a helpful AI assistant for young children. "
-                    "Provide extremely simple, clear answers in just 2-3 short sentence. "
-                    "Use basic words a 5-year-old can understand. "
-                    "No markdown, no formatting, just plain text. "
-                    "Example: 'The sky looks blue because of light.'"
-                )
-            elif age <= 12:
-                # For children - clear explanations in 1-2 sentences
-                system_prompt = (
-                    "You are Lana, a helpful AI assistant for children. "
-                    "Give clear, simple answers in 2-3 short sentences. "
-                    "Use words a child can understand. "
-                    "No markdown, no formatting, just plain text. "
-                    "Example: 'Plants need sunlight, water, and soil to grow healthy.'"
-                )
-            elif age <= 18:
-                # For teenagers - slightly more detailed but still concise
-                system_prompt = (
-                    "You are Lana, a helpful AI assistant for teenagers. "
-                    "Provide concise answers in 2-3 sentences. "
-                    "Be clear and to the point. "
-                    "No markdown, no formatting, just plain text. "
-                    "Example: 'Photosynthesis is how plants convert sunlight into energy to grow.'"
-                )
-            else:
-                # For adults - concise but complete explanations
-                system_prompt = (
-                    "You are Lana, a helpful AI assistant. "
-                    "Give concise, accurate answers in 2-3 sentences. "
-                    "Be informative but brief. "
-                    "No markdown, no formatting, just plain text. "
-                    "Example: 'Quantum computing uses quantum bits (qubits) that can exist in multiple states simultaneously, unlike classical bits.'"
-                )
-        else:
-            # Default concise answer prompt for unknown age
-            system_prompt = (
-                "You are Lana, a helpful AI assistant. "
-                "Provide concise, clear answers in exactly 2-3 sentences. "
-                "Be direct and avoid unnecessary elaboration. "
-                "No markdown, no formatting, just plain text. "
-                "Example: 'The Earth orbits the Sun due to gravitational attraction.'"
-            )
-        
         # Configure for ultra-concise responses
-        response = groq_client.chat.completions.create(
+        response = await chat_completion(
+            groq_client,
             model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
-            ],
-            temperature=0.2,      # Low temperature for consistent, factual responses
-            max_tokens=150,        # Strict limit for brevity
-            top_p=0.8,            # Moderate diversity
-            frequency_penalty=0.3, # Penalize repetition
-            presence_penalty=0.0   # Neutral on topic exploration
+            messages=_build_quick_messages(text, age),
+            **_QUICK_COMPLETION_PARAMS
         )
         
         reply = response.choices[0].message.content
@@ -327,24 +331,28 @@ MODE_MAP = {
     "lesson": structured_lesson_handler
 }
 
+def _resolve_groq_client():
+    """Return the app-level Groq client, falling back to the shared gateway client."""
+    # Import Groq client here to avoid circular imports
+    try:
+        from main import _GROQ_CLIENT
+    except ImportError:
+        _GROQ_CLIENT = None
+    
+    # If _GROQ_CLIENT is None, try to initialize it
+    if _GROQ_CLIENT is None and GROQ_AVAILABLE:
+        _GROQ_CLIENT = get_groq_client()
+    return _GROQ_CLIENT
+
+def _sse(payload: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
 @router.post("/", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, response: Response = None):
     """Unified chat endpoint that handles different modes based on user input."""
     try:
-        # Import Groq client here to avoid circular imports
-        try:
-            from main import _GROQ_CLIENT
-        except ImportError:
-            _GROQ_CLIENT = None
-        
-        # If _GROQ_CLIENT is None, try to initialize it
-        if _GROQ_CLIENT is None and GROQ_AVAILABLE:
-            try:
-                from main import settings
-                if settings.groq_api_key:
-                    _GROQ_CLIENT = Groq(api_key=settings.groq_api_key)
-            except Exception as e:
-                logger.warning(f"Could not initialize Groq client in chat endpoint: {e}")
+        _GROQ_CLIENT = _resolve_groq_client()
         
         # Extract mode and clean text from message
         mode, clean_text = extract_mode(request.message)
@@ -377,6 +385,9 @@ async def chat_endpoint(request: ChatRequest):
         if mode == "lesson" and isinstance(reply, dict):
             # For lesson mode, return the structured lesson as JSON
             formatted_reply = json.dumps(reply)
+            source = _lesson_source.get()
+            if response is not None and source:
+                response.headers["X-Content-Source"] = source
         elif mode == "maths" and isinstance(reply, dict):
             # For maths mode, return the solution as JSON
             formatted_reply = json.dumps(reply)
@@ -394,3 +405,68 @@ async def chat_endpoint(request: ChatRequest):
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+# Modes whose replies can be streamed token by token
+_STREAMING_MODES = {
+    "chat": ("Sorry, I'm having trouble chatting right now. Please try again.", _CHAT_COMPLETION_PARAMS),
+    "quick": ("Sorry, I couldn't provide a quick answer right now. Please try again.", _QUICK_COMPLETION_PARAMS),
+}
+
+@router.post("/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream chat and quick-mode replies as SSE `token` events followed by `done`.
+
+    Other modes, and requests that cannot be streamed, are answered by the regular
+    chat endpoint and delivered as a single `done` event.
+    """
+    groq_client = _resolve_groq_client()
+    mode, clean_text = extract_mode(request.message)
+    if mode not in MODE_MAP:
+        logger.warning(f"Unrecognized mode '{mode}' provided, defaulting to chat mode")
+        mode = "chat"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    if mode not in _STREAMING_MODES or not clean_text or groq_client is None:
+        async def single_event():
+            try:
+                result = await chat_endpoint(request)
+                yield _sse({"type": "done", **result.model_dump()})
+            except HTTPException as e:
+                yield _sse({"type": "error", "message": e.detail})
+        return StreamingResponse(single_event(), media_type="text/event-stream", headers=headers)
+
+    error_reply, params = _STREAMING_MODES[mode]
+    if mode == "chat":
+        messages = _build_chat_messages(clean_text, request.user_id, request.age)
+    else:
+        messages = _build_quick_messages(clean_text, request.age)
+    logger.info(f"Streaming mode: {mode} for message: {request.message[:50]}... User ID: {request.user_id}")
+
+    async def event_generator():
+        parts: List[str] = []
+        try:
+            async for delta in stream_chat_completion(
+                groq_client,
+                model="llama-3.1-8b-instant",
+                messages=messages,
+                **params
+            ):
+                parts.append(delta)
+                yield _sse({"type": "token", "content": delta})
+        except Exception as e:
+            logger.error(f"Error streaming {mode} reply after {len(parts)} tokens: {e}")
+            # A reply cut off mid-stream is reported as failed and kept out of the history
+            partial = "".join(parts)
+            yield _sse({"type": "done", "mode": mode, "reply": partial or error_reply, "quiz": None, "error": str(e)})
+            return
+
+        reply = "".join(parts)
+        # Record the completed exchange so follow-up chat turns keep their context
+        if mode == "chat" and reply:
+            add_to_history(request.user_id, "user", clean_text)
+            add_to_history(request.user_id, "assistant", reply)
+        logger.info(f"Streamed response for mode: {mode}, reply length: {len(reply)}")
+        yield _sse({"type": "done", "mode": mode, "reply": reply or error_reply, "quiz": None})
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
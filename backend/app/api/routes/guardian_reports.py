@@ -1,9 +1,9 @@
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from app.services.guardian_reports_service import GuardianReportsService
-from app.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+from app.api.dependencies.supabase import get_service_supabase
 
 
 router = APIRouter()
@@ -38,12 +38,13 @@ class GuardianReportGenerationResponse(BaseModel):
 @router.post("/guardian-reports/generate", response_model=GuardianReportGenerationResponse, tags=["guardian-reports"])
 async def generate_guardian_report(
     child_uid: str = Query(..., description="Child user ID to generate report for"),
-    report_type: str = Query("weekly", description="Type of report: 'weekly' or 'monthly'")
+    report_type: str = Query("weekly", description="Type of report: 'weekly' or 'monthly'"),
+    client: Any = Depends(get_service_supabase),
 ):
     """
     Generate a guardian report for a specific child.
     """
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+    if client is None:
         raise HTTPException(status_code=500, detail="Supabase configuration not found")
     
     if report_type not in ['weekly', 'monthly']:
@@ -51,7 +52,7 @@ async def generate_guardian_report(
     
     try:
         # Initialize guardian reports service
-        guardian_reports_service = GuardianReportsService(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        guardian_reports_service = GuardianReportsService(client)
         
         # Generate the report
         report_payload = await guardian_reports_service.generate_guardian_report(child_uid, report_type)
@@ -96,17 +97,18 @@ async def get_guardian_reports(
     child_uid: Optional[str] = Query(None, description="Filter by child user ID"),
     guardian_email: Optional[str] = Query(None, description="Filter by guardian email"),
     report_type: Optional[str] = Query(None, description="Filter by report type: 'weekly' or 'monthly'"),
-    sent: Optional[bool] = Query(None, description="Filter by sent status")
+    sent: Optional[bool] = Query(None, description="Filter by sent status"),
+    client: Any = Depends(get_service_supabase),
 ):
     """
     Get guardian reports with optional filters.
     """
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+    if client is None:
         raise HTTPException(status_code=500, detail="Supabase configuration not found")
     
     try:
         # Initialize guardian reports service
-        guardian_reports_service = GuardianReportsService(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        guardian_reports_service = GuardianReportsService(client)
         
         # Build query based on filters
         query = guardian_reports_service.client.table("guardian_reports").select("*")
@@ -120,7 +122,7 @@ async def get_guardian_reports(
         if sent is not None:
             query = query.eq("sent", sent)
         
-        result = query.order("created_at", desc=True).execute()
+        result = await query.order("created_at", desc=True).execute()
         
         return {"reports": result.data or [], "count": len(result.data or [])}
     
@@ -130,12 +132,13 @@ async def get_guardian_reports(
 
 @router.post("/guardian-reports/batch-generate", tags=["guardian-reports"])
 async def batch_generate_guardian_reports(
-    report_type: str = Query(..., description="Type of report: 'weekly' or 'monthly'")
+    report_type: str = Query(..., description="Type of report: 'weekly' or 'monthly'"),
+    client: Any = Depends(get_service_supabase),
 ):
     """
     Batch generate guardian reports for all eligible guardians.
     """
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+    if client is None:
         raise HTTPException(status_code=500, detail="Supabase configuration not found")
     
     if report_type not in ['weekly', 'monthly']:
@@ -143,7 +146,7 @@ async def batch_generate_guardian_reports(
     
     try:
         # Initialize guardian reports service
-        guardian_reports_service = GuardianReportsService(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        guardian_reports_service = GuardianReportsService(client)
         
         # Get all guardians who want this report type
         guardians = await guardian_reports_service.get_guardians_for_report(report_type)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
 from typing import List
-from app.api.dependencies.auth import get_current_user, CurrentUser, get_settings
+from app.api.dependencies.auth import get_current_user, CurrentUser
+from app.api.dependencies.supabase import get_supabase
 from app.repositories.history_repository import HistoryRepository
 from app.services.history_service import HistoryService, ForbiddenError, NotFoundError
 
@@ -16,8 +17,8 @@ class ChatMessage(BaseModel):
     content: str
 
 
-def get_history_service(settings = Depends(get_settings)) -> HistoryService:
-    repo = HistoryRepository(settings)
+def get_history_service(client = Depends(get_supabase)) -> HistoryService:
+    repo = HistoryRepository(client=client)
     return HistoryService(repo)
 
 
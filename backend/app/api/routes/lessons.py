@@ -2,25 +2,22 @@
 Lessons API routes.
 """
 from fastapi import APIRouter, Depends, HTTPException, Query  # type: ignore
-from typing import List
+from typing import Any, List, Optional
 from app.services.lesson_service import LessonService
 from app.repositories.interfaces import ILessonRepository
-from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.repositories.cache_repository import get_cache_repository
 from app.repositories.memory_lesson_repository import MemoryLessonRepository
 from app.repositories.supabase_repository import SupabaseRepository
-from app.config import SUPABASE_URL, SUPABASE_KEY
+from app.api.dependencies.supabase import get_supabase
 
 router = APIRouter()
 
 # Dependency provider for LessonService
-def get_lesson_service() -> LessonService:
-    cache = MemoryCacheRepository()
+def get_lesson_service(client: Optional[Any] = Depends(get_supabase)) -> LessonService:
+    cache = get_cache_repository()
     repo: ILessonRepository
-    if SUPABASE_URL and SUPABASE_KEY:
-        try:
-            repo = SupabaseRepository(SUPABASE_URL, SUPABASE_KEY)
-        except Exception:
-            repo = MemoryLessonRepository()
+    if client is not None:
+        repo = SupabaseRepository(client=client)
     else:
         repo = MemoryLessonRepository()
     return LessonService(cache_repository=cache, lesson_repository=repo)
@@ -4,16 +4,16 @@ Math Solver API routes.
 from fastapi import APIRouter, HTTPException, Depends
 from app.schemas import MathProblemRequest, MathSolutionResponse
 from app.services.math_solver_service import MathSolverService
-from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.repositories.cache_repository import get_cache_repository
 from app.settings import load_settings
-from groq import Groq
+from app.services.llm_gateway import get_groq_client
 
 router = APIRouter()
 
 # Initialize shared cache and Groq client once per process
 _settings = load_settings()
-_CACHE = MemoryCacheRepository()
-_GROQ = Groq(api_key=_settings.groq_api_key) if _settings.groq_api_key else None
+_CACHE = get_cache_repository()
+_GROQ = get_groq_client(_settings.groq_api_key)
 
 # Dependency provider for MathSolverService using shared singletons
 def get_math_solver_service() -> MathSolverService:
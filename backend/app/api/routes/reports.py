@@ -1,9 +1,9 @@
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from app.services.reports_service import ReportsService
-from app.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+from app.api.dependencies.supabase import get_service_supabase
 
 
 router = APIRouter()
@@ -25,14 +25,15 @@ class ReportResponse(BaseModel):
 @router.get("/reports/weekly", response_model=ReportResponse, tags=["reports"])
 async def get_weekly_report(
     user_id: str = Query(..., description="User ID to generate report for"),
-    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format")
+    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"),
+    client: Any = Depends(get_service_supabase),
 ):
     """
     Generate a weekly report for a user.
     
     If no start_date is provided, it will default to the start of the current week (Monday).
     """
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+    if client is None:
         raise HTTPException(status_code=500, detail="Supabase configuration not found")
     
     try:
@@ -45,7 +46,7 @@ async def get_weekly_report(
                 raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
         
         # Initialize reports service
-        reports_service = ReportsService(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        reports_service = ReportsService(client)
         
         # Generate the report
         report = await reports_service.get_weekly_report(user_id, start_datetime)
@@ -61,14 +62,15 @@ async def get_weekly_report(
 @router.get("/reports/monthly", response_model=ReportResponse, tags=["reports"])
 async def get_monthly_report(
     user_id: str = Query(..., description="User ID to generate report for"),
-    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format")
+    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format"),
+    client: Any = Depends(get_service_supabase),
 ):
     """
     Generate a monthly report for a user.
     
     If no start_date is provided, it will default to the start of the current month.
     """
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+    if client is None:
         raise HTTPException(status_code=500, detail="Supabase configuration not found")
     
     try:
@@ -81,7 +83,7 @@ async def get_monthly_report(
                 raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
         
         # Initialize reports service
-        reports_service = ReportsService(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        reports_service = ReportsService(client)
         
         # Generate the report
         report = await reports_service.get_monthly_report(user_id, start_datetime)
@@ -99,12 +101,13 @@ async def generate_custom_report(
     user_id: str,
     report_type: str = Query(..., description="Type of report: 'weekly' or 'monthly'"),
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
-    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format (optional)")
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format (optional)"),
+    client: Any = Depends(get_service_supabase),
 ):
     """
     Generate a custom report for a specific date range.
     """
-    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+    if client is None:
         raise HTTPException(status_code=500, detail="Supabase configuration not found")
     
     try:
@@ -119,7 +122,7 @@ async def generate_custom_report(
             raise HTTPException(status_code=400, detail="Invalid start date format. Use YYYY-MM-DD.")
         
         # Initialize reports service
-        reports_service = ReportsService(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+        reports_service = ReportsService(client)
         
         # Generate the appropriate report
         if report_type == 'weekly':
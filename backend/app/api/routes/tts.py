@@ -4,11 +4,11 @@ Text-to-Speech API routes.
 import logging
 from fastapi import APIRouter, HTTPException, Request
 from app.schemas import TTSRequest, TTSResponse, StructuredLessonTTSRequest
-from app.services.tts_service import TTSService
+from app.services.tts_service import get_tts_service
 import base64
 import io
 import wave
-from typing import Optional
+from typing import List, Optional, Tuple
 from fastapi.responses import StreamingResponse
 from app.config import TTS_CHUNK_SIZE
 from app.middleware.rate_limit_middleware import RateLimitMiddleware
@@ -16,7 +16,7 @@ from app.middleware.rate_limit_middleware import RateLimitMiddleware
 router = APIRouter()
 
 # Create a singleton TTSService so its cache/client are reused across requests
-_TTS_SERVICE = TTSService()
+_TTS_SERVICE = get_tts_service()
 rate_limiter = RateLimitMiddleware(None)
 
 def _get_tts_service():
@@ -25,8 +25,24 @@ def _get_tts_service():
 
 def _extract_lesson_text(lesson: dict, mode: str = "full", section_index: Optional[int] = None) -> str:
     """Extract text from structured lesson based on mode. Quiz data is intentionally excluded from TTS generation."""
+    # Join all texts with appropriate spacing
+    return "\n\n".join(_extract_lesson_blocks(lesson, mode, section_index))
+
+
+def _lesson_speech(request: StructuredLessonTTSRequest) -> Tuple[List[str], str]:
+    """Text blocks and voice that /lesson synthesizes for a request.
+
+    Prefetching goes through here too, so its audio lands under the cache key
+    the endpoint looks up.
+    """
+    # Default to 'leda' voice when not provided
+    return _extract_lesson_blocks(request.lesson, request.mode, request.section_index), request.voice or "leda"
+
+
+def _extract_lesson_blocks(lesson: dict, mode: str = "full", section_index: Optional[int] = None) -> List[str]:
+    """Extract the introduction and section title/content blocks to read for a mode."""
     if not lesson:
-        return ""
+        return []
     
     texts = []
     
@@ -60,8 +76,7 @@ def _extract_lesson_text(lesson: dict, mode: str = "full", section_index: Option
                 if section.get("content"):
                     texts.append(section["content"])
     
-    # Join all texts with appropriate spacing
-    return "\n\n".join(texts)
+    return texts
 
 # Main TTS endpoint used by frontend - Convert text to speech and return audio/wav as streaming response.
 @router.post("/")
@@ -76,16 +91,11 @@ async def synthesize_wav(request: TTSRequest, http_request: Request):
     tts_service = _get_tts_service()
     try:
         # Default to 'leda' voice when not provided
-        audio_bytes = await tts_service.generate_speech(request.text, request.voice or "leda")
-
-        async def chunker():
-            # Increased chunk size for faster streaming
-            chunk_size = TTS_CHUNK_SIZE  # Configurable chunk size
-            for i in range(0, len(audio_bytes), chunk_size):
-                yield audio_bytes[i:i + chunk_size]
+        # Cache hits stream from memory or a memory-mapped file without copying the whole blob
+        audio_stream = await tts_service.open_speech_stream(request.text, request.voice or "leda", TTS_CHUNK_SIZE)
 
         return StreamingResponse(
-            chunker(),
+            audio_stream,
             media_type="audio/wav",
             headers={
                 "Cache-Control": "no-store",
@@ -116,24 +126,23 @@ async def synthesize_lesson_wav(request: StructuredLessonTTSRequest, http_reques
         raise HTTPException(status_code=400, detail="Lesson content cannot be empty")
 
     # Extract text from lesson based on mode
-    text = _extract_lesson_text(request.lesson, request.mode, request.section_index)
+    blocks, voice = _lesson_speech(request)
+    text = "\n\n".join(blocks)
     
     if not text.strip():
         raise HTTPException(status_code=400, detail="No text content found in lesson")
 
     tts_service = _get_tts_service()
     try:
-        # Default to 'leda' voice when not provided
-        audio_bytes = await tts_service.generate_speech(text, request.voice or "leda")
-
-        async def chunker():
-            # Increased chunk size for faster streaming
-            chunk_size = TTS_CHUNK_SIZE  # Configurable chunk size
-            for i in range(0, len(audio_bytes), chunk_size):
-                yield audio_bytes[i:i + chunk_size]
+        if request.pipelined:
+            # Sentence chunks are synthesized concurrently and streamed in order
+            audio_stream = await tts_service.open_pipelined_stream(blocks, voice)
+        else:
+            # Cache hits stream from memory or a memory-mapped file without copying the whole blob
+            audio_stream = await tts_service.open_speech_stream(text, voice, TTS_CHUNK_SIZE)
 
         return StreamingResponse(
-            chunker(),
+            audio_stream,
             media_type="audio/wav",
             headers={
                 "Cache-Control": "no-store",
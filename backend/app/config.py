@@ -3,6 +3,7 @@ Configuration module for the application.
 Loads environment variables and provides configuration settings.
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Try to import dotenv, but handle if it's not available
@@ -50,6 +51,10 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY", "")
 # Prefer service role on server; never expose to frontend
 SUPABASE_KEY = SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY
+# Shared async PostgREST pool (HTTP/2 when h2 is installed)
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "10"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
 
 # Service Configurations (legacy names for compatibility)
 TTS_API_KEY = os.getenv("TTS_API_KEY", GOOGLE_API_KEY)
@@ -61,7 +66,72 @@ TTS_SAMPLE_RATE = int(os.getenv("TTS_SAMPLE_RATE", "22050"))
 TTS_CHUNK_SIZE = int(os.getenv("TTS_CHUNK_SIZE", "32768"))
 TTS_CONCURRENT_LIMIT = int(os.getenv("TTS_CONCURRENT_LIMIT", "10"))
 TTS_CACHE_TTL = int(os.getenv("TTS_CACHE_TTL", "7200"))
+# Pipelined lesson TTS: sentences shorter than this are merged into the next chunk
+TTS_PIPELINE_MIN_CHARS = int(os.getenv("TTS_PIPELINE_MIN_CHARS", "60"))
+# Chunks one pipelined stream may synthesize ahead of the one being sent
+TTS_PIPELINE_WINDOW = max(1, int(os.getenv("TTS_PIPELINE_WINDOW", "2")))
+# Tiered audio cache: byte-bounded memory LRU spilling to a content-addressed disk store
+TTS_MEMORY_CACHE_BYTES = int(os.getenv("TTS_MEMORY_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Each worker process uses its own subdirectory, and TTS_DISK_CACHE_BYTES applies to each one
+TTS_DISK_CACHE_DIR = os.getenv("TTS_DISK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lana_tts_cache"))
+TTS_DISK_CACHE_BYTES = int(os.getenv("TTS_DISK_CACHE_BYTES", str(1024 * 1024 * 1024)))
 
 # Application Settings
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
-RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
\ No newline at end of file
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+# Client/window keys tracked by the in-process rate limiter before the least recent is dropped
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "200000"))
+
+# Bearer token verification (Supabase JWKS rotation and verified-claims LRU)
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "600"))
+JWKS_MIN_REFETCH_SECONDS = float(os.getenv("JWKS_MIN_REFETCH_SECONDS", "30"))
+AUTH_CLAIMS_CACHE_SIZE = int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "4096"))
+AUTH_CLAIMS_MAX_TTL = float(os.getenv("AUTH_CLAIMS_MAX_TTL", "300"))
+
+# LLM Gateway Settings (shared AsyncGroq client)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+# Shared Cache Settings (Redis with per-process L1 near-cache)
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "30"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", "60"))
+CACHE_L1_MAXSIZE = int(os.getenv("CACHE_L1_MAXSIZE", "512"))
+
+# Distributed single-flight (Redis lock + pub/sub) for expensive generations
+SINGLE_FLIGHT_LOCK_TTL_MS = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL_MS", "60000"))
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "45"))
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "30"))
+
+# SymPy worker pool (math solver runs in separate processes with per-job timeouts)
+SYMPY_POOL_WORKERS = int(os.getenv("SYMPY_POOL_WORKERS", "2"))
+SYMPY_TIMEOUT_SECONDS = float(os.getenv("SYMPY_TIMEOUT_SECONDS", "5"))
+SYMPY_CANONICAL_TIMEOUT_SECONDS = float(os.getenv("SYMPY_CANONICAL_TIMEOUT_SECONDS", "1"))
+# Canonical math solutions never go stale; keep them for a week by default
+MATH_CANONICAL_CACHE_TTL = int(os.getenv("MATH_CANONICAL_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Persistent lesson store (append-only sharded segments reloaded at boot)
+LESSON_STORE_DIR = os.getenv("LESSON_STORE_DIR", os.path.join(tempfile.gettempdir(), "lana_lesson_store"))
+LESSON_STORE_SHARDS = int(os.getenv("LESSON_STORE_SHARDS", "8"))
+LESSON_STORE_SEGMENT_BYTES = int(os.getenv("LESSON_STORE_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+LESSON_STORE_WARM_LIMIT = int(os.getenv("LESSON_STORE_WARM_LIMIT", "500"))
+LESSON_STORE_MAX_AGE = int(os.getenv("LESSON_STORE_MAX_AGE", str(7 * 24 * 3600)))
+
+# Popularity-driven lesson pre-generation (opt-in: it spends LLM and TTS quota)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "False").lower() in ("true", "1", "t")
+# Comma separated UTC hour ranges, e.g. "1-6" or "22-2,13-14"
+PREFETCH_OFF_PEAK_HOURS = os.getenv("PREFETCH_OFF_PEAK_HOURS", "1-6")
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "25"))
+PREFETCH_LOOKBACK_DAYS = int(os.getenv("PREFETCH_LOOKBACK_DAYS", "14"))
+PREFETCH_TOKEN_BUDGET = int(os.getenv("PREFETCH_TOKEN_BUDGET", "250000"))
+PREFETCH_TOKENS_PER_LESSON = int(os.getenv("PREFETCH_TOKENS_PER_LESSON", "1800"))
+PREFETCH_INTERVAL_SECONDS = int(os.getenv("PREFETCH_INTERVAL_SECONDS", "600"))
+PREFETCH_TTS = os.getenv("PREFETCH_TTS", "False").lower() in ("true", "1", "t")
+
+# Semantic near-duplicate topic lookup for lessons
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75"))
+# Reject matches whose runner-up is within this similarity of the best one
+SEMANTIC_CACHE_MARGIN = float(os.getenv("SEMANTIC_CACHE_MARGIN", "0.05"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
@@ -5,7 +5,7 @@ from bullmq import Job
 from app.services.lesson_service import LessonService
 from app.services.tts_service import TTSService
 from app.repositories.memory_lesson_repository import MemoryLessonRepository
-from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.repositories.cache_repository import get_cache_repository
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +19,7 @@ def init_services():
     
     if lesson_service is None or tts_service is None:
         # Initialize repositories
-        cache_repo = MemoryCacheRepository()
+        cache_repo = get_cache_repository()
         lesson_repo = MemoryLessonRepository()
         
         # Initialize services
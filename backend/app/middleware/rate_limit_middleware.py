@@ -1,33 +1,29 @@
-import time
-from typing import Tuple, Dict, Any
-# Gracefully handle redis import
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    redis = None
-    REDIS_AVAILABLE = False
-
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from typing import Tuple, Dict
+
 from starlette.responses import JSONResponse
 from starlette import status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.services.gcra_limiter import GCRALimiter
+from app.services.redis_rate_limiter import RedisRateLimiter
 from app.settings import load_settings
 settings = load_settings()
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware with Redis backend and in-memory fallback."""
+# Health checks and OpenAPI docs are never rate limited
+_EXEMPT_PATHS = frozenset({"/health", "/api/health", "/docs", "/redoc", "/openapi.json"})
+
 
-    def __init__(self, app):
+class RateLimitMiddleware:
+    """ASGI rate limiting middleware with an atomic Redis backend and in-memory fallback."""
+
+    def __init__(self, app: ASGIApp):
         """Initialize rate limiter."""
-        super().__init__(app)
+        self.app = app
         self.calls_per_minute = settings.rate_limit_per_minute
         self.calls_per_hour = settings.rate_limit_per_hour
-        self.memory_store: Dict[str, Any] = {}
-        self.last_cleanup = time.time()
-        self._redis_client = None
+        self._local_limiter = GCRALimiter()
+        self._redis_limiter = RedisRateLimiter()
 
         # Endpoint-specific limits
         self.endpoint_limits = {
@@ -40,103 +36,46 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "/api/solve-math": {"per_minute": 30, "per_hour": 400},
         }
 
-    async def _get_redis_client(self):
-        """Get or create a Redis client."""
-        global REDIS_AVAILABLE
-        if not REDIS_AVAILABLE:
-            return None
-        if self._redis_client is None:
-            try:
-                self._redis_client = redis.Redis.from_url(
-                    settings.redis_url, encoding="utf-8", decode_responses=True
-                )
-            except Exception as e:
-                print(f"Could not connect to Redis: {e}")
-                self._redis_client = None
-        return self._redis_client
-
-    async def get_client_ip(self, request: Request) -> str:
+    @staticmethod
+    def get_client_ip(scope: Scope) -> str:
         """Extract client IP with proxy support."""
-        forwarded_for = request.headers.get("X-Forwarded-For")
+        forwarded_for = real_ip = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                forwarded_for = value
+            elif name == b"x-real-ip":
+                real_ip = value
         if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
+            return forwarded_for.decode("latin-1").split(",")[0].strip()
 
-        real_ip = request.headers.get("X-Real-IP")
         if real_ip:
-            return real_ip
-
-        return request.client.host if request.client else "unknown"
-
-    def check_rate_limit(
-        self, key: str, limit: int, window: int
-    ) -> Tuple[bool, int]:
-        """Check rate limit using Redis or in-memory fallback."""
-        redis = self._get_redis_client()
-        current_time = time.time()
-
-        if redis:
-            # Use Redis for rate limiting
-            try:
-                # Remove scores older than 'window' seconds ago
-                redis.zremrangebyscore(key, 0, current_time - window)
-                # Add current request timestamp
-                redis.zadd(key, {current_time: current_time})
-                # Set expiration for the key to prevent it from living forever
-                redis.expire(key, window + 5)  # +5 seconds buffer
-
-                count = redis.zcard(key)
-                return count <= limit, count
-            except Exception as e:
-                # Fall back to in-memory store if Redis fails
-                print(f"Redis error: {e}")
-                pass
-
-        # Fallback to in-memory store
-        # Cleanup old entries periodically
-        if current_time - self.last_cleanup > 300:
-            self.cleanup_memory_store()
-            self.last_cleanup = current_time
-
-        if key not in self.memory_store:
-            self.memory_store[key] = []
-
-        # Remove old entries
-        window_start = current_time - window
-        self.memory_store[key] = [
-            t for t in self.memory_store[key] if t > window_start
-        ]
-
-        # Add current request
-        self.memory_store[key].append(current_time)
-
-        return len(self.memory_store[key]) <= limit, len(self.memory_store[key])
-
-    async def cleanup_memory_store(self):
-        """Clean up old entries from memory store."""
-        current_time = time.time()
-        keys_to_remove = []
-        for key, timestamps in self.memory_store.items():
-            self.memory_store[key] = [t for t in timestamps if t > current_time - 3600]
-            if not self.memory_store[key]:
-                keys_to_remove.append(key)
-
-        for key in keys_to_remove:
-            del self.memory_store[key]
-
-    async def dispatch(self, request: Request, call_next):
+            return real_ip.decode("latin-1")
+
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def check_rate_limits(self, client_ip: str, endpoint: str, limits: Dict[str, int]) -> Tuple[int, int]:
+        """Count a request against the minute and hour windows.
+
+        Returns ``(exceeded, minute_count)`` where ``exceeded`` is 0 when
+        allowed, 1 for the minute window and 2 for the hour window. Redis
+        answers in one round trip; without it the in-process GCRA limiter is used.
+        """
+        identity = f"{client_ip}:{endpoint}"
+        windows = [("minute", 60, limits["per_minute"]), ("hour", 3600, limits["per_hour"])]
+        outcome = await self._redis_limiter.check(identity, windows)
+        if outcome is not None:
+            return outcome
+        return self._local_limiter.check_windows(identity, windows)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Apply rate limiting."""
-        # Skip rate limiting for health checks and OpenAPI docs
-        if request.url.path in [
-            "/health",
-            "/api/health",
-            "/docs",
-            "/redoc",
-            "/openapi.json",
-        ]:
-            return await call_next(request)
-
-        client_ip = await self.get_client_ip(request)
-        endpoint = request.url.path
+        if scope["type"] != "http" or scope["path"] in _EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = self.get_client_ip(scope)
+        endpoint = scope["path"]
 
         # Get endpoint-specific limits
         limits = self.endpoint_limits.get(
@@ -145,61 +84,47 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         )
 
         # Check rate limits
-        minute_key = f"{client_ip}:{endpoint}:minute"
-        hour_key = f"{client_ip}:{endpoint}:hour"
-
-        minute_ok, minute_count = self.check_rate_limit(
-            minute_key, limits["per_minute"], 60
-        )
-
-        if not minute_ok:
-            return JSONResponse(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                content={
-                    "error": "Rate limit exceeded",
-                    "message": f"Too many requests. Limit: {limits['per_minute']}/min",
-                    "retry_after": 60,
-                },
-                headers={
-                    "Retry-After": "60",
-                    "X-RateLimit-Limit": str(limits["per_minute"]),
-                    "X-RateLimit-Remaining": str(0),
-                    "X-RateLimit-Reset": str(
-                        60
-                    ),  # Assuming a 60 second window for minute limit
-                },
-            )
-
-        hour_ok, hour_count = self.check_rate_limit(
-            hour_key, limits["per_hour"], 3600
-        )
+        exceeded, minute_count = await self.check_rate_limits(client_ip, endpoint, limits)
+
+        if exceeded == 1:
+            response = self._limited(limits["per_minute"], "min", 60)
+            await response(scope, receive, send)
+            return
+
+        if exceeded == 2:
+            response = self._limited(limits["per_hour"], "hour", 3600)
+            await response(scope, receive, send)
+            return
+
+        # Add rate limit headers; the reset assumes the 60 second minute window
+        rate_headers = [
+            (b"x-ratelimit-limit", str(limits["per_minute"]).encode()),
+            (b"x-ratelimit-remaining", str(max(0, limits["per_minute"] - minute_count)).encode()),
+            (b"x-ratelimit-reset", b"60"),
+        ]
 
-        if not hour_ok:
-            return JSONResponse(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                content={
-                    "error": "Rate limit exceeded",
-                    "message": f"Too many requests. Limit: {limits['per_hour']}/hour",
-                    "retry_after": 3600,
-                },
-                headers={
-                    "Retry-After": "3600",
-                    "X-RateLimit-Limit": str(limits["per_hour"]),
-                    "X-RateLimit-Remaining": str(0),
-                    "X-RateLimit-Reset": str(
-                        3600
-                    ),  # Assuming a 3600 second window for hour limit
-                },
-            )
-
-        # Add rate limit headers
-        response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(limits["per_minute"])
-        response.headers["X-RateLimit-Remaining"] = str(
-            max(0, limits["per_minute"] - minute_count)
+        async def send_with_limits(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.extend(rate_headers)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_limits)
+
+    @staticmethod
+    def _limited(limit: int, unit: str, window: int) -> JSONResponse:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={
+                "error": "Rate limit exceeded",
+                "message": f"Too many requests. Limit: {limit}/{unit}",
+                "retry_after": window,
+            },
+            headers={
+                "Retry-After": str(window),
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(window),
+            },
         )
-        response.headers["X-RateLimit-Reset"] = str(
-            60
-        )  # Assuming a 60 second window for minute limit
-
-        return response
@@ -1,77 +1,105 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from typing import FrozenSet, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.settings import load_settings
 
 _settings = load_settings()
 
+Header = Tuple[bytes, bytes]
+
+_BASE_HEADERS: List[Header] = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+
+# More permissive CSP for documentation, allowing external Swagger UI resources
+_DOCS_CSP = (
+    b"default-src 'self'; "
+    b"script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://unpkg.com; "
+    b"style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://unpkg.com; "
+    b"img-src 'self' data: https:; "
+    b"font-src 'self' data: https://cdn.jsdelivr.net; "
+    b"connect-src 'self' https:; "
+    b"media-src 'self'; "
+    b"object-src 'none'; "
+    b"base-uri 'self'; "
+    b"form-action 'self'; "
+    b"frame-ancestors 'none'; "
+    b"upgrade-insecure-requests"
+)
+
+# Standard restrictive CSP for API routes
+_API_CSP = (
+    b"default-src 'self'; "
+    b"script-src 'self'; "
+    b"style-src 'self' 'unsafe-inline'; "
+    b"img-src 'self' data: https:; "
+    b"font-src 'self' data:; "
+    b"connect-src 'self' https:; "
+    b"media-src 'self'; "
+    b"object-src 'none'; "
+    b"base-uri 'self'; "
+    b"form-action 'self'; "
+    b"frame-ancestors 'none'; "
+    b"upgrade-insecure-requests"
+)
+
+_HSTS: Header = (b"strict-transport-security", b"max-age=31536000; includeSubDomains; preload")
+
+# Cache control for API responses
+_NO_CACHE: List[Header] = [
+    (b"cache-control", b"no-cache, no-store, must-revalidate"),
+    (b"pragma", b"no-cache"),
+    (b"expires", b"0"),
+]
+
+
+class SecurityHeadersMiddleware:
+    """ASGI middleware adding security headers to every HTTP response.
+
+    Header sets are assembled once per route kind; each response only has them
+    spliced into its ``http.response.start`` message, replacing any header of
+    the same name, so streamed bodies pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, debug: Optional[bool] = None):
+        self.app = app
+        debug = _settings.api_debug if debug is None else debug
+        # Production CSP only when not in debug mode
+        docs = list(_BASE_HEADERS) + ([] if debug else [(b"content-security-policy", _DOCS_CSP)])
+        other = list(_BASE_HEADERS) + ([] if debug else [(b"content-security-policy", _API_CSP)])
+        self._header_sets = {}
+        for kind, headers in (("docs", docs), ("api", other + _NO_CACHE), ("other", other)):
+            for https in (False, True):
+                headers = headers + ([_HSTS] if https else [])
+                self._header_sets[(kind, https)] = (frozenset(name for name, _ in headers), headers)
+
+    def _headers_for(self, scope: Scope) -> Tuple[FrozenSet[bytes], List[Header]]:
+        path = scope["path"]
+        if path.startswith("/docs") or path.startswith("/redoc"):
+            kind = "docs"
+        elif path.startswith("/api/"):
+            kind = "api"
+        else:
+            kind = "other"
+        return self._header_sets[(kind, scope.get("scheme") == "https")]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        names, extra = self._headers_for(scope)
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Replace headers of the same name, as assigning to response.headers would
+                headers = [header for header in message.get("headers", ()) if header[0].lower() not in names]
+                headers.extend(extra)
+                message["headers"] = headers
+            await send(message)
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Middleware to add security headers to all responses."""
-
-    async def dispatch(self, request: Request, call_next):
-        """Add security headers to response."""
-        response = await call_next(request)
-
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = (
-            "geolocation=(), microphone=(), camera=()"
-        )
-
-        # Content Security Policy
-        # Use production CSP when not in debug mode
-        if not _settings.api_debug:
-            # Relax CSP for documentation routes to allow external Swagger UI resources
-            if request.url.path.startswith("/docs") or request.url.path.startswith("/redoc"):
-                # More permissive CSP for documentation
-                csp_policy = (
-                    "default-src 'self'; "
-                    "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://unpkg.com; "
-                    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://unpkg.com; "
-                    "img-src 'self' data: https:; "
-                    "font-src 'self' data: https://cdn.jsdelivr.net; "
-                    "connect-src 'self' https:; "
-                    "media-src 'self'; "
-                    "object-src 'none'; "
-                    "base-uri 'self'; "
-                    "form-action 'self'; "
-                    "frame-ancestors 'none'; "
-                    "upgrade-insecure-requests"
-                )
-            else:
-                # Standard restrictive CSP for API routes
-                csp_policy = (
-                    "default-src 'self'; "
-                    "script-src 'self'; "
-                    "style-src 'self' 'unsafe-inline'; "
-                    "img-src 'self' data: https:; "
-                    "font-src 'self' data:; "
-                    "connect-src 'self' https:; "
-                    "media-src 'self'; "
-                    "object-src 'none'; "
-                    "base-uri 'self'; "
-                    "form-action 'self'; "
-                    "frame-ancestors 'none'; "
-                    "upgrade-insecure-requests"
-                )
-            response.headers["Content-Security-Policy"] = csp_policy
-
-        # HSTS (HTTP Strict Transport Security)
-        if request.url.scheme == "https":
-            response.headers["Strict-Transport-Security"] = (
-                "max-age=31536000; includeSubDomains; preload"
-            )
-
-        # Cache control for API responses
-        if request.url.path.startswith("/api/"):
-            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-
-        return response
\ No newline at end of file
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,369 @@
+"""
+Tiered cache for synthesized audio.
+
+Hot WAV blobs live in an in-memory LRU bounded in bytes. Entries evicted from
+memory spill to a local content-addressed store (``objects/<sha256>``), with a
+small ref file per cache key so the disk tier survives restarts. Disk hits are
+streamed through memory-mapped reads, one chunk at a time, instead of loading
+the whole blob into the heap.
+
+The index, reference counts and byte budget of the disk tier are per process,
+so each worker process claims its own ``worker-<n>`` directory under the
+configured one, held with an ``flock`` for the life of the process. No worker
+evicts files another has mapped, a restarted worker takes over a free
+directory and its entries, and the disk budget applies per worker.
+"""
+import asyncio
+import hashlib
+import itertools
+import logging
+import mmap
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, IO, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: fall back to one directory per process id
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+from app.config import (
+    TTS_CACHE_TTL,
+    TTS_DISK_CACHE_BYTES,
+    TTS_DISK_CACHE_DIR,
+    TTS_MEMORY_CACHE_BYTES,
+)
+from app.repositories.interfaces import ICacheRepository
+
+logger = logging.getLogger(__name__)
+
+
+class _DiskRef:
+    __slots__ = ("digest", "size", "expires_at")
+
+    def __init__(self, digest: str, size: int, expires_at: float):
+        self.digest = digest
+        self.size = size
+        self.expires_at = expires_at
+
+
+def _claim_worker_dir(base: str) -> Tuple[str, Optional[IO[bytes]]]:
+    """First ``worker-<n>`` directory under ``base`` that no live process holds, and its held lock."""
+    if not FCNTL_AVAILABLE:
+        path = os.path.join(base, f"worker-{os.getpid()}")
+        os.makedirs(path, exist_ok=True)
+        return path, None
+    for slot in itertools.count():
+        path = os.path.join(base, f"worker-{slot}")
+        os.makedirs(path, exist_ok=True)
+        lock = open(os.path.join(path, ".lock"), "ab")
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            continue
+        return path, lock
+
+
+class TieredAudioCache(ICacheRepository):
+    """Byte-budgeted memory LRU with a content-addressed disk spill tier."""
+
+    def __init__(
+        self,
+        memory_bytes: int = TTS_MEMORY_CACHE_BYTES,
+        disk_dir: Optional[str] = TTS_DISK_CACHE_DIR,
+        disk_bytes: int = TTS_DISK_CACHE_BYTES,
+        default_ttl: int = TTS_CACHE_TTL,
+    ):
+        self._memory_budget = memory_bytes
+        self._disk_budget = disk_bytes
+        self._default_ttl = default_ttl
+        self._memory: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, _DiskRef]" = OrderedDict()
+        self._objects: Dict[str, int] = {}  # digest -> number of refs
+        self._disk_bytes = 0
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "spills": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+        self._root = disk_dir if disk_dir and disk_bytes > 0 else None
+        # Held open (and locked) as long as this cache owns its directory
+        self._root_lock: Optional[IO[bytes]] = None
+        if self._root:
+            try:
+                self._root, self._root_lock = _claim_worker_dir(self._root)
+                os.makedirs(os.path.join(self._root, "objects"), exist_ok=True)
+                os.makedirs(os.path.join(self._root, "refs"), exist_ok=True)
+                self._load_index()
+            except OSError as e:
+                logger.warning(f"Audio disk cache disabled ({self._root}): {e}")
+                self._root = None
+
+    # -- paths -------------------------------------------------------------
+
+    @staticmethod
+    def _full_key(key: str, namespace: str) -> str:
+        return f"{namespace}:{key}"
+
+    def _ref_path(self, full_key: str) -> str:
+        name = hashlib.sha256(full_key.encode()).hexdigest()
+        return os.path.join(self._root, "refs", name)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self._root, "objects", digest[:2], digest)
+
+    # -- disk index --------------------------------------------------------
+
+    def _load_index(self) -> None:
+        """Rebuild the disk index from ref files, oldest first."""
+        refs_dir = os.path.join(self._root, "refs")
+        now = time.time()
+        found = []
+        for name in os.listdir(refs_dir):
+            path = os.path.join(refs_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    full_key, digest, size, expires_at = f.read().split("\n")[:4]
+                ref = _DiskRef(digest, int(size), float(expires_at))
+                if ref.expires_at <= now or not os.path.exists(self._object_path(digest)):
+                    os.unlink(path)
+                    continue
+                found.append((os.path.getmtime(path), full_key, ref))
+            except (OSError, ValueError):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        for _, full_key, ref in sorted(found, key=lambda item: item[0]):
+            self._add_disk_ref(full_key, ref)
+        self._evict_disk()
+
+    def _add_disk_ref(self, full_key: str, ref: _DiskRef) -> None:
+        count = self._objects.get(ref.digest, 0)
+        if count == 0:
+            self._disk_bytes += ref.size
+        self._objects[ref.digest] = count + 1
+        self._disk[full_key] = ref
+
+    def _drop_disk_ref(self, full_key: str) -> None:
+        ref = self._disk.pop(full_key, None)
+        if ref is None:
+            return
+        try:
+            os.unlink(self._ref_path(full_key))
+        except OSError:
+            pass
+        self._release_object(ref)
+
+    def _release_object(self, ref: _DiskRef) -> None:
+        count = self._objects.get(ref.digest, 1) - 1
+        if count > 0:
+            self._objects[ref.digest] = count
+            return
+        self._objects.pop(ref.digest, None)
+        self._disk_bytes -= ref.size
+        try:
+            os.unlink(self._object_path(ref.digest))
+        except OSError:
+            pass
+
+    def _evict_disk(self) -> None:
+        while self._disk and self._disk_bytes > self._disk_budget:
+            full_key = next(iter(self._disk))
+            self._drop_disk_ref(full_key)
+            self._stats["evictions"] += 1
+
+    def _write_spill(self, full_key: str, data: bytes, expires_at: float) -> _DiskRef:
+        """Write an object (once per digest) and its ref file; runs in a worker thread."""
+        digest = hashlib.sha256(data).hexdigest()
+        obj_path = self._object_path(digest)
+        if not os.path.exists(obj_path):
+            os.makedirs(os.path.dirname(obj_path), exist_ok=True)
+            tmp = f"{obj_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, obj_path)
+        ref_path = self._ref_path(full_key)
+        tmp = f"{ref_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"{full_key}\n{digest}\n{len(data)}\n{expires_at}")
+        os.replace(tmp, ref_path)
+        return _DiskRef(digest, len(data), expires_at)
+
+    async def _spill(self, full_key: str, data: bytes, expires_at: float) -> None:
+        if self._root is None or len(data) > self._disk_budget:
+            self._stats["evictions"] += 1
+            return
+        try:
+            ref = await asyncio.to_thread(self._write_spill, full_key, data, expires_at)
+        except OSError as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Audio cache spill failed: {e}")
+            return
+        # The ref file was just rewritten, so a concurrent spill's ref only releases its object
+        previous = self._disk.pop(full_key, None)
+        self._add_disk_ref(full_key, ref)
+        if previous is not None:
+            self._release_object(previous)
+        self._stats["spills"] += 1
+        self._evict_disk()
+
+    # -- lookups -----------------------------------------------------------
+
+    def _memory_lookup(self, full_key: str) -> Optional[bytes]:
+        item = self._memory.get(full_key)
+        if item is None:
+            return None
+        data, expires_at = item
+        if expires_at <= time.time():
+            self._memory.pop(full_key, None)
+            self._memory_bytes -= len(data)
+            return None
+        self._memory.move_to_end(full_key)
+        return data
+
+    def _disk_lookup(self, full_key: str) -> Optional[_DiskRef]:
+        ref = self._disk.get(full_key)
+        if ref is None:
+            return None
+        if ref.expires_at <= time.time():
+            self._drop_disk_ref(full_key)
+            return None
+        self._disk.move_to_end(full_key)
+        return ref
+
+    async def get(self, key: str, namespace: str = "default") -> Optional[Any]:
+        full_key = self._full_key(key, namespace)
+        data = self._memory_lookup(full_key)
+        if data is not None:
+            self._stats["memory_hits"] += 1
+            return data
+        ref = self._disk_lookup(full_key)
+        if ref is not None:
+            try:
+                data = await asyncio.to_thread(self._read_object, ref.digest)
+                self._stats["disk_hits"] += 1
+                return data
+            except OSError as e:
+                self._stats["errors"] += 1
+                logger.warning(f"Audio cache disk read failed: {e}")
+                self._drop_disk_ref(full_key)
+        self._stats["misses"] += 1
+        return None
+
+    def _read_object(self, digest: str) -> bytes:
+        with open(self._object_path(digest), "rb") as f:
+            return f.read()
+
+    async def open_stream(self, key: str, namespace: str = "default", chunk_size: int = 32768) -> Optional[AsyncIterator[bytes]]:
+        """Return an iterator over a cached blob's chunks, or None on a miss.
+
+        Disk entries are opened and mapped here, so the iterator stays valid even
+        if the entry is evicted while the response is being sent.
+        """
+        full_key = self._full_key(key, namespace)
+        data = self._memory_lookup(full_key)
+        if data is not None:
+            self._stats["memory_hits"] += 1
+            return self._iter_memory(data, chunk_size)
+        ref = self._disk_lookup(full_key)
+        if ref is not None:
+            try:
+                with open(self._object_path(ref.digest), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._stats["disk_hits"] += 1
+                return self._iter_mapped(mapped, chunk_size)
+            except (OSError, ValueError) as e:
+                self._stats["errors"] += 1
+                logger.warning(f"Audio cache mmap failed: {e}")
+                self._drop_disk_ref(full_key)
+        self._stats["misses"] += 1
+        return None
+
+    @staticmethod
+    async def _iter_memory(data: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    @staticmethod
+    async def _iter_mapped(mapped: mmap.mmap, chunk_size: int) -> AsyncIterator[bytes]:
+        try:
+            for i in range(0, len(mapped), chunk_size):
+                yield mapped[i:i + chunk_size]
+        finally:
+            mapped.close()
+
+    # -- mutations ---------------------------------------------------------
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, namespace: str = "default") -> bool:
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            return False
+        data = bytes(value)
+        full_key = self._full_key(key, namespace)
+        expires_at = time.time() + (ttl if ttl and ttl > 0 else self._default_ttl)
+
+        old = self._memory.pop(full_key, None)
+        if old is not None:
+            self._memory_bytes -= len(old[0])
+        self._drop_disk_ref(full_key)
+
+        if len(data) > self._memory_budget:
+            await self._spill(full_key, data, expires_at)
+            return full_key in self._disk
+
+        self._memory[full_key] = (data, expires_at)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self._memory_budget:
+            evicted_key, (evicted, evicted_expiry) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            if evicted_expiry > time.time():
+                await self._spill(evicted_key, evicted, evicted_expiry)
+        return True
+
+    async def delete(self, key: str, namespace: str = "default") -> bool:
+        full_key = self._full_key(key, namespace)
+        old = self._memory.pop(full_key, None)
+        if old is not None:
+            self._memory_bytes -= len(old[0])
+        existed = old is not None or full_key in self._disk
+        self._drop_disk_ref(full_key)
+        return existed
+
+    async def exists(self, key: str, namespace: str = "default") -> bool:
+        full_key = self._full_key(key, namespace)
+        return self._memory_lookup(full_key) is not None or self._disk_lookup(full_key) is not None
+
+    async def clear(self, namespace: Optional[str] = None) -> int:
+        prefix = None if namespace is None else f"{namespace}:"
+        removed = 0
+        for full_key in [k for k in self._memory if prefix is None or k.startswith(prefix)]:
+            data, _ = self._memory.pop(full_key)
+            self._memory_bytes -= len(data)
+            removed += 1
+        for full_key in [k for k in self._disk if prefix is None or k.startswith(prefix)]:
+            self._drop_disk_ref(full_key)
+            removed += 1
+        return removed
+
+    async def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        stats.update(
+            memory_entries=len(self._memory),
+            memory_bytes=self._memory_bytes,
+            memory_budget=self._memory_budget,
+            disk_entries=len(self._disk),
+            disk_objects=len(self._objects),
+            disk_bytes=self._disk_bytes,
+            disk_budget=self._disk_budget if self._root else 0,
+        )
+        return stats
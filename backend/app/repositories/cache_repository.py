@@ -1,102 +1,159 @@
-import aioredis
 import orjson
 import time
-from cachetools import TTLCache
+from cachetools import TLRUCache
 from typing import Any, Dict, Optional
 import logging
 
-from backend.app.repositories.interfaces import ICacheRepository
-from backend.main import settings
+from app.config import CACHE_L1_MAXSIZE, CACHE_L1_TTL
+from app.repositories.interfaces import ICacheRepository
+from app.repositories.redis_client import get_async_redis, mark_redis_unavailable
+from app.settings import Settings, load_settings
 
 logger = logging.getLogger(__name__)
 
-REDIS_AVAILABLE = True  # Assume Redis is available unless connection fails
+# Raw bytes (e.g. audio) are stored verbatim behind this marker; orjson output never starts with it
+_BYTES_MARKER = b"\x00"
+
+_FALLBACK_MAXSIZE = {
+    "lessons": 1000,
+    "tts": 500,
+    "history": 100,
+    "popular": 50,
+    "math": 200,
+    "math_canonical": 1000,
+}
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _BYTES_MARKER + bytes(value)
+    return orjson.dumps(value)
+
+
+def _decode(raw: bytes) -> Any:
+    if raw[:1] == _BYTES_MARKER:
+        return raw[1:]
+    return orjson.loads(raw)
+
+
+def _entry(value: Any, payload: bytes, ttl: float) -> tuple:
+    """In-process entry: bytes are kept as-is, anything else as its serialized payload.
+
+    Readers decode their own copy, so a caller mutating a cached dict cannot
+    change what the next caller sees.
+    """
+    if isinstance(value, bytes):
+        return (value, False, ttl)
+    return (payload, True, ttl)
+
+
+def _entry_value(entry: tuple) -> Any:
+    data, encoded, _ = entry
+    return orjson.loads(data) if encoded else data
+
+
+def _entry_expiry(_key: str, entry: tuple, now: float) -> float:
+    return now + entry[2]
 
 
 class CacheRepository(ICacheRepository):
-    """Cache repository with Redis and in-memory fallback."""
+    """Async Redis cache shared by every worker, with a per-process near-cache.
+
+    - Values are serialized with orjson; raw bytes are stored verbatim
+    - A short-lived L1 cache per namespace absorbs repeated reads of hot keys;
+      an entry never outlives the TTL it was written with
+    - When Redis is unreachable, namespaced in-memory caches take over
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        l1_ttl: int = CACHE_L1_TTL,
+        l1_maxsize: int = CACHE_L1_MAXSIZE,
+    ):
         """Initialize cache repository."""
-        self._redis_client: Optional[aioredis.Redis] = None
-        self._fallback_caches: Dict[str, TTLCache] = {}
-        self._stats = {"hits": 0, "misses": 0, "errors": 0, "last_reset": time.time()}
+        self._settings = settings or load_settings()
+        self._l1_ttl = l1_ttl
+        self._l1_maxsize = l1_maxsize
+        self._near_caches: Dict[str, TLRUCache] = {}
+        self._fallback_caches: Dict[str, TLRUCache] = {}
+        self._stats = {
+            "hits": 0,
+            "l1_hits": 0,
+            "misses": 0,
+            "errors": 0,
+            "last_reset": time.time(),
+        }
 
-    async def _get_redis_client(self) -> Optional[aioredis.Redis]:
-        """Get or create Redis client."""
-        global REDIS_AVAILABLE
-        if not REDIS_AVAILABLE:
-            return None
+    def _namespace_ttl(self, namespace: str) -> int:
+        ttl_map = {
+            # Lessons outlive their soft TTL so stale copies can be served while refreshing
+            "lessons": self._settings.cache_ttl_lessons + self._settings.cache_stale_lessons,
+            "tts": self._settings.cache_ttl_tts,
+            "history": self._settings.cache_ttl_history,
+            "popular": self._settings.cache_ttl_popular,
+            "math": self._settings.cache_ttl_math,
+        }
+        return ttl_map.get(namespace, 3600)
 
-        if not self._redis_client:
-            try:
-                self._redis_client = await aioredis.from_url(
-                    f"redis://{settings.redis_host}:{settings.redis_port}",
-                    password=settings.redis_password,
-                    db=settings.redis_db,
-                    decode_responses=False,
-                    socket_connect_timeout=5,
-                    socket_timeout=5,
-                )
-                await self._redis_client.ping()
-                logger.info("✅ Redis connection established")
-            except Exception as e:
-                logger.warning(f"Redis connection failed: {e}")
-                REDIS_AVAILABLE = False
-                self._redis_client = None
-        return self._redis_client
+    def _get_near_cache(self, namespace: str) -> TLRUCache:
+        """Get L1 near-cache for namespace; each entry carries its own TTL."""
+        if namespace not in self._near_caches:
+            self._near_caches[namespace] = TLRUCache(maxsize=self._l1_maxsize, ttu=_entry_expiry)
+        return self._near_caches[namespace]
 
-    def _get_fallback_cache(self, namespace: str) -> TTLCache:
+    def _get_fallback_cache(self, namespace: str) -> TLRUCache:
         """Get fallback in-memory cache for namespace."""
         if namespace not in self._fallback_caches:
-            ttl_map = {
-                "lessons": settings.cache_ttl_lessons,
-                "tts": settings.cache_ttl_tts,
-                "history": settings.cache_ttl_history,
-                "popular": settings.cache_ttl_popular,
-                "math": settings.cache_ttl_math,
-            }
-            ttl = ttl_map.get(namespace, 3600)
-            max_size = {
-                "lessons": 1000,
-                "tts": 500,
-                "history": 100,
-                "popular": 50,
-                "math": 200,
-            }.get(namespace, 100)
-            self._fallback_caches[namespace] = TTLCache(maxsize=max_size, ttl=ttl)
+            max_size = _FALLBACK_MAXSIZE.get(namespace, 100)
+            self._fallback_caches[namespace] = TLRUCache(maxsize=max_size, ttu=_entry_expiry)
         return self._fallback_caches[namespace]
 
     def _make_key(self, key: str, namespace: str) -> str:
         """Create namespaced cache key."""
         return f"{namespace}:{key}"
 
+    async def _on_redis_error(self, op: str, e: Exception) -> None:
+        self._stats["errors"] += 1
+        logger.debug(f"Redis {op} failed: {e}")
+        await mark_redis_unavailable(e)
+
     async def get(self, key: str, namespace: str = "default") -> Optional[Any]:
         """Retrieve value from cache."""
-        full_key = self._make_key(key, namespace)
+        near = self._get_near_cache(namespace)
+        entry = near.get(key)
+        if entry is not None:
+            self._stats["hits"] += 1
+            self._stats["l1_hits"] += 1
+            return _entry_value(entry)
 
-        try:
-            client = await self._get_redis_client()
-            if client:
-                value = await client.get(full_key)
-                if value:
-                    self._stats["hits"] += 1
-                    return orjson.loads(value)
-                else:
+        client = await get_async_redis()
+        if client is not None:
+            try:
+                full_key = self._make_key(key, namespace)
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.get(full_key)
+                    pipe.pttl(full_key)
+                    raw, pttl = await pipe.execute()
+                if raw is None:
                     self._stats["misses"] += 1
                     return None
-        except Exception as e:
-            self._stats["errors"] += 1
-            logger.debug(f"Redis get failed: {e}")
+                value = _decode(raw)
+                # Keys without an expiry report -1
+                ttl = self._l1_ttl if pttl < 0 else min(self._l1_ttl, pttl / 1000.0)
+                near[key] = _entry(value, raw, ttl)
+                self._stats["hits"] += 1
+                return value
+            except Exception as e:
+                await self._on_redis_error("get", e)
 
         # Fallback to in-memory
-        cache = self._get_fallback_cache(namespace)
-        result = cache.get(key)
-        if result:
+        entry = self._get_fallback_cache(namespace).get(key)
+        if entry is not None:
             self._stats["hits"] += 1
-        else:
-            self._stats["misses"] += 1
-        return result
+            return _entry_value(entry)
+        self._stats["misses"] += 1
+        return None
 
     async def set(
         self,
@@ -105,61 +162,101 @@ class CacheRepository(ICacheRepository):
         ttl: Optional[int] = None,
         namespace: str = "default",
     ) -> bool:
-        """Store value in cache with optional TTL."""
-        full_key = self._make_key(key, namespace)
-
+        """Store value in cache with optional TTL (defaults to the namespace TTL)."""
+        expire = ttl if ttl and ttl > 0 else self._namespace_ttl(namespace)
         try:
-            client = await self._get_redis_client()
-            if client:
-                if ttl:
-                    await client.setex(full_key, ttl, orjson.dumps(value))
-                else:
-                    await client.set(full_key, orjson.dumps(value))
-                return True
-        except Exception as e:
+            payload = _encode(value)
+        except TypeError as e:
             self._stats["errors"] += 1
-            logger.debug(f"Redis set failed: {e}")
+            logger.warning(f"Cache value for {namespace}:{key} is not serializable: {e}")
+            return False
+
+        self._get_near_cache(namespace)[key] = _entry(value, payload, min(self._l1_ttl, expire))
+        client = await get_async_redis()
+        if client is not None:
+            try:
+                await client.set(self._make_key(key, namespace), payload, ex=expire)
+                return True
+            except Exception as e:
+                await self._on_redis_error("set", e)
 
         # Fallback to in-memory
-        cache = self._get_fallback_cache(namespace)
-        cache[key] = value
+        self._get_fallback_cache(namespace)[key] = _entry(value, payload, expire)
         return True
 
     async def delete(self, key: str, namespace: str = "default") -> bool:
         """Delete value from cache."""
-        full_key = self._make_key(key, namespace)
-
-        try:
-            client = await self._get_redis_client()
-            if client:
-                await client.delete(full_key)
-                return True
-        except Exception as e:
-            self._stats["errors"] += 1
-            logger.debug(f"Redis delete failed: {e}")
-
-        # Fallback to in-memory
-        cache = self._get_fallback_cache(namespace)
-        if key in cache:
-            del cache[key]
+        self._get_near_cache(namespace).pop(key, None)
+        self._get_fallback_cache(namespace).pop(key, None)
+        client = await get_async_redis()
+        if client is not None:
+            try:
+                await client.delete(self._make_key(key, namespace))
+            except Exception as e:
+                await self._on_redis_error("delete", e)
         return True
 
     async def exists(self, key: str, namespace: str = "default") -> bool:
         """Check if key exists in cache."""
-        full_key = self._make_key(key, namespace)
-
-        try:
-            client = await self._get_redis_client()
-            if client:
-                return await client.exists(full_key)
-        except Exception as e:
-            self._stats["errors"] += 1
-            logger.debug(f"Redis exists failed: {e}")
+        if key in self._get_near_cache(namespace):
+            return True
+        client = await get_async_redis()
+        if client is not None:
+            try:
+                return bool(await client.exists(self._make_key(key, namespace)))
+            except Exception as e:
+                await self._on_redis_error("exists", e)
 
         # Fallback to in-memory
-        cache = self._get_fallback_cache(namespace)
-        return key in cache
+        return key in self._get_fallback_cache(namespace)
+
+    async def clear(self, namespace: Optional[str] = None) -> int:
+        """Remove every entry in a namespace (or in all known namespaces)."""
+        if namespace is None:
+            namespaces = set(self._near_caches) | set(self._fallback_caches) | set(_FALLBACK_MAXSIZE)
+        else:
+            namespaces = {namespace}
+
+        removed = 0
+        for ns in namespaces:
+            for caches in (self._near_caches, self._fallback_caches):
+                cache = caches.get(ns)
+                if cache is not None:
+                    cache.clear()
+
+        client = await get_async_redis()
+        if client is not None:
+            try:
+                for ns in namespaces:
+                    batch = []
+                    async for full_key in client.scan_iter(match=f"{ns}:*", count=500):
+                        batch.append(full_key)
+                        if len(batch) >= 500:
+                            removed += await client.delete(*batch)
+                            batch = []
+                    if batch:
+                        removed += await client.delete(*batch)
+            except Exception as e:
+                await self._on_redis_error("clear", e)
+
+        self._stats["last_reset"] = time.time()
+        return removed
 
     async def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
-        return self._stats
+        client = await get_async_redis()
+        stats = dict(self._stats)
+        stats["backend"] = "redis" if client is not None else "memory"
+        stats["l1_entries"] = {ns: len(c) for ns, c in self._near_caches.items()}
+        return stats
+
+
+_shared_cache: Optional[CacheRepository] = None
+
+
+def get_cache_repository() -> CacheRepository:
+    """Return the process-wide cache repository shared by all services."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = CacheRepository()
+    return _shared_cache
@@ -1,6 +1,7 @@
 from typing import Any, Dict, List, Optional
 from app.repositories.interfaces import IChatRepository
 from app.repositories.supabase_chat_repository import SupabaseChatRepository
+from app.repositories.supabase_client import get_postgrest_client
 from app.settings import Settings
 
 
@@ -21,15 +22,14 @@ class InMemoryChatRepository(IChatRepository):
 class HistoryRepository(IChatRepository):
     """Repository that selects Supabase or in-memory with async-safe calls."""
 
-    def __init__(self, settings: Settings) -> None:
+    def __init__(self, settings: Optional[Settings] = None, client: Any = None) -> None:
         self._repo: IChatRepository
-        url = (settings.supabase_url or "").strip()
-        key = (settings.supabase_service_role_key or settings.supabase_anon_key or "").strip()
-        if url and key:
-            try:
-                self._repo = SupabaseChatRepository(url=url, key=key)
-            except Exception:
-                self._repo = InMemoryChatRepository()
+        if client is None and settings is not None:
+            client = get_postgrest_client(
+                settings.supabase_url, settings.supabase_service_role_key or settings.supabase_anon_key
+            )
+        if client is not None:
+            self._repo = SupabaseChatRepository(client=client)
         else:
             self._repo = InMemoryChatRepository()
 
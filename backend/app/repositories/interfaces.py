@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 
@@ -69,6 +70,13 @@ class ILessonRepository(ABC):
         """Get most popular topics."""
         pass
 
+    @abstractmethod
+    async def get_popular_topics_by_age(
+        self, limit: int = 200, since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Get the most requested (topic, age) pairs as ``{"topic", "age", "count"}``."""
+        pass
+
 
 class IChatRepository(ABC):
     """Abstract chat repository interface for storing conversation history."""
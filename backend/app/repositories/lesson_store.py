@@ -0,0 +1,469 @@
+"""
+Persistent append-only store for generated lessons.
+
+Lessons are appended to segment files split across shards by cache key
+(``md5(topic|age)``). Each record is a fixed header (payload length, CRC32,
+write time) followed by an orjson payload, and an in-memory hash index maps
+each key to its latest record. On boot the index is rebuilt by scanning the
+segments sequentially, and the most recently written lessons are loaded back
+into the cache, so a restart does not turn every request into a Groq call.
+
+Every worker process shares the directory. Appends, compaction and torn-tail
+truncation take an exclusive ``flock`` on the shard's lock file, append
+offsets come from the file itself, and reads verify the record's CRC and key.
+A read that misses because another worker compacted the shard rescans it.
+"""
+import asyncio
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+    FCNTL_AVAILABLE = False
+
+from app.config import (
+    LESSON_STORE_DIR,
+    LESSON_STORE_MAX_AGE,
+    LESSON_STORE_SEGMENT_BYTES,
+    LESSON_STORE_SHARDS,
+    LESSON_STORE_WARM_LIMIT,
+)
+
+logger = logging.getLogger(__name__)
+
+# payload length, crc32 of payload, write time (epoch seconds)
+_HEADER = struct.Struct("<IId")
+
+
+class _IndexEntry:
+    __slots__ = ("segment", "offset", "length", "written_at")
+
+    def __init__(self, segment: str, offset: int, length: int, written_at: float):
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.written_at = written_at
+
+
+class LessonStore:
+    """Sharded append-only lesson log with an in-memory key index."""
+
+    def __init__(
+        self,
+        directory: str = LESSON_STORE_DIR,
+        shards: int = LESSON_STORE_SHARDS,
+        segment_bytes: int = LESSON_STORE_SEGMENT_BYTES,
+        max_age: int = LESSON_STORE_MAX_AGE,
+    ):
+        self._dir = directory
+        self._shards = max(1, shards)
+        self._segment_bytes = segment_bytes
+        self._max_age = max_age
+        self._index: Dict[str, _IndexEntry] = {}
+        self._locks = [threading.Lock() for _ in range(self._shards)]
+        self._opened = False
+        self._enabled = True
+        self._stats = {"records": 0, "dead_records": 0, "corrupt_records": 0, "writes": 0, "reads": 0, "load_seconds": 0.0}
+
+    # -- layout ------------------------------------------------------------
+
+    def _shard_for(self, key: str) -> int:
+        try:
+            return int(key[:4], 16) % self._shards
+        except ValueError:
+            return zlib.crc32(key.encode()) % self._shards
+
+    def _segments(self, shard: int) -> List[str]:
+        prefix = f"shard-{shard:02d}-"
+        names = sorted(n for n in os.listdir(self._dir) if n.startswith(prefix) and n.endswith(".seg"))
+        return [os.path.join(self._dir, n) for n in names]
+
+    def _new_segment_path(self, shard: int, after: Optional[str] = None) -> str:
+        seq = 0
+        if after:
+            seq = int(os.path.basename(after).split("-")[2].split(".")[0]) + 1
+        return os.path.join(self._dir, f"shard-{shard:02d}-{seq:06d}.seg")
+
+    @contextmanager
+    def _shard_lock(self, shard: int) -> Iterator[None]:
+        """Hold the shard against other threads and, via ``flock``, other workers."""
+        with self._locks[shard]:
+            if not FCNTL_AVAILABLE:
+                yield
+                return
+            with open(os.path.join(self._dir, f"shard-{shard:02d}.lock"), "ab") as lock:
+                # Released when the file is closed
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                yield
+
+    # -- boot --------------------------------------------------------------
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        os.makedirs(self._dir, exist_ok=True)
+        for shard in range(self._shards):
+            with self._shard_lock(shard):
+                index, dead = self._scan_shard(shard)
+            self._index.update(index)
+            self._stats["records"] += len(index)
+            self._stats["dead_records"] += dead
+        self._stats["load_seconds"] = round(time.perf_counter() - start, 3)
+
+    def _scan_shard(self, shard: int) -> Tuple[Dict[str, _IndexEntry], int]:
+        """Index of the shard's latest records on disk and the number superseded; needs the shard lock."""
+        index: Dict[str, _IndexEntry] = {}
+        dead = 0
+        for path in self._segments(shard):
+            dead += self._scan_segment(path, index)
+        return index, dead
+
+    def _scan_segment(self, path: str, index: Dict[str, _IndexEntry]) -> int:
+        with open(path, "rb") as f:
+            data = f.read()
+        dead = 0
+        offset = 0
+        end = len(data)
+        while offset < end:
+            body_start = offset + _HEADER.size
+            if body_start <= end:
+                length, crc, written_at = _HEADER.unpack_from(data, offset)
+                body = data[body_start:body_start + length]
+            if body_start > end or len(body) < length or zlib.crc32(body) != crc:
+                # Torn write at the tail of a segment; everything after it is unusable.
+                # Writers hold the shard lock too, so this is never one still in progress.
+                self._stats["corrupt_records"] += 1
+                logger.warning(f"Lesson store: truncating corrupt tail of {path} at {offset}")
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+                return dead
+            try:
+                key = orjson.loads(body)["key"]
+            except Exception:
+                self._stats["corrupt_records"] += 1
+                offset = body_start + length
+                continue
+            if key in index:
+                dead += 1
+            index[key] = _IndexEntry(path, body_start, length, written_at)
+            offset = body_start + length
+        return dead
+
+    def _replace_shard_index(self, shard: int, index: Dict[str, _IndexEntry]) -> None:
+        for key in [k for k in self._index if self._shard_for(k) == shard]:
+            if key not in index:
+                del self._index[key]
+        self._index.update(index)
+
+    def _reload_shard(self, shard: int) -> None:
+        """Re-index a shard from disk after another worker compacted or appended to it."""
+        with self._shard_lock(shard):
+            index, _ = self._scan_shard(shard)
+            self._replace_shard_index(shard, index)
+            self._stats["records"] = len(self._index)
+
+    async def open(self) -> None:
+        """Rebuild the index from disk (idempotent)."""
+        if self._opened:
+            return
+        self._opened = True
+        try:
+            await asyncio.to_thread(self._load)
+            logger.info(
+                f"Lesson store loaded {len(self._index)} lessons from {self._dir} "
+                f"in {self._stats['load_seconds']}s"
+            )
+        except OSError as e:
+            logger.warning(f"Lesson store disabled ({self._dir}): {e}")
+            self._enabled = False
+
+    # -- records -----------------------------------------------------------
+
+    def _append(self, key: str, payload: bytes, written_at: Optional[float] = None) -> _IndexEntry:
+        shard = self._shard_for(key)
+        with self._shard_lock(shard):
+            # Other workers append and roll segments too; the directory is the source of truth
+            segments = self._segments(shard)
+            path = segments[-1] if segments else None
+            if path is None or os.path.getsize(path) >= self._segment_bytes:
+                path = self._new_segment_path(shard, path)
+            written_at = written_at or time.time()
+            header = _HEADER.pack(len(payload), zlib.crc32(payload), written_at)
+            with open(path, "ab") as f:
+                offset = f.tell() + _HEADER.size
+                f.write(header + payload)
+                f.flush()
+                os.fsync(f.fileno())
+            return _IndexEntry(path, offset, len(payload), written_at)
+
+    @staticmethod
+    def _decode(key: str, entry: _IndexEntry, record: bytes) -> Optional[Dict[str, Any]]:
+        """Payload of ``record`` (header + body) if it is intact and belongs to ``key``."""
+        if len(record) < _HEADER.size + entry.length:
+            return None
+        length, crc, _ = _HEADER.unpack_from(record)
+        body = record[_HEADER.size:]
+        if length != entry.length or zlib.crc32(body) != crc:
+            return None
+        try:
+            payload = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return None
+        return payload if payload.get("key") == key else None
+
+    def _read(self, key: str, entry: _IndexEntry) -> Optional[Dict[str, Any]]:
+        """Record for ``key`` at ``entry``, or None if the segment no longer holds it."""
+        try:
+            with open(entry.segment, "rb") as f:
+                f.seek(entry.offset - _HEADER.size)
+                return self._decode(key, entry, f.read(_HEADER.size + entry.length))
+        except FileNotFoundError:
+            # Compacted away by another worker
+            return None
+
+    async def put(self, key: str, topic: str, age: Optional[int], lesson: Dict[str, Any], sanitized: bool = False) -> bool:
+        """Append a lesson; the newest record for a key wins.
+
+        ``sanitized`` marks lessons already passed through the response model's
+        sanitizing validators; records without it hold raw LLM text.
+        """
+        if not self._enabled or not self._opened:
+            return False
+        try:
+            payload = orjson.dumps({"key": key, "topic": topic, "age": age, "lesson": lesson, "sanitized": sanitized})
+            entry = await asyncio.to_thread(self._append, key, payload)
+        except Exception as e:
+            logger.warning(f"Lesson store write failed for {key}: {e}")
+            return False
+        if key in self._index:
+            self._stats["dead_records"] += 1
+        else:
+            self._stats["records"] += 1
+        self._index[key] = entry
+        self._stats["writes"] += 1
+        return True
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return ``{"key", "topic", "age", "lesson", "sanitized", "written_at"}`` if stored and younger than max age.
+
+        Records written before ``sanitized`` existed lack the field and count as raw.
+        """
+        entry = self._index.get(key)
+        if entry is None or not self._enabled:
+            return None
+        if time.time() - entry.written_at > self._max_age:
+            return None
+        try:
+            record = await asyncio.to_thread(self._read, key, entry)
+            if record is None:
+                await asyncio.to_thread(self._reload_shard, self._shard_for(key))
+                entry = self._index.get(key)
+                if entry is None or time.time() - entry.written_at > self._max_age:
+                    return None
+                record = await asyncio.to_thread(self._read, key, entry)
+        except Exception as e:
+            logger.warning(f"Lesson store read failed for {key}: {e}")
+            return None
+        if record is None:
+            return None
+        record["written_at"] = entry.written_at
+        self._stats["reads"] += 1
+        return record
+
+    def contains(self, key: str) -> bool:
+        """True if a lesson younger than max age is stored for ``key``."""
+        entry = self._index.get(key)
+        return entry is not None and time.time() - entry.written_at <= self._max_age
+
+    def recent_keys(self, limit: int) -> List[str]:
+        """Keys of the most recently written lessons within max age, newest first."""
+        cutoff = time.time() - self._max_age
+        live = [(e.written_at, k) for k, e in self._index.items() if e.written_at >= cutoff]
+        live.sort(reverse=True)
+        return [k for _, k in live[:limit]]
+
+    async def load_recent(self, limit: int = LESSON_STORE_WARM_LIMIT) -> List[Dict[str, Any]]:
+        """Read the most recently written lessons, newest first, each with its ``written_at``."""
+        await self.open()
+        keys = self.recent_keys(limit)
+        if not keys:
+            return []
+        entries = [self._index[k] for k in keys]
+        records = await asyncio.to_thread(self._read_many, keys, entries)
+        loaded = []
+        for entry, record in zip(entries, records):
+            if record:
+                record["written_at"] = entry.written_at
+                loaded.append(record)
+        self._stats["reads"] += len(loaded)
+        return loaded
+
+    def _read_many(self, keys: List[str], entries: List[_IndexEntry]) -> List[Optional[Dict[str, Any]]]:
+        # Read in file order so boot warm-up is a sequential scan rather than random seeks
+        order = sorted(range(len(entries)), key=lambda i: (entries[i].segment, entries[i].offset))
+        results: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+        handles: Dict[str, Any] = {}
+        try:
+            for i in order:
+                entry = entries[i]
+                f = handles.get(entry.segment)
+                if f is None:
+                    try:
+                        f = handles[entry.segment] = open(entry.segment, "rb")
+                    except FileNotFoundError:
+                        continue
+                f.seek(entry.offset - _HEADER.size)
+                results[i] = self._decode(keys[i], entry, f.read(_HEADER.size + entry.length))
+        finally:
+            for f in handles.values():
+                f.close()
+        return results
+
+    # -- maintenance -------------------------------------------------------
+
+    async def rekey(self, key_fn: Callable[[str, Optional[int]], str]) -> Dict[str, str]:
+        """Move every record to ``key_fn(topic, age)``; returns ``{old_key: new_key}`` for moved records.
+
+        When several old keys map to one new key, the most recently written
+        record wins. Old records become dead and are dropped by ``compact``.
+        """
+        await self.open()
+        if not self._enabled:
+            return {}
+        keys = list(self._index)
+        entries = [self._index[k] for k in keys]
+        records = await asyncio.to_thread(self._read_many, keys, entries)
+        moved: Dict[str, str] = {}
+        newest: Dict[str, Tuple[_IndexEntry, Dict[str, Any]]] = {}
+        for old_key, entry, record in zip(keys, entries, records):
+            if not record:
+                continue
+            new_key = key_fn(record.get("topic") or "", record.get("age"))
+            if new_key == old_key:
+                continue
+            moved[old_key] = new_key
+            if new_key not in newest or entry.written_at > newest[new_key][0].written_at:
+                newest[new_key] = (entry, record)
+        for new_key, (entry, record) in newest.items():
+            current = self._index.get(new_key)
+            if current is not None and current.written_at >= entry.written_at:
+                continue
+            payload = orjson.dumps(
+                {
+                    "key": new_key,
+                    "topic": record["topic"],
+                    "age": record["age"],
+                    "lesson": record["lesson"],
+                    "sanitized": bool(record.get("sanitized")),
+                }
+            )
+            self._index[new_key] = await asyncio.to_thread(self._append, new_key, payload, entry.written_at)
+            self._stats["dead_records" if current is not None else "records"] += 1
+        for old_key in moved:
+            del self._index[old_key]
+            self._stats["records"] -= 1
+            self._stats["dead_records"] += 1
+        return moved
+
+    def _compact_shard(self, shard: int) -> int:
+        cutoff = time.time() - self._max_age
+        with self._shard_lock(shard):
+            old_segments = self._segments(shard)
+            if not old_segments:
+                return 0
+            # Rescan rather than trust this worker's index, which misses other workers' appends
+            index, dead = self._scan_shard(shard)
+            live = [(k, e) for k, e in index.items() if e.written_at >= cutoff]
+            if not dead and len(live) == len(index):
+                # Nothing to drop; another worker probably compacted it already
+                self._replace_shard_index(shard, index)
+                return len(live)
+            live.sort(key=lambda item: item[1].written_at)
+            target = self._new_segment_path(shard, old_segments[-1])
+            tmp = target + ".tmp"
+            new_entries: Dict[str, _IndexEntry] = {}
+            offset = 0
+            with open(tmp, "wb") as out:
+                for key, entry in live:
+                    with open(entry.segment, "rb") as f:
+                        f.seek(entry.offset)
+                        body = f.read(entry.length)
+                    out.write(_HEADER.pack(len(body), zlib.crc32(body), entry.written_at) + body)
+                    new_entries[key] = _IndexEntry(target, offset + _HEADER.size, len(body), entry.written_at)
+                    offset += _HEADER.size + len(body)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, target)
+            self._replace_shard_index(shard, new_entries)
+            for path in old_segments:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            return len(new_entries)
+
+    async def compact(self) -> Dict[str, int]:
+        """Rewrite each shard with only the latest, unexpired record per key."""
+        await self.open()
+        if not self._enabled:
+            return {"live": 0}
+        live = 0
+        for shard in range(self._shards):
+            live += await asyncio.to_thread(self._compact_shard, shard)
+        self._stats["records"] = live
+        self._stats["dead_records"] = 0
+        return {"live": live}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def marker_path(self, name: str) -> str:
+        """Path of a marker file recording a one-time operation on this store."""
+        return os.path.join(self._dir, f".{name}")
+
+    @asynccontextmanager
+    async def exclusive(self, name: str) -> AsyncIterator[None]:
+        """Hold a named store-wide lock, so only one worker runs a one-time operation."""
+        with open(self.marker_path(name) + ".lock", "ab") as lock:
+            if FCNTL_AVAILABLE:
+                await asyncio.to_thread(fcntl.flock, lock.fileno(), fcntl.LOCK_EX)
+            yield
+
+    async def reload(self) -> None:
+        """Re-index every shard from disk, picking up records written by other workers."""
+        await self.open()
+        if not self._enabled:
+            return
+        for shard in range(self._shards):
+            await asyncio.to_thread(self._reload_shard, shard)
+
+    def needs_compaction(self) -> bool:
+        return self._stats["dead_records"] > max(100, self._stats["records"])
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["indexed"] = len(self._index)
+        stats["enabled"] = self._enabled
+        return stats
+
+
+_store: Optional[LessonStore] = None
+
+
+def get_lesson_store() -> LessonStore:
+    """Return the process-wide lesson store."""
+    global _store
+    if _store is None:
+        _store = LessonStore()
+    return _store
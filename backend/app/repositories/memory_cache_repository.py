@@ -1,36 +1,107 @@
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import sys
 import time
-from cachetools import TTLCache
+
+import orjson
 
 from app.repositories.interfaces import ICacheRepository
 
+
+def _estimate_size(value: Any) -> int:
+    """Approximate the memory held by a cached value, in bytes."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", "ignore"))
+    try:
+        return len(orjson.dumps(value))
+    except TypeError:
+        return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+class _Namespace:
+    """Entries of one namespace in LRU order plus an expiry heap."""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.heap: List[Tuple[float, int, str, _Entry]] = []
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rejected": 0}
+
+    def remove(self, key: str) -> Optional[_Entry]:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def purge_expired(self, now: float) -> None:
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            _, _, key, entry = heapq.heappop(heap)
+            # Skip heap records for entries that were overwritten or already removed
+            if self.entries.get(key) is entry:
+                self.remove(key)
+                self.stats["expirations"] += 1
+        # Overwrites leave dead heap records behind; rebuild once they dominate
+        if len(heap) > 2 * len(self.entries) + 64:
+            self.heap = [item for item in heap if self.entries.get(item[2]) is item[3]]
+            heapq.heapify(self.heap)
+
+
 class MemoryCacheRepository(ICacheRepository):
-    """Simple in-memory cache repository using TTLCache per namespace.
+    """In-memory cache repository with per-entry TTLs.
 
     - No external dependencies; safe for local/dev use
-    - Namespaced caches with configurable TTLs via constructor
+    - Each entry keeps its own TTL; expired entries are dropped via an expiry heap
+    - Every namespace is bounded by item count and by approximate size in bytes,
+      evicting least recently used entries first
     """
 
-    def __init__(self, default_ttl: int = 3600, maxsize: int = 1000):
-        self._caches: Dict[str, TTLCache] = {}
+    def __init__(self, default_ttl: int = 3600, maxsize: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self._caches: Dict[str, _Namespace] = {}
         self._default_ttl = default_ttl
         self._default_maxsize = maxsize
+        self._max_bytes = max_bytes
+        self._seq = itertools.count()
         self._stats = {"hits": 0, "misses": 0, "errors": 0, "last_reset": time.time()}
 
-    def _get_cache(self, namespace: str) -> TTLCache:
+    def _get_cache(self, namespace: str) -> _Namespace:
         if namespace not in self._caches:
-            self._caches[namespace] = TTLCache(maxsize=self._default_maxsize, ttl=self._default_ttl)
+            self._caches[namespace] = _Namespace()
         return self._caches[namespace]
 
+    def _enforce_bounds(self, cache: _Namespace) -> None:
+        while cache.entries and (len(cache.entries) > self._default_maxsize or cache.bytes > self._max_bytes):
+            _, entry = cache.entries.popitem(last=False)
+            cache.bytes -= entry.size
+            cache.stats["evictions"] += 1
+
     async def get(self, key: str, namespace: str = "default") -> Optional[Any]:
         try:
             cache = self._get_cache(namespace)
-            val = cache.get(key)
-            if val is None:
+            now = time.monotonic()
+            cache.purge_expired(now)
+            entry = cache.entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                cache.stats["misses"] += 1
                 self._stats["misses"] += 1
-            else:
-                self._stats["hits"] += 1
-            return val
+                return None
+            cache.entries.move_to_end(key)
+            cache.stats["hits"] += 1
+            self._stats["hits"] += 1
+            return entry.value
         except Exception:
             self._stats["errors"] += 1
             return None
@@ -38,13 +109,19 @@ class MemoryCacheRepository(ICacheRepository):
     async def set(self, key: str, value: Any, ttl: Optional[int] = None, namespace: str = "default") -> bool:
         try:
             cache = self._get_cache(namespace)
-            if ttl and ttl > 0:
-                temp = TTLCache(maxsize=cache.maxsize, ttl=ttl)
-                # Move existing items over to temp not necessary; set directly with ttl superseding
-                temp[key] = value
-                self._caches[namespace] = temp
-            else:
-                cache[key] = value
+            size = _estimate_size(value)
+            if size > self._max_bytes:
+                cache.stats["rejected"] += 1
+                return False
+            now = time.monotonic()
+            cache.purge_expired(now)
+            expires_at = now + (ttl if ttl and ttl > 0 else self._default_ttl)
+            entry = _Entry(value, expires_at, size)
+            cache.remove(key)
+            cache.entries[key] = entry
+            cache.bytes += size
+            heapq.heappush(cache.heap, (expires_at, next(self._seq), key, entry))
+            self._enforce_bounds(cache)
             return True
         except Exception:
             self._stats["errors"] += 1
@@ -52,9 +129,7 @@ class MemoryCacheRepository(ICacheRepository):
 
     async def delete(self, key: str, namespace: str = "default") -> bool:
         try:
-            cache = self._get_cache(namespace)
-            if key in cache:
-                del cache[key]
+            self._get_cache(namespace).remove(key)
             return True
         except Exception:
             self._stats["errors"] += 1
@@ -62,11 +137,32 @@ class MemoryCacheRepository(ICacheRepository):
 
     async def exists(self, key: str, namespace: str = "default") -> bool:
         try:
-            cache = self._get_cache(namespace)
-            return key in cache
+            entry = self._get_cache(namespace).entries.get(key)
+            return entry is not None and entry.expires_at > time.monotonic()
         except Exception:
             self._stats["errors"] += 1
             return False
 
+    async def clear(self, namespace: Optional[str] = None) -> int:
+        try:
+            if namespace is None:
+                removed = sum(len(c.entries) for c in self._caches.values())
+                self._caches.clear()
+            else:
+                cache = self._caches.pop(namespace, None)
+                removed = len(cache.entries) if cache is not None else 0
+            self._stats["last_reset"] = time.time()
+            return removed
+        except Exception:
+            self._stats["errors"] += 1
+            return 0
+
     async def get_stats(self) -> Dict[str, Any]:
-        return dict(self._stats)
\ No newline at end of file
+        stats: Dict[str, Any] = dict(self._stats)
+        now = time.monotonic()
+        namespaces = {}
+        for name, cache in self._caches.items():
+            cache.purge_expired(now)
+            namespaces[name] = dict(cache.stats, entries=len(cache.entries), bytes=cache.bytes)
+        stats["namespaces"] = namespaces
+        return stats
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from app.repositories.interfaces import ILessonRepository
@@ -47,4 +47,17 @@ class MemoryLessonRepository(ILessonRepository):
             if t:
                 freq[t] = freq.get(t, 0) + 1
         popular = sorted(freq.items(), key=lambda x: x[1], reverse=True)
-        return [t for t, _ in popular[:limit]]
\ No newline at end of file
+        return [t for t, _ in popular[:limit]]
+
+    async def get_popular_topics_by_age(self, limit: int = 200, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        freq: Dict[Tuple[str, Optional[int]], int] = {}
+        cutoff = since.isoformat() if since else None
+        for e in self._history:
+            t = e.get("title")
+            if not t or (cutoff and e.get("created_at", "") < cutoff):
+                continue
+            content = e.get("content")
+            age = content.get("age") if isinstance(content, dict) else None
+            freq[(t, age)] = freq.get((t, age), 0) + 1
+        popular = sorted(freq.items(), key=lambda x: x[1], reverse=True)
+        return [{"topic": t, "age": age, "count": n} for (t, age), n in popular[:limit]]
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Shared async Redis connection.
+
+One ``redis.asyncio`` client per process is reused by the cache, distributed
+locks and rate limiting. When Redis is unreachable callers get ``None`` and use
+their in-process fallback; after a connection error the client is closed and
+reconnection is retried after a short backoff instead of on every request.
+Command errors (a bad key type, a missing script) leave the connection alone.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    RedisConnectionError = RedisTimeoutError = None
+    REDIS_AVAILABLE = False
+
+from app.config import REDIS_RETRY_SECONDS, REDIS_SOCKET_TIMEOUT
+from app.settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_retry_at = 0.0
+# Concurrent first requests would otherwise each build (and leak) their own client
+_connect_lock = asyncio.Lock()
+
+
+async def get_async_redis():
+    """Return a connected async Redis client, or None if Redis is unavailable."""
+    if not REDIS_AVAILABLE:
+        return None
+    if _client is not None:
+        return _client
+    if time.monotonic() < _retry_at:
+        return None
+    async with _connect_lock:
+        if _client is not None or time.monotonic() < _retry_at:
+            return _client
+        return await _connect()
+
+
+async def _connect():
+    global _client, _retry_at
+    settings = load_settings()
+    options = {
+        "decode_responses": False,
+        "socket_connect_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "health_check_interval": 30,
+    }
+    client = None
+    try:
+        if settings.redis_url:
+            client = aioredis.from_url(settings.redis_url, **options)
+        else:
+            client = aioredis.Redis(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db,
+                password=settings.redis_password,
+                **options,
+            )
+        await client.ping()
+        _client = client
+        logger.info("✅ Redis connection established")
+    except Exception as e:
+        logger.warning(f"Redis connection failed, using in-process fallback: {e}")
+        _retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+        if client is not None:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+    return _client
+
+
+def _is_connection_error(error: Optional[BaseException]) -> bool:
+    if error is None:
+        return True
+    if isinstance(error, (RedisConnectionError, RedisTimeoutError)):
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+
+async def mark_redis_unavailable(error: Optional[BaseException] = None) -> None:
+    """Close the shared client after a connection error so callers back off.
+
+    Other errors are the command's fault, not the connection's, and are ignored.
+    """
+    global _client, _retry_at
+    if not _is_connection_error(error):
+        return
+    client, _client = _client, None
+    _retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+    if client is not None:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.debug(f"Error closing Redis client: {e}")
+
+
+async def close_async_redis() -> None:
+    """Close the shared client on shutdown."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing Redis client: {e}")
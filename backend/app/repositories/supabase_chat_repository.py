@@ -1,10 +1,9 @@
 from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
 
-from supabase import create_client, Client
-
 from app.config import SUPABASE_URL, SUPABASE_KEY
 from app.repositories.interfaces import IChatRepository
+from app.repositories.supabase_client import get_postgrest_client
 
 
 class SupabaseChatRepository(IChatRepository):
@@ -14,12 +13,11 @@ class SupabaseChatRepository(IChatRepository):
     into controllers/services via the `IChatRepository` interface.
     """
 
-    def __init__(self, url: Optional[str] = None, key: Optional[str] = None) -> None:
-        url = (url or SUPABASE_URL or "").strip()
-        key = (key or SUPABASE_KEY or "").strip()
-        if not url or not key:
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None, client: Any = None) -> None:
+        # Shared async PostgREST client; one per process and key
+        self.client = client or get_postgrest_client(url or SUPABASE_URL, key or SUPABASE_KEY)
+        if self.client is None:
             raise ValueError("Supabase URL and KEY must be provided")
-        self.client: Client = create_client(url, key)
         self.table_name = "chat_messages"
 
     async def append_message(self, sid: str, role: str, content: str) -> bool:
@@ -33,7 +31,7 @@ class SupabaseChatRepository(IChatRepository):
             "created_at": now,
         }
         try:
-            res = self.client.table(self.table_name).insert(payload).execute()
+            res = await self.client.table(self.table_name).insert(payload).execute()
             return bool(getattr(res, "data", None))
         except Exception:
             return False
@@ -42,7 +40,7 @@ class SupabaseChatRepository(IChatRepository):
         if not sid:
             return []
         try:
-            res = (
+            res = await (
                 self.client.table(self.table_name)
                 .select("sid, role, content, created_at")
                 .eq("sid", sid)
@@ -0,0 +1,172 @@
+"""
+Shared async Supabase (PostgREST) access.
+
+Repositories and services query Supabase tables through ``AsyncPostgrestClient``
+instances whose ``execute()`` is awaited on the event loop, instead of a
+synchronous ``supabase.Client`` created per request. There is one client per
+API key (the service role and anon keys send different auth headers) and all
+of them share a single pooled transport, HTTP/2 when ``h2`` is installed, so
+concurrent queries multiplex over a few warm TLS connections. Pool usage and
+saturation (requests that found every connection busy) are reported by
+``get_supabase_pool_stats``.
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+try:
+    from postgrest import AsyncPostgrestClient
+    POSTGREST_AVAILABLE = True
+except ImportError:
+    AsyncPostgrestClient = None
+    POSTGREST_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+from app.config import (
+    SUPABASE_MAX_CONNECTIONS,
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+    SUPABASE_TIMEOUT_SECONDS,
+)
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledTransport(httpx.AsyncBaseTransport):
+    """Connection pool shared by every Supabase client, counting its own usage."""
+
+    def __init__(self, max_connections: int, max_keepalive_connections: int):
+        self.max_connections = max_connections
+        self.http2 = HTTP2_AVAILABLE
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+        self._closed = False
+        self.stats = {"requests": 0, "errors": 0, "in_flight": 0, "peak_in_flight": 0, "saturated": 0}
+
+    def _connections(self) -> list:
+        # httpcore pool behind the httpx transport
+        pool = getattr(self._transport, "_pool", None)
+        return list(getattr(pool, "connections", ()) or ())
+
+    def _saturated(self) -> bool:
+        connections = self._connections()
+        if len(connections) < self.max_connections:
+            return False
+        return not any(connection.is_available() for connection in connections)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        stats["requests"] += 1
+        if self._saturated():
+            stats["saturated"] += 1
+        stats["in_flight"] += 1
+        if stats["in_flight"] > stats["peak_in_flight"]:
+            stats["peak_in_flight"] = stats["in_flight"]
+        try:
+            return await self._transport.handle_async_request(request)
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            # Counted until headers arrive; PostgREST bodies are small and read right after
+            stats["in_flight"] -= 1
+
+    def pool_stats(self) -> Dict[str, Any]:
+        connections = self._connections()
+        return {
+            **self.stats,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+        }
+
+    async def aclose(self) -> None:
+        # Every client wrapping this transport closes it; only the first close counts
+        if not self._closed:
+            self._closed = True
+            await self._transport.aclose()
+
+
+_transport: Optional[_PooledTransport] = None
+_clients: Dict[Tuple[str, str], Tuple[Any, httpx.AsyncClient]] = {}
+
+
+def _shared_transport() -> _PooledTransport:
+    global _transport
+    if _transport is None:
+        _transport = _PooledTransport(SUPABASE_MAX_CONNECTIONS, SUPABASE_MAX_KEEPALIVE_CONNECTIONS)
+    return _transport
+
+
+def get_postgrest_client(url: Optional[str] = None, key: Optional[str] = None):
+    """Return the shared async PostgREST client for ``url``/``key``, creating it on first use.
+
+    Defaults to the configured project with the service role key (or the anon
+    key when no service role key is set). Returns None when Supabase is not
+    configured or the postgrest package is missing.
+    """
+    if url is None or key is None:
+        settings = get_settings()
+        url = settings.supabase_url if url is None else url
+        key = (settings.supabase_service_role_key or settings.supabase_anon_key) if key is None else key
+    url = (url or "").strip().rstrip("/")
+    key = (key or "").strip()
+    if not POSTGREST_AVAILABLE or not url or not key:
+        return None
+    entry = _clients.get((url, key))
+    if entry is not None:
+        return entry[0]
+    try:
+        http_client = httpx.AsyncClient(
+            transport=_shared_transport(),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT_SECONDS, connect=5.0),
+            follow_redirects=True,
+        )
+        client = AsyncPostgrestClient(
+            f"{url}/rest/v1",
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "apiKey": key,
+                "Authorization": f"Bearer {key}",
+            },
+            http_client=http_client,
+        )
+    except Exception as e:
+        logger.error(f"Failed to initialize Supabase client: {e}")
+        return None
+    _clients[(url, key)] = (client, http_client)
+    return client
+
+
+def get_supabase_pool_stats() -> Dict[str, Any]:
+    """Usage of the shared Supabase connection pool."""
+    stats = _transport.pool_stats() if _transport is not None else {}
+    return {**stats, "clients": len(_clients)}
+
+
+async def close_supabase_clients() -> None:
+    """Close the shared clients and their connection pool on shutdown."""
+    global _transport
+    entries = list(_clients.values())
+    _clients.clear()
+    for _, http_client in entries:
+        try:
+            await http_client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing Supabase client: {e}")
+    transport, _transport = _transport, None
+    if transport is not None:
+        await transport.aclose()
@@ -1,11 +1,11 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
-from supabase import create_client, Client
 import orjson
 
 import logging
 from app.repositories.interfaces import ILessonRepository
+from app.repositories.supabase_client import get_postgrest_client
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +13,18 @@ logger = logging.getLogger(__name__)
 class SupabaseRepository(ILessonRepository):
     """Supabase repository for lesson persistence (A-4: Vendor isolation)."""
 
-    def __init__(self, url: str, anon_key: str):
-        """Initialize Supabase client."""
-        self.client: Client = create_client(url, anon_key)
+    def __init__(self, url: Optional[str] = None, anon_key: Optional[str] = None, client: Any = None):
+        """Use the shared async PostgREST client for this project and key."""
+        self.client = client or get_postgrest_client(url, anon_key)
+        if self.client is None:
+            raise ValueError("Supabase URL and KEY must be provided")
 
     async def save_lesson_history(
         self, user_id: str, topic: str, lesson_data: Dict[str, Any]
     ) -> str:
         """Save lesson to history."""
         try:
-            result = (
+            result = await (
                 self.client.table("searches")
                 .insert(
                     {
@@ -44,7 +46,7 @@ class SupabaseRepository(ILessonRepository):
     ) -> List[Dict[str, Any]]:
         """Get user's lesson history (P-2: No N+1 queries)."""
         try:
-            result = (
+            result = await (
                 self.client.table("searches")
                 .select("id,title,created_at")
                 .eq("uid", user_id)
@@ -61,7 +63,7 @@ class SupabaseRepository(ILessonRepository):
     async def get_lesson_by_id(self, lesson_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific lesson by its ID."""
         try:
-            result = (
+            result = await (
                 self.client.table("searches")
                 .select("content")
                 .eq("id", lesson_id)
@@ -76,7 +78,7 @@ class SupabaseRepository(ILessonRepository):
     async def delete_lesson_by_id(self, lesson_id: str) -> bool:
         """Delete a specific lesson by its ID."""
         try:
-            self.client.table("searches").delete().eq("id", lesson_id).execute()
+            await self.client.table("searches").delete().eq("id", lesson_id).execute()
             return True
         except Exception as e:
             logger.error(f"Failed to delete lesson by ID {lesson_id}: {e}")
@@ -85,7 +87,7 @@ class SupabaseRepository(ILessonRepository):
     async def get_popular_topics(self, limit: int = 10) -> List[str]:
         """Get most popular topics by frequency in searches table."""
         try:
-            result = (
+            result = await (
                 self.client.table("searches").select("title").limit(1000).execute()
             )
             titles = [row.get("title") for row in (result.data or []) if row.get("title")]
@@ -98,3 +100,38 @@ class SupabaseRepository(ILessonRepository):
         except Exception as e:
             logger.error(f"Failed to compute popular topics: {e}")
             return []
+
+    async def get_popular_topics_by_age(
+        self, limit: int = 200, since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Get most searched (topic, age) pairs; ages come from learner profiles."""
+        try:
+            query = self.client.table("searches").select("uid,title")
+            if since is not None:
+                query = query.gte("created_at", since.isoformat())
+            result = await query.order("created_at", desc=True).limit(5000).execute()
+            rows = [row for row in (result.data or []) if row.get("title")]
+            uids = list({row["uid"] for row in rows if row.get("uid")})
+            ages: Dict[str, Optional[int]] = {}
+            for i in range(0, len(uids), 200):
+                profiles = await (
+                    self.client.table("user_learning_profiles")
+                    .select("user_id,learning_profile")
+                    .in_("user_id", uids[i:i + 200])
+                    .execute()
+                )
+                for profile in profiles.data or []:
+                    age = (profile.get("learning_profile") or {}).get("age")
+                    try:
+                        ages[profile["user_id"]] = int(age) if age is not None else None
+                    except (TypeError, ValueError):
+                        ages[profile["user_id"]] = None
+            freq: Dict[Tuple[str, Optional[int]], int] = {}
+            for row in rows:
+                pair = (row["title"], ages.get(row.get("uid")))
+                freq[pair] = freq.get(pair, 0) + 1
+            popular = sorted(freq.items(), key=lambda x: x[1], reverse=True)
+            return [{"topic": t, "age": age, "count": n} for (t, age), n in popular[:limit]]
+        except Exception as e:
+            logger.error(f"Failed to compute popular topics by age: {e}")
+            return []
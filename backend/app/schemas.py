@@ -42,6 +42,7 @@ class StructuredLessonTTSRequest(BaseModel):
     mode: Optional[str] = "full"  # full, summary, or section
     section_index: Optional[int] = None  # Specific section index for section mode
     voice: Optional[str] = "default"
+    pipelined: Optional[bool] = False  # Stream sentence chunks as they are synthesized
 
 
 class LessonRequest(BaseModel):
@@ -0,0 +1,30 @@
+"""
+Age bands for lesson generation.
+
+The lesson prompt only distinguishes a handful of audiences, so everything
+keyed on a learner's age (prompts, cache and single-flight keys, the persisted
+lesson index, the semantic index, pre-generation) uses the band rather than
+the raw integer: ages 6 to 12 all share one "child" lesson.
+"""
+from typing import Optional
+
+
+def age_band(age: Optional[int]) -> str:
+    """Audience band the lesson prompt uses for an age."""
+    if age is None:
+        return "general"
+    if age <= 2:
+        return "toddler"
+    if age <= 5:
+        return "preschooler"
+    if age <= 12:
+        return "child"
+    if age <= 18:
+        return "teenager"
+    return "adult"
+
+
+def audience_label(age: Optional[int]) -> str:
+    """How the lesson prompt describes the learner for an age."""
+    band = age_band(age)
+    return "general audience" if band == "general" else band
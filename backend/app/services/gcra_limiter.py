@@ -0,0 +1,99 @@
+"""
+In-process rate limits with the generic cell rate algorithm (GCRA).
+
+A limit of ``limit`` requests per ``window`` seconds spaces requests
+``window / limit`` seconds apart while allowing a burst of ``limit``. Each
+key only stores its theoretical arrival time (TAT), the instant its bucket
+would be empty again, so a check is a dict lookup and a few float operations
+no matter how busy the client is. Keys live in a bounded LRU; the least
+recently seen one is dropped first, and a dropped key whose TAT already
+passed loses nothing. Checks run on the event loop thread only, so no lock
+is taken.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Sequence, Tuple
+
+from app.config import RATE_LIMIT_MAX_KEYS
+
+# Float slack so exactly ``limit`` requests fit in a burst
+_EPSILON = 1e-9
+
+
+class _Bucket:
+    __slots__ = ("tat",)
+
+    def __init__(self, tat: float):
+        self.tat = tat
+
+
+class GCRALimiter:
+    """Bounded LRU of GCRA buckets, one float per key."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max(1, max_keys)
+        self._clock = clock
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._stats = {"checks": 0, "rejected": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _bucket(self, key: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            self._buckets.move_to_end(key)
+            return bucket
+        bucket = self._buckets[key] = _Bucket(now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self._stats["evictions"] += 1
+        return bucket
+
+    def check_windows(
+        self, identity: str, windows: Sequence[Tuple[str, int, int]], now: Optional[float] = None
+    ) -> Tuple[int, int]:
+        """Count a request against ``(name, window_seconds, limit)`` windows, in order.
+
+        Returns ``(exceeded, first_count)`` like ``RedisRateLimiter.check``:
+        the 1-based index of the first window over its limit (0 when allowed)
+        and the requests held in the first window. A rejected request consumes
+        nothing, so a client that backs off regains capacity on schedule.
+        """
+        if now is None:
+            now = self._clock()
+        self._stats["checks"] += 1
+        buckets = []
+        first_count = 0
+        for index, (name, window, limit) in enumerate(windows, 1):
+            bucket = self._bucket(f"{identity}:{name}" if name else identity, now)
+            interval = window / limit
+            new_tat = max(bucket.tat, now) + interval
+            held = new_tat - now
+            if index == 1:
+                first_count = math.ceil(held / interval - _EPSILON)
+            if held > window + _EPSILON:
+                self._stats["rejected"] += 1
+                return index, first_count
+            buckets.append((bucket, new_tat))
+        for bucket, new_tat in buckets:
+            bucket.tat = new_tat
+        return 0, first_count
+
+    def check(self, key: str, limit: int, window: int, now: Optional[float] = None) -> Tuple[bool, int]:
+        """Count a request against one window; returns ``(allowed, count)``."""
+        exceeded, count = self.check_windows(key, [("", window, limit)], now)
+        return not exceeded, count
+
+    def wait_time(self, key: str, limit: int, window: int, now: Optional[float] = None) -> float:
+        """Seconds until ``key`` may make another request under this window."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        if now is None:
+            now = self._clock()
+        return max(0.0, bucket.tat + window / limit - window - now)
+
+    def stats(self) -> dict:
+        return {**self._stats, "keys": len(self._buckets), "max_keys": self.max_keys}
@@ -1,19 +1,16 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
-from supabase import Client
-from app.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
-from supabase import create_client
 from app.services.reports_service import ReportsService
 
 
 class GuardianReportsService:
     """Service for generating guardian reports for Lana AI users."""
 
-    def __init__(self, supabase_url: str, supabase_key: str):
-        """Initialize with Supabase client."""
-        self.client: Client = create_client(supabase_url, supabase_key)
-        self.reports_service = ReportsService(supabase_url, supabase_key)
+    def __init__(self, client: Any):
+        """Initialize with the shared async PostgREST client."""
+        self.client = client
+        self.reports_service = ReportsService(client)
 
     async def generate_guardian_report(self, child_uid: str, report_type: str = 'weekly') -> Dict[str, Any]:
         """
@@ -54,7 +51,7 @@ class GuardianReportsService:
     async def _get_user_events(self, user_id: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
         """Get user events from the user_events table."""
         try:
-            result = (
+            result = await (
                 self.client.table("user_events")
                 .select("*")
                 .eq("user_id", user_id)
@@ -71,7 +68,7 @@ class GuardianReportsService:
     async def _get_learning_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user learning profile from the user_learning_profiles table."""
         try:
-            result = (
+            result = await (
                 self.client.table("user_learning_profiles")
                 .select("learning_profile")
                 .eq("user_id", user_id)
@@ -189,7 +186,7 @@ class GuardianReportsService:
         try:
             # Get guardians based on the report type they want
             column_name = f"{report_type}_report" if report_type in ['weekly', 'monthly'] else 'weekly_report'
-            result = (
+            result = await (
                 self.client.table("guardians")
                 .select("child_uid, email")
                 .eq(column_name, True)
@@ -218,7 +215,7 @@ class GuardianReportsService:
             The saved report record or None if failed
         """
         try:
-            result = (
+            result = await (
                 self.client.table("guardian_reports")
                 .insert({
                     "child_uid": child_uid,
@@ -1,5 +1,6 @@
 from typing import Any, Dict, List
 from app.repositories.interfaces import IChatRepository
+from app.services.sanitizer import escape_text as sanitize_text
 
 
 class NotFoundError(Exception):
@@ -10,15 +11,6 @@ class ForbiddenError(Exception):
     pass
 
 
-def sanitize_text(text: str) -> str:
-    import re, html
-    if not text:
-        return ""
-    text = html.escape(text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-
 class HistoryService:
     """Service layer for chat history operations.
 
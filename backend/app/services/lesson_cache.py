@@ -0,0 +1,202 @@
+"""
+Stale-while-revalidate lesson cache.
+
+Lessons are cached with two lifetimes. Until the soft TTL an entry is fresh.
+Between the soft and hard TTL it is still served immediately, flagged as
+stale, while a background refresh regenerates it; the refresh goes through
+the caller's single-flight so workers coalesce on one Groq call. Past the
+hard TTL the entry is gone and the next request computes it inline.
+
+When given a semantic topic index, exact-key misses can also be answered by
+the cached lesson of a near-duplicate topic in the same age band.
+
+Entries are stored already serialized: a small header (fresh-until timestamp
+and a flag saying the lesson went through the response model) followed by the
+lesson's orjson bytes, so a hit can be written to the client as is.
+"""
+import asyncio
+import hashlib
+import logging
+import struct
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import orjson
+
+from app.repositories.interfaces import ICacheRepository
+from app.services.age_bands import age_band
+from app.services.semantic_topic_index import SemanticTopicIndex
+from app.settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "lessons"
+
+# magic, fresh_until, flags; followed by the lesson JSON
+_MAGIC = b"LSN1"
+_HEADER = struct.Struct("<4sdB")
+_VALIDATED = 0x01
+
+
+def lesson_cache_key(topic: str, age: Optional[int]) -> str:
+    """Cache, single-flight and lesson store key for a topic and learner age."""
+    return hashlib.md5(f"{topic}|{age_band(age)}".encode()).hexdigest()[:16]
+
+
+class CachedLesson:
+    """One cache hit: the lesson's JSON bytes plus freshness and validation state."""
+
+    __slots__ = ("key", "body", "fresh_until", "validated", "stale")
+
+    def __init__(self, key: str, body: bytes, fresh_until: float, validated: bool):
+        self.key = key
+        self.body = body
+        self.fresh_until = fresh_until
+        self.validated = validated
+        self.stale = fresh_until <= time.time()
+
+    @property
+    def lesson(self) -> Dict[str, Any]:
+        return orjson.loads(self.body)
+
+
+def _pack(body: bytes, fresh_until: float, validated: bool) -> bytes:
+    return _HEADER.pack(_MAGIC, fresh_until, _VALIDATED if validated else 0) + body
+
+
+def _unpack(key: str, entry: Any) -> CachedLesson:
+    if isinstance(entry, (bytes, bytearray)) and entry[:4] == _MAGIC:
+        _, fresh_until, flags = _HEADER.unpack_from(entry)
+        return CachedLesson(key, bytes(entry[_HEADER.size:]), fresh_until, bool(flags & _VALIDATED))
+    if isinstance(entry, dict) and "fresh_until" in entry and "lesson" in entry:
+        return CachedLesson(key, orjson.dumps(entry["lesson"]), entry["fresh_until"], False)
+    # Entries written before soft TTLs existed expire on their own TTL
+    return CachedLesson(key, orjson.dumps(entry), float("inf"), False)
+
+
+class LessonCache:
+    """Soft/hard TTL wrapper over the ``lessons`` cache namespace."""
+
+    def __init__(
+        self,
+        cache: ICacheRepository,
+        soft_ttl: Optional[int] = None,
+        hard_ttl: Optional[int] = None,
+        topic_index: Optional[SemanticTopicIndex] = None,
+    ):
+        settings = load_settings() if soft_ttl is None or hard_ttl is None else None
+        self._cache = cache
+        self._topic_index = topic_index
+        self._soft_ttl = soft_ttl if soft_ttl is not None else settings.cache_ttl_lessons
+        self._hard_ttl = hard_ttl if hard_ttl is not None else settings.cache_ttl_lessons + settings.cache_stale_lessons
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_failures": 0}
+
+    @property
+    def cache(self) -> ICacheRepository:
+        return self._cache
+
+    async def get_entry(self, key: str) -> Optional[CachedLesson]:
+        """Return the cached lesson without decoding it, or None on a miss."""
+        entry = await self._cache.get(key, namespace=NAMESPACE)
+        if not entry:
+            self._stats["misses"] += 1
+            return None
+        hit = _unpack(key, entry)
+        self._stats["stale_hits" if hit.stale else "fresh_hits"] += 1
+        return hit
+
+    async def get(self, key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """Return ``(lesson, stale)`` or None on a miss."""
+        hit = await self.get_entry(key)
+        return None if hit is None else (hit.lesson, hit.stale)
+
+    async def get_similar_entry(self, topic: str, age: Optional[int]) -> Optional[Tuple[CachedLesson, str]]:
+        """Return ``(hit, matched_topic)`` for a near-duplicate topic; ``hit.key`` is the matched key."""
+        if self._topic_index is None:
+            return None
+        match = self._topic_index.lookup(topic, age)
+        if match is None:
+            return None
+        matched_key, matched_topic, _ = match
+        hit = await self.get_entry(matched_key)
+        if hit is None:
+            # The matched lesson has expired; stop offering it
+            self._topic_index.discard(matched_key, age)
+            return None
+        return hit, matched_topic
+
+    async def get_similar(self, topic: str, age: Optional[int]) -> Optional[Tuple[Dict[str, Any], bool, str, str]]:
+        """Return ``(lesson, stale, matched_key, matched_topic)`` for a near-duplicate topic."""
+        similar = await self.get_similar_entry(topic, age)
+        if similar is None:
+            return None
+        hit, matched_topic = similar
+        return hit.lesson, hit.stale, hit.key, matched_topic
+
+    async def set(
+        self,
+        key: str,
+        lesson: Union[Dict[str, Any], bytes],
+        written_at: Optional[float] = None,
+        topic: Optional[str] = None,
+        age: Optional[int] = None,
+        validated: bool = False,
+    ) -> bool:
+        """Cache a lesson (a dict or its JSON bytes); ``written_at`` backdates restored entries.
+
+        ``validated`` marks lessons that are already in response-model form, so
+        hits can be served without rebuilding the model. Passing ``topic`` also
+        makes the lesson findable by near-duplicate topics.
+        """
+        written_at = written_at or time.time()
+        remaining = int(written_at + self._hard_ttl - time.time())
+        if remaining <= 0:
+            return False
+        body = lesson if isinstance(lesson, bytes) else orjson.dumps(lesson)
+        entry = _pack(body, written_at + self._soft_ttl, validated)
+        stored = await self._cache.set(key, entry, ttl=remaining, namespace=NAMESPACE)
+        if stored and topic and self._topic_index is not None:
+            self._topic_index.add(key, topic, age)
+        return stored
+
+    async def mark_validated(self, hit: CachedLesson, body: bytes) -> bool:
+        """Replace an unvalidated hit with its response-model form, keeping its lifetime."""
+        # Pre-envelope entries carry no timestamp and start a new lifetime
+        written_at = hit.fresh_until - self._soft_ttl if hit.fresh_until != float("inf") else None
+        return await self.set(hit.key, body, written_at=written_at, validated=True)
+
+    async def is_fresh(self, key: str) -> bool:
+        entry = await self._cache.get(key, namespace=NAMESPACE)
+        if not entry:
+            return False
+        return not _unpack(key, entry).stale
+
+    def refresh(self, key: str, regenerate: Callable[[], Awaitable[Any]]) -> bool:
+        """Regenerate a stale lesson in the background; at most one refresh per key per process.
+
+        ``regenerate`` is expected to write the new lesson back through ``set``
+        and to leave the stale entry in place if generation fails.
+        """
+        if key in self._refreshing:
+            return False
+        self._stats["refreshes"] += 1
+
+        async def _run():
+            try:
+                await regenerate()
+            except Exception as e:
+                self._stats["refresh_failures"] += 1
+                logger.warning(f"Background lesson refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(_run())
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["refreshing"] = len(self._refreshing)
+        stats["soft_ttl"] = self._soft_ttl
+        stats["hard_ttl"] = self._hard_ttl
+        return stats
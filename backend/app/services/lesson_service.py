@@ -1,23 +1,46 @@
 import uuid
+from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 import logging
-import hashlib
-import asyncio
 import json
 import re
-from app.repositories.interfaces import ICacheRepository
+from app.repositories.interfaces import ICacheRepository, ILessonRepository
+from app.repositories.lesson_store import LessonStore, get_lesson_store
 from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.repositories.memory_lesson_repository import MemoryLessonRepository
+from app.services.age_bands import audience_label
+from app.services.lesson_cache import LessonCache, lesson_cache_key
+from app.services.llm_gateway import chat_completion
+from app.services.semantic_topic_index import get_semantic_topic_index
+from app.services.single_flight import create_single_flight
 
 logger = logging.getLogger(__name__)
 
-# In-memory cache for lessons (similar to what's in main.py and chat.py)
-_INFLIGHT_LESSONS: dict[str, asyncio.Future] = {}
+# Coalesces concurrent lesson generations across requests and workers
+_LESSON_FLIGHT = create_single_flight("lesson_service")
+
+
+def _encode_lesson_result(result: Tuple[Dict[str, Any], str]) -> Dict[str, Any]:
+    lesson, src = result
+    return {"lesson": lesson, "source": src}
+
+
+def _decode_lesson_result(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    return payload["lesson"], payload["source"]
 
 class LessonService:
     """Centralized service for lesson generation and management."""
 
-    def __init__(self, cache_repository: Optional[ICacheRepository] = None):
+    def __init__(
+        self,
+        cache_repository: Optional[ICacheRepository] = None,
+        lesson_repository: Optional[ILessonRepository] = None,
+        lesson_store: Optional[LessonStore] = None,
+    ):
         self.cache_repository = cache_repository or MemoryCacheRepository()
+        self.lesson_repository = lesson_repository or MemoryLessonRepository()
+        self.lesson_store = lesson_store or get_lesson_store()
+        self.lesson_cache = LessonCache(self.cache_repository, topic_index=get_semantic_topic_index(self.cache_repository))
         
     async def _stub_lesson(self, topic: str, age: Optional[int] = None, mode: str = "lesson") -> Dict[str, Any]:
         """Generate a stub lesson with clear error messaging instead of generic templates."""
@@ -73,19 +96,9 @@ class LessonService:
             raw_excerpt = ""
             try:
                 # Enhanced system prompt with better age-based instructions
-                age_str = ""
-                if age is not None:
-                    if age <= 2:
-                        age_str = "toddler"
-                    elif age <= 5:
-                        age_str = "preschooler"
-                    elif age <= 12:
-                        age_str = "child"
-                    elif age <= 18:
-                        age_str = "teenager"
-                    else:
-                        age_str = "adult"
-                
+                # Only the age band is used, so one lesson serves every age in the band
+                age_str = audience_label(age)
+
                 sys_prompt = (
                     "You are a helpful tutor who produces a structured lesson as strict JSON. "
                     "Return ONLY valid JSON with these exact keys: "
@@ -96,7 +109,7 @@ class LessonService:
                     "quiz_questions (array of objects with question, options array, and answer string fields). "
                     "Each quiz question must have exactly 4 options. "
                     "For the learner's age group: "
-                    f"{age_str if age_str else 'general audience'}. "
+                    f"{age_str}. "
                     "Keep language clear for the learner. For scientific topics, provide specific details and examples. "
                     "Do not provide generic responses. Each section should contain substantial educational content. "
                     "IMPORTANT: Respond ONLY with valid JSON, no markdown code blocks, no extra text, no explanations. "
@@ -112,9 +125,9 @@ class LessonService:
                 
                 if age is not None:
                     user_prompt["age_group"] = age_str
-                    user_prompt["age"] = age
                     
-                completion = groq_client.chat.completions.create(
+                completion = await chat_completion(
+                    groq_client,
                     model="llama-3.1-8b-instant",
                     temperature=0.3,
                     response_format={"type": "json_object"},
@@ -268,10 +281,12 @@ class LessonService:
                 if has_minimal_content:
                     # Cache the result
                     try:
-                        await self.cache_repository.set(cache_key, resp, namespace="lessons")
+                        # Raw LLM text: the structured-lesson endpoint sanitizes it before serving
+                        await self.lesson_cache.set(cache_key, resp, topic=topic, age=age, validated=False)
                         logger.info(f"LLM response for '{topic}' accepted and cached")
                     except Exception as cache_error:
                         logger.warning(f"Failed to cache LLM response for '{topic}': {cache_error}")
+                    await self.lesson_store.put(cache_key, topic, age, resp, sanitized=False)
                     return resp, "llm"
                 # Log when we're falling back to stub due to incomplete or low-quality LLM response
                 logger.warning(f"LLM response for '{topic}' was low-quality - falling back to stub. "
@@ -291,25 +306,32 @@ class LessonService:
 
     async def _get_or_compute_lesson(self, cache_key: str, topic: str, age: Optional[int], groq_client) -> Tuple[Dict[str, Any], str]:
         """Get or compute lesson with deduplication."""
-        fut = _INFLIGHT_LESSONS.get(cache_key)
-        if fut and not fut.done():
-            return await fut
-        loop = asyncio.get_event_loop()
-        fut = loop.create_future()
-        _INFLIGHT_LESSONS[cache_key] = fut
-        async def _run():
+        async def _compute():
             try:
-                result = await self._compute_structured_lesson(cache_key, topic, age, groq_client)
-                fut.set_result(result)
+                record = await self.lesson_store.get(cache_key)
+                if record is not None:
+                    await self.lesson_cache.set(
+                        cache_key,
+                        record["lesson"],
+                        written_at=record["written_at"],
+                        topic=topic,
+                        age=age,
+                        validated=bool(record.get("sanitized")),
+                    )
+                    return record["lesson"], "store"
+                return await self._compute_structured_lesson(cache_key, topic, age, groq_client)
             except Exception as e:
                 logger.error(f"Structured lesson compute failed: {e}")
                 stub_result = await self._stub_lesson(topic, age, "lesson")
                 stub_result["id"] = str(uuid.uuid4())
-                fut.set_result((stub_result, "stub"))
-            finally:
-                _INFLIGHT_LESSONS.pop(cache_key, None)
-        asyncio.create_task(_run())
-        return await fut
+                return stub_result, "stub"
+        return await _LESSON_FLIGHT.do(cache_key, _compute, _encode_lesson_result, _decode_lesson_result)
+
+    async def _refresh_lesson(self, cache_key: str, topic: str, age: Optional[int], groq_client) -> Tuple[Dict[str, Any], str]:
+        """Regenerate a stale lesson; failures leave the stale entry in place."""
+        async def _compute():
+            return await self._compute_structured_lesson(cache_key, topic, age, groq_client)
+        return await _LESSON_FLIGHT.do(cache_key, _compute, _encode_lesson_result, _decode_lesson_result)
 
     async def generate_structured_lesson(self, topic: str, age: Optional[int] = None, groq_client=None, mode: str = "lesson") -> Tuple[Dict[str, Any], str]:
         """Generate a structured lesson for a given topic and optional age."""
@@ -317,15 +339,42 @@ class LessonService:
             raise ValueError("Topic cannot be empty")
             
         # Build cache key and try cache first
-        cache_key = hashlib.md5(f"{topic}|{age}".encode()).hexdigest()[:16]
+        cache_key = lesson_cache_key(topic, age)
         try:
-            cached = await self.cache_repository.get(cache_key, namespace="lessons")
+            cached = await self.lesson_cache.get(cache_key)
+            source, hit_key, hit_topic = "cache", cache_key, topic
+            if cached is None:
+                # Paraphrased topics reuse the lesson of a near-duplicate topic in the same age tier
+                similar = await self.lesson_cache.get_similar(topic, age)
+                if similar is not None:
+                    lesson, stale, matched_key, matched_topic = similar
+                    logger.info(f"Lesson for '{topic}' served from similar topic '{matched_topic}'.")
+                    cached, source = (lesson, stale), "semantic"
+                    hit_key, hit_topic = matched_key, matched_topic
             if cached:
+                lesson, stale = cached
+                if stale:
+                    # Serve immediately and regenerate in the background
+                    self.lesson_cache.refresh(hit_key, lambda: self._refresh_lesson(hit_key, hit_topic, age, groq_client))
+                    logger.info(f"Stale lesson for '{topic}' served from cache; refreshing.")
+                    return lesson, "stale"
                 logger.info(f"Lesson for '{topic}' retrieved from cache.")
-                return cached, "cache"
+                return lesson, source
         except Exception:
             pass
             
         # Compute with single-flight to avoid duplicate LLM calls
         lesson, src = await self._get_or_compute_lesson(cache_key, topic, age, groq_client)
-        return lesson, src
\ No newline at end of file
+        return lesson, src
+
+    async def get_popular_topics(self, limit: int = 10) -> List[str]:
+        """Get the most searched topics."""
+        return await self.lesson_repository.get_popular_topics(limit)
+
+    async def get_popular_topics_by_age(self, limit: int = 200, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get the most searched (topic, age) pairs for pre-generation."""
+        return await self.lesson_repository.get_popular_topics_by_age(limit, since)
+
+    async def get_lesson_detail(self, lesson_id: str) -> Optional[Dict[str, Any]]:
+        """Get a saved lesson by ID."""
+        return await self.lesson_repository.get_lesson_by_id(lesson_id)
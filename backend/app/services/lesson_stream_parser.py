@@ -0,0 +1,107 @@
+"""
+Incremental parser for structured lesson JSON streamed from the LLM.
+
+The model emits one top-level JSON object token by token. The parser scans only
+the newly appended text on each ``feed`` call and reports the introduction and
+each section / quiz / classification object as soon as it is syntactically
+complete, so the UI can render a lesson before generation finishes.
+"""
+import json
+import logging
+from typing import Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Top-level keys whose array items are emitted as individual events
+_ARRAY_EVENTS = {
+    "sections": "section",
+    "quiz_questions": "quiz",
+    "quiz": "quiz",
+    "classifications": "classification",
+}
+# Top-level keys whose string value is emitted once complete
+_STRING_EVENTS = {
+    "introduction": "introduction",
+}
+
+
+class IncrementalLessonParser:
+    """Scan a streamed lesson object and emit ``(event, value)`` pairs."""
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._pending_key = None
+        self._key = None
+        self._item_start = -1
+
+    @property
+    def text(self) -> str:
+        """Full raw text received so far."""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Append a chunk of model output and return any newly completed events."""
+        events: List[Tuple[str, Any]] = []
+        if not chunk:
+            return events
+        self._text += chunk
+        text = self._text
+        i = self._pos
+        end = len(text)
+        while i < end:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string_end(i, events)
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == "{" or ch == "[":
+                self._depth += 1
+                if self._depth == 3 and ch == "{" and self._key in _ARRAY_EVENTS:
+                    self._item_start = i
+            elif ch == "}" or ch == "]":
+                if self._depth == 3 and ch == "}" and self._item_start >= 0:
+                    self._emit_item(text[self._item_start:i + 1], events)
+                    self._item_start = -1
+                self._depth -= 1
+            elif self._depth == 1:
+                if ch == ":":
+                    self._key = self._pending_key
+                elif ch == ",":
+                    self._key = None
+                    self._pending_key = None
+            i += 1
+        self._pos = i
+        return events
+
+    def _on_string_end(self, end: int, events: List[Tuple[str, Any]]) -> None:
+        if self._depth != 1:
+            return
+        try:
+            value = json.loads(self._text[self._string_start:end + 1])
+        except Exception:
+            return
+        if self._key is None:
+            self._pending_key = value
+        elif self._key in _STRING_EVENTS:
+            events.append((_STRING_EVENTS[self._key], value))
+
+    def _emit_item(self, raw: str, events: List[Tuple[str, Any]]) -> None:
+        try:
+            item = json.loads(raw)
+        except Exception as e:
+            logger.debug(f"Skipping unparseable streamed lesson item: {e}")
+            return
+        if isinstance(item, dict):
+            events.append((_ARRAY_EVENTS[self._key], item))
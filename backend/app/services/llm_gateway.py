@@ -0,0 +1,161 @@
+"""
+Shared async LLM gateway.
+
+Every Groq completion in the backend goes through one process-wide ``AsyncGroq``
+client backed by a pooled httpx transport, so a slow completion for one user
+never stalls the event loop for every other request in flight.
+"""
+import asyncio
+import inspect
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+try:
+    from groq import AsyncGroq  # type: ignore
+    GROQ_AVAILABLE = True
+except ImportError:
+    AsyncGroq = None
+    GROQ_AVAILABLE = False
+
+from app.config import (
+    GROQ_API_KEY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+
+_client = None
+_stats: Dict[str, Any] = {
+    "calls": 0,
+    "streams": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "total_tokens": 0,
+}
+
+
+def get_groq_client(api_key: Optional[str] = None):
+    """Return the shared AsyncGroq client, creating it on first use.
+
+    Returns None when the Groq SDK is not installed or no API key is configured.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    key = (api_key or GROQ_API_KEY or "").strip()
+    if not GROQ_AVAILABLE or AsyncGroq is None or not key:
+        return None
+    try:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5.0),
+        )
+        _client = AsyncGroq(api_key=key, http_client=http_client)
+        logger.info("Async Groq gateway initialized")
+    except Exception as e:
+        logger.error(f"Failed to initialize async Groq gateway: {e}")
+        _client = None
+    return _client
+
+
+async def close_groq_client() -> None:
+    """Close the shared client and its connection pool."""
+    global _client
+    client, _client = _client, None
+    if client is None:
+        return
+    try:
+        await client.close()
+    except Exception as e:
+        logger.warning(f"Error closing async Groq gateway: {e}")
+
+
+def _record_usage(response: Any) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = getattr(usage, field, None)
+        if isinstance(value, int):
+            _stats[field] += value
+
+
+async def chat_completion(client: Any, **kwargs: Any) -> Any:
+    """Create a chat completion without blocking the event loop.
+
+    Async clients are awaited directly; legacy synchronous clients are run in a
+    worker thread so existing call sites and test doubles keep working.
+    """
+    if client is None:
+        raise RuntimeError("LLM client not configured")
+    create = client.chat.completions.create
+    _stats["calls"] += 1
+    _stats["in_flight"] += 1
+    try:
+        if inspect.iscoroutinefunction(create):
+            response = await create(**kwargs)
+        else:
+            response = await asyncio.to_thread(create, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        _record_usage(response)
+        return response
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    finally:
+        _stats["in_flight"] -= 1
+
+
+async def stream_chat_completion(client: Any, **kwargs: Any) -> AsyncIterator[str]:
+    """Yield content deltas from a streaming chat completion.
+
+    Legacy synchronous clients cannot stream without blocking, so for them the
+    full completion is fetched through ``chat_completion`` and yielded once.
+    """
+    if client is None:
+        raise RuntimeError("LLM client not configured")
+    kwargs.pop("stream", None)
+    create = client.chat.completions.create
+    if not inspect.iscoroutinefunction(create):
+        response = await chat_completion(client, stream=False, **kwargs)
+        content = response.choices[0].message.content or ""
+        if content:
+            yield content
+        return
+
+    _stats["calls"] += 1
+    _stats["streams"] += 1
+    _stats["in_flight"] += 1
+    try:
+        stream = await create(stream=True, **kwargs)
+        async for chunk in stream:
+            choices = getattr(chunk, "choices", None) or []
+            delta = getattr(choices[0], "delta", None) if choices else None
+            content = getattr(delta, "content", None) if delta is not None else None
+            if content:
+                yield content
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None:
+                _record_usage(x_groq)
+    except Exception:
+        _stats["errors"] += 1
+        raise
+    finally:
+        _stats["in_flight"] -= 1
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Return a snapshot of gateway call and token counters."""
+    return dict(_stats)
@@ -0,0 +1,53 @@
+"""
+Common curriculum math problems used to pre-populate the canonical math cache.
+
+Entries only need to be representative forms; equivalent questions (reordered
+terms, other variable names, sides swapped) hit the same canonical entry.
+"""
+
+MATH_CURRICULUM_PROBLEMS = [
+    # Linear equations
+    "x + 5 = 12",
+    "x - 7 = 3",
+    "2x + 3 = 7",
+    "3x - 4 = 11",
+    "5x = 35",
+    "x/4 = 6",
+    "4x + 2 = 2x + 10",
+    "2(x + 3) = 14",
+    "3(x - 2) = 2x + 5",
+    "7 - 2x = 1",
+    "x/2 + 3 = 8",
+    "0.5x + 1 = 4",
+    # Quadratic equations
+    "x^2 = 16",
+    "x^2 - 9 = 0",
+    "x^2 + 5x + 6 = 0",
+    "x^2 - 5x + 6 = 0",
+    "x^2 - 4x + 4 = 0",
+    "x^2 + 2x - 8 = 0",
+    "2x^2 - 8 = 0",
+    "x^2 - 7x + 12 = 0",
+    "3x^2 + 6x = 0",
+    # Other equations
+    "x^3 = 27",
+    "2^x = 8",
+    "sqrt(x) = 5",
+    # Expressions to simplify
+    "2x + 3x",
+    "3(x + 4)",
+    "x*x*x",
+    "(x + 1)^2 - x^2",
+    "(x^2 - 1)/(x - 1)",
+    "(x^2 - 4)/(x + 2)",
+    "sin(x)^2 + cos(x)^2",
+    "2a + 3b - a + b",
+    # Arithmetic
+    "1/2 + 1/3",
+    "3/4 - 1/8",
+    "2^10",
+    "sqrt(144)",
+    "12 * 15",
+    "(3 + 5) * 2",
+    "100 / 8",
+]
@@ -3,8 +3,6 @@ import logging
 from typing import Any, Dict, List, Optional
 
 import orjson
-# from groq import AsyncGroq
-from sympy import Eq, sympify, solve, simplify
 import re
 import hashlib
 
@@ -21,6 +19,10 @@ def is_math(q: str) -> bool:
     return bool(MATH_RE.search(q))
 
 from app.repositories.interfaces import ICacheRepository
+from app.services.llm_gateway import chat_completion
+from app.config import MATH_CANONICAL_CACHE_TTL, SYMPY_CANONICAL_TIMEOUT_SECONDS
+from app.services.math_corpus import MATH_CURRICULUM_PROBLEMS
+from app.services.sympy_pool import CANONICAL_SYMBOL_PREFIX, get_sympy_pool
 from app.schemas import MathProblemRequest, MathSolutionResponse, MathStep
 
 def _normalize_question(q: str) -> str:
@@ -31,6 +33,16 @@ def _cache_key_for(question: str) -> str:
     norm = _normalize_question(question)
     return hashlib.md5(norm.encode()).hexdigest()[:24]
 
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z_0-9]*")
+
+def _rename_identifiers(text: Optional[str], mapping: Dict[str, str]) -> Optional[str]:
+    if not text or not mapping:
+        return text
+    return _IDENTIFIER_RE.sub(lambda m: mapping.get(m.group(0), m.group(0)), text)
+
+def _canonical_cache_key(canonical_key: str) -> str:
+    return hashlib.md5(canonical_key.encode()).hexdigest()[:24]
+
 
 class MathSolverService:
     """Math problem solving service."""
@@ -188,41 +200,100 @@ class MathSolverService:
             return llm_result
 
     async def _solve_with_sympy(self, question: str) -> MathSolutionResponse:
-        """Solve using SymPy."""
-        if "=" in question:
-            # Handle equations
-            lhs, rhs = question.split("=", 1)
-            equation = Eq(sympify(lhs.strip()), sympify(rhs.strip()))
-            solutions = solve(equation)
+        """Solve using SymPy in the worker pool; raises on error or timeout so callers fall back to the LLM.
+
+        Equivalent problems share one solution through the canonical-form cache.
+        """
+        canonical = await self._canonical_form(question)
+        if canonical is not None:
+            cached = await self._get_canonical(canonical, question)
+            if cached is not None:
+                return cached
 
+        result = await get_sympy_pool().run(question)
+        if result["kind"] == "equation":
+            # Handle equations
             steps = [
                 MathStep(description="Parse the equation", expression=question),
-                MathStep(description="Solve for the variable", expression=str(equation)),
+                MathStep(description="Solve for the variable", expression=result["expression"]),
             ]
-
-            solution_text = str(solutions[0]) if solutions else "No solution"
         else:
             # Handle expressions
-            expr = sympify(question)
-            simplified = simplify(expr)
-
             steps = [
                 MathStep(description="Parse the expression", expression=question),
-                MathStep(description="Simplify", expression=str(simplified)),
+                MathStep(description="Simplify", expression=result["expression"]),
             ]
 
-            solution_text = str(simplified)
+        solved = MathSolutionResponse(problem=question, solution=result["solution"], steps=steps)
+        if canonical is not None:
+            await self._store_canonical(canonical, solved)
+        return solved
+
+    async def _canonical_form(self, question: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await get_sympy_pool().canonicalize(question, timeout=SYMPY_CANONICAL_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.debug(f"No canonical form for math problem: {e}")
+            return None
+
+    async def _get_canonical(self, canonical: Dict[str, Any], question: str) -> Optional[MathSolutionResponse]:
+        """Look up a solution by canonical key, mapping canonical symbols back to the question's."""
+        try:
+            cached = await self.cache_repo.get(_canonical_cache_key(canonical["key"]), namespace="math_canonical")
+        except Exception:
+            return None
+        if not isinstance(cached, dict):
+            return None
+        restore = {f"{CANONICAL_SYMBOL_PREFIX}{i}": name for i, name in enumerate(canonical["symbols"])}
+        steps = [
+            MathStep(description=step["description"], expression=_rename_identifiers(step.get("expression"), restore))
+            for step in cached.get("steps", [])
+        ]
+        if steps:
+            # The first step restates the problem as asked
+            steps[0].expression = question
+        return MathSolutionResponse(
+            problem=question,
+            solution=_rename_identifiers(cached.get("solution", ""), restore) or "",
+            steps=steps,
+        )
+
+    async def _store_canonical(self, canonical: Dict[str, Any], solved: MathSolutionResponse) -> None:
+        to_canonical = {name: f"{CANONICAL_SYMBOL_PREFIX}{i}" for i, name in enumerate(canonical["symbols"])}
+        payload = {
+            "solution": _rename_identifiers(solved.solution, to_canonical),
+            "steps": [
+                {"description": step.description, "expression": _rename_identifiers(step.expression, to_canonical)}
+                for step in solved.steps
+            ],
+        }
+        try:
+            await self.cache_repo.set(
+                _canonical_cache_key(canonical["key"]), payload, ttl=MATH_CANONICAL_CACHE_TTL, namespace="math_canonical"
+            )
+        except Exception:
+            pass
 
-        return MathSolutionResponse(problem=question, solution=solution_text, steps=steps)
+    async def prewarm_canonical_cache(self, problems: List[str]) -> int:
+        """Solve corpus problems not yet in the canonical cache; returns how many were added."""
+        added = 0
+        for problem in problems:
+            canonical = await self._canonical_form(problem)
+            if canonical is None:
+                continue
+            try:
+                if await self.cache_repo.exists(_canonical_cache_key(canonical["key"]), namespace="math_canonical"):
+                    continue
+                await self._solve_with_sympy(problem)
+                added += 1
+            except Exception as e:
+                logger.debug(f"Skipping corpus problem {problem!r}: {e}")
+        return added
 
     async def _groq_create(self, **kwargs):
-        """Call Groq client create, supporting sync or async SDK."""
+        """Call Groq through the shared gateway, supporting sync or async SDK."""
         try:
-            result = self.groq_client.chat.completions.create(**kwargs)
-            # If coroutine-like, await
-            if hasattr(result, "__await__"):
-                result = await result
-            return result
+            return await chat_completion(self.groq_client, **kwargs)
         except Exception as e:
             logger.error(f"Groq create failed: {e}")
             raise
@@ -302,4 +373,13 @@ class MathSolverService:
                 solution="",
                 steps=[MathStep(description="Error parsing LLM response.", expression=None)],
                 error="Invalid LLM JSON",
-            )
\ No newline at end of file
+            )
+
+
+async def prewarm_math_cache(cache_repo: ICacheRepository, problems: Optional[List[str]] = None) -> None:
+    """Pre-populate the canonical math cache from the curriculum corpus."""
+    try:
+        added = await MathSolverService(cache_repo).prewarm_canonical_cache(problems or MATH_CURRICULUM_PROBLEMS)
+        logger.info(f"Math cache warm-up complete: {added} canonical solutions added")
+    except Exception as e:
+        logger.warning(f"Math cache warm-up error: {e}")
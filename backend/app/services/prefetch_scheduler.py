@@ -0,0 +1,286 @@
+"""
+Popularity-driven lesson pre-generation.
+
+During configured off-peak windows the scheduler takes the most searched
+topics per age band, generates their structured lessons (quizzes are part of
+the lesson) through the normal cache/single-flight path, and synthesizes the
+summary narration. Groq usage is capped per window by a token budget measured
+from the LLM gateway counters, so pre-generation never competes with the
+morning rush. The cycle lease and the window's token count live side by side
+in Redis, so the budget holds whichever worker wins the lease.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import (
+    PREFETCH_INTERVAL_SECONDS,
+    PREFETCH_LOOKBACK_DAYS,
+    PREFETCH_OFF_PEAK_HOURS,
+    PREFETCH_TOKEN_BUDGET,
+    PREFETCH_TOKENS_PER_LESSON,
+    PREFETCH_TOP_N,
+)
+from app.repositories.redis_client import get_async_redis
+from app.services.age_bands import age_band
+from app.services.llm_gateway import get_llm_stats
+
+logger = logging.getLogger(__name__)
+
+PopularitySource = Callable[[int, Optional[datetime]], Awaitable[List[Dict[str, Any]]]]
+LessonGenerator = Callable[[str, Optional[int]], Awaitable[Tuple[Dict[str, Any], str]]]
+CacheProbe = Callable[[str, Optional[int]], Awaitable[bool]]
+SummarySynthesizer = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_LEASE_KEY = "prefetch:lease"
+_TOKENS_KEY = "prefetch:tokens:{window}"
+# Windows last hours; a day covers any of them plus clock skew between workers
+_TOKENS_TTL = 24 * 3600
+
+
+def parse_windows(spec: str) -> List[Tuple[int, int]]:
+    """Parse ``"1-6,13-14"`` into (start, end) UTC hours; end is exclusive and may wrap."""
+    windows = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            start, end = (int(v) % 24 for v in part.split("-", 1))
+        except ValueError:
+            logger.warning(f"Ignoring malformed prefetch window '{part}'")
+            continue
+        windows.append((start, end))
+    return windows
+
+
+class PrefetchTask:
+    __slots__ = ("topic", "age", "band", "count", "status", "source", "tts", "error", "finished_at")
+
+    def __init__(self, topic: str, age: Optional[int], band: str, count: int):
+        self.topic = topic
+        self.age = age
+        self.band = band
+        self.count = count
+        self.status = "queued"
+        self.source: Optional[str] = None
+        self.tts: Optional[str] = None
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class PrefetchScheduler:
+    """Background loop that pre-generates popular lessons inside off-peak windows."""
+
+    def __init__(
+        self,
+        popular_topics: PopularitySource,
+        generate_lesson: LessonGenerator,
+        is_cached: CacheProbe,
+        synthesize_summary: Optional[SummarySynthesizer] = None,
+        windows: str = PREFETCH_OFF_PEAK_HOURS,
+        top_n: int = PREFETCH_TOP_N,
+        token_budget: int = PREFETCH_TOKEN_BUDGET,
+        tokens_per_lesson: int = PREFETCH_TOKENS_PER_LESSON,
+        interval: int = PREFETCH_INTERVAL_SECONDS,
+        lookback_days: int = PREFETCH_LOOKBACK_DAYS,
+    ):
+        self._popular_topics = popular_topics
+        self._generate_lesson = generate_lesson
+        self._is_cached = is_cached
+        self._synthesize_summary = synthesize_summary
+        self._windows = parse_windows(windows)
+        self._top_n = top_n
+        self._token_budget = token_budget
+        self._tokens_per_lesson = tokens_per_lesson
+        self._interval = interval
+        self._lookback = timedelta(days=lookback_days)
+        self._queue: List[PrefetchTask] = []
+        self._task: Optional[asyncio.Task] = None
+        self._window_id: Optional[str] = None
+        self._tokens_used = 0
+        self._last_run: Optional[float] = None
+        self._stats = {"runs": 0, "generated": 0, "already_cached": 0, "deferred": 0, "failed": 0, "tts": 0}
+
+    # -- windows -----------------------------------------------------------
+
+    def _current_window(self, now: datetime) -> Optional[str]:
+        """Identifier of the window containing ``now`` (stable for its duration), or None."""
+        hour = now.hour
+        for start, end in self._windows:
+            inside = start <= hour < end if start < end else (hour >= start or hour < end)
+            if inside:
+                day = now.date() if hour >= start else (now - timedelta(days=1)).date()
+                return f"{day.isoformat()}T{start:02d}"
+        return None
+
+    # -- planning ----------------------------------------------------------
+
+    def plan(self, rows: List[Dict[str, Any]]) -> List[PrefetchTask]:
+        """Top-N topics per age band, most searched first across bands.
+
+        Each band is generated for the age most often searched with that topic.
+        """
+        bands: Dict[str, Dict[str, Dict[Optional[int], int]]] = {}
+        for row in rows:
+            topic = (row.get("topic") or "").strip()
+            if not topic:
+                continue
+            age = row.get("age")
+            per_topic = bands.setdefault(age_band(age), {}).setdefault(topic, {})
+            per_topic[age] = per_topic.get(age, 0) + int(row.get("count") or 1)
+
+        tasks = []
+        for band, topics in bands.items():
+            ranked = sorted(topics.items(), key=lambda item: sum(item[1].values()), reverse=True)
+            for topic, ages in ranked[:self._top_n]:
+                age = max(ages.items(), key=lambda item: item[1])[0]
+                tasks.append(PrefetchTask(topic, age, band, sum(ages.values())))
+        tasks.sort(key=lambda t: t.count, reverse=True)
+        return tasks
+
+    # -- execution ---------------------------------------------------------
+
+    async def _acquire_lease(self) -> bool:
+        """Only one worker per deployment runs a cycle; without Redis every process is its own leader."""
+        client = await get_async_redis()
+        if client is None:
+            return True
+        try:
+            return bool(await client.set(_LEASE_KEY, "1", nx=True, ex=max(1, self._interval - 5)))
+        except Exception as e:
+            logger.debug(f"Prefetch lease unavailable: {e}")
+            return True
+
+    async def _sync_tokens_used(self) -> int:
+        """Tokens spent in the current window by every worker (this one's count without Redis)."""
+        client = await get_async_redis()
+        if client is None:
+            return self._tokens_used
+        try:
+            self._tokens_used = int(await client.get(_TOKENS_KEY.format(window=self._window_id)) or 0)
+        except Exception as e:
+            logger.debug(f"Prefetch token count unavailable: {e}")
+        return self._tokens_used
+
+    async def _charge_tokens(self, tokens: int) -> None:
+        self._tokens_used += tokens
+        client = await get_async_redis()
+        if client is None or not tokens:
+            return
+        key = _TOKENS_KEY.format(window=self._window_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.incrby(key, tokens)
+                pipe.expire(key, _TOKENS_TTL)
+                total, _ = await pipe.execute()
+            self._tokens_used = int(total)
+        except Exception as e:
+            logger.debug(f"Prefetch token count unavailable: {e}")
+
+    async def run_once(self, force: bool = False) -> Dict[str, Any]:
+        """Plan and drain one cycle if inside an off-peak window (or when forced)."""
+        now = datetime.now(timezone.utc)
+        window = self._current_window(now) or ("manual" if force else None)
+        if window is None:
+            return self.status()
+        if window != self._window_id:
+            self._window_id = window
+            self._tokens_used = 0
+        if not await self._acquire_lease():
+            return self.status()
+
+        self._stats["runs"] += 1
+        self._last_run = time.time()
+        rows = await self._popular_topics(self._top_n * 20, now - self._lookback)
+        self._queue = self.plan(rows)
+        logger.info(f"Prefetch cycle {window}: {len(self._queue)} topics queued")
+        for task in self._queue:
+            await self._run_task(task)
+        return self.status()
+
+    async def _run_task(self, task: PrefetchTask) -> None:
+        task.status = "running"
+        try:
+            cached = await self._is_cached(task.topic, task.age)
+            if not cached and await self._sync_tokens_used() + self._tokens_per_lesson > self._token_budget:
+                task.status = "deferred"
+                self._stats["deferred"] += 1
+                return
+            before = get_llm_stats().get("total_tokens", 0)
+            lesson, source = await self._generate_lesson(task.topic, task.age)
+            # Gateway counters are process-wide; off-peak there is little other traffic to attribute
+            spent = max(0, get_llm_stats().get("total_tokens", 0) - before)
+            if source == "llm" and spent == 0:
+                # Clients that do not report usage are charged the per-lesson estimate
+                spent = self._tokens_per_lesson
+            await self._charge_tokens(spent)
+            task.source = source
+            self._stats["already_cached" if cached else "generated"] += 1
+            if source == "stub":
+                task.status = "failed"
+                task.error = "stub lesson"
+                self._stats["failed"] += 1
+                return
+            if self._synthesize_summary is not None:
+                try:
+                    await self._synthesize_summary(lesson)
+                    task.tts = "ready"
+                    self._stats["tts"] += 1
+                except Exception as e:
+                    task.tts = "failed"
+                    logger.debug(f"Prefetch TTS summary failed for '{task.topic}': {e}")
+            task.status = "done"
+        except Exception as e:
+            task.status = "failed"
+            task.error = str(e)
+            self._stats["failed"] += 1
+            logger.warning(f"Prefetch failed for '{task.topic}': {e}")
+        finally:
+            task.finished_at = time.time()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Prefetch cycle failed: {e}")
+            await asyncio.sleep(self._interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        """Queue and progress view."""
+        counts: Dict[str, int] = {}
+        for task in self._queue:
+            counts[task.status] = counts.get(task.status, 0) + 1
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "in_window": self._current_window(datetime.now(timezone.utc)) is not None,
+            "windows_utc": [f"{start:02d}-{end:02d}" for start, end in self._windows],
+            "window": self._window_id,
+            "last_run": self._last_run,
+            "token_budget": self._token_budget,
+            "tokens_used": self._tokens_used,
+            "progress": counts,
+            "queue": [task.to_dict() for task in self._queue],
+            "stats": dict(self._stats),
+        }
@@ -2,6 +2,8 @@ import logging
 import json
 from typing import List, Dict, Any, Optional
 
+from app.services.llm_gateway import chat_completion
+
 logger = logging.getLogger(__name__)
 
 class QuizService:
@@ -18,7 +20,8 @@ class QuizService:
         try:
             quiz_prompt = f"Create one multiple-choice quiz question (with answer) about this topic: {topic}"
             
-            quiz_response = groq_client.chat.completions.create(
+            quiz_response = await chat_completion(
+                groq_client,
                 model="llama-3.1-8b-instant",
                 messages=[
                     {"role": "system", "content": "Return ONLY valid JSON in this exact format: {\"q\": \"question text\", \"options\": [\"A) option1\", \"B) option2\", \"C) option3\", \"D) option4\"], \"answer\": \"A) option1\"}"},
@@ -48,7 +51,8 @@ class QuizService:
         try:
             quiz_prompt = f"Create one multiple-choice quiz question (with answer) about the math concept in this problem: {problem}"
             
-            quiz_response = groq_client.chat.completions.create(
+            quiz_response = await chat_completion(
+                groq_client,
                 model="llama-3.1-8b-instant",
                 messages=[
                     {"role": "system", "content": "Return ONLY valid JSON in this exact format: {\"q\": \"question text\", \"options\": [\"A) option1\", \"B) option2\", \"C) option3\", \"D) option4\"], \"answer\": \"A) option1\"}"},
@@ -0,0 +1,107 @@
+"""
+Shared sliding-window rate limits in Redis.
+
+Each client/endpoint pair has a sorted set of request timestamps per window.
+One Lua script trims, records and counts both the minute and the hour window
+atomically, so a check is a single non-blocking round trip on the shared
+``redis.asyncio`` client. The script is loaded once and invoked by SHA. When
+Redis is unreachable or the script fails, ``check`` returns None and callers
+fall back to their in-process limiter.
+"""
+import logging
+import time
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+from app.repositories.redis_client import get_async_redis, mark_redis_unavailable
+
+try:
+    from redis.exceptions import NoScriptError
+except ImportError:  # pragma: no cover - redis is optional
+    NoScriptError = None
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one sorted set per window. ARGV: now, member, then (window seconds, limit) per key.
+# Windows are checked in order and later ones are left untouched once one is exceeded,
+# matching the request counting of the in-process limiter.
+# Returns {exceeded window number or 0, count in the first window}.
+_SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local member = ARGV[2]
+local first = 0
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[1 + 2 * i])
+    local limit = tonumber(ARGV[2 + 2 * i])
+    redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+    redis.call('ZADD', key, now, member)
+    redis.call('EXPIRE', key, window + 5)
+    local count = redis.call('ZCARD', key)
+    if i == 1 then
+        first = count
+    end
+    if count > limit then
+        return {i, first}
+    end
+end
+return {0, first}
+"""
+
+
+class RedisRateLimiter:
+    """Atomic multi-window sliding-log limiter backed by the shared Redis client."""
+
+    def __init__(self, prefix: str = "ratelimit"):
+        self._prefix = prefix
+        self._sha: Optional[str] = None
+        self._stats = {"checks": 0, "rejected": 0, "script_loads": 0, "errors": 0}
+
+    def _keys(self, identity: str, names: Sequence[str]) -> List[str]:
+        # Hash tag keeps every window of one identity in the same cluster slot
+        return [f"{self._prefix}:{{{identity}}}:{name}" for name in names]
+
+    async def _run(self, client, keys: List[str], args: List) -> list:
+        if self._sha is None:
+            self._sha = await client.script_load(_SLIDING_WINDOW_SCRIPT)
+            self._stats["script_loads"] += 1
+        try:
+            return await client.evalsha(self._sha, len(keys), *keys, *args)
+        except Exception as e:
+            if NoScriptError is None or not isinstance(e, NoScriptError):
+                raise
+            # Script cache was flushed (restart or failover); load it again once
+            self._sha = await client.script_load(_SLIDING_WINDOW_SCRIPT)
+            self._stats["script_loads"] += 1
+            return await client.evalsha(self._sha, len(keys), *keys, *args)
+
+    async def check(
+        self, identity: str, windows: Sequence[Tuple[str, int, int]]
+    ) -> Optional[Tuple[int, int]]:
+        """Count a request against ``(name, window_seconds, limit)`` windows, in order.
+
+        Returns ``(exceeded, first_count)``: the 1-based index of the first
+        window over its limit (0 when allowed) and the request count in the
+        first window. Returns None when Redis cannot answer.
+        """
+        client = await get_async_redis()
+        if client is None:
+            return None
+        keys = self._keys(identity, [name for name, _, _ in windows])
+        now = time.time()
+        args: List = [repr(now), f"{now}:{uuid.uuid4().hex[:8]}"]
+        for _, window, limit in windows:
+            args += [window, limit]
+        try:
+            exceeded, first_count = await self._run(client, keys, args)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.debug(f"Redis rate limit check failed: {e}")
+            await mark_redis_unavailable(e)
+            return None
+        self._stats["checks"] += 1
+        if exceeded:
+            self._stats["rejected"] += 1
+        return int(exceeded), int(first_count)
+
+    def stats(self) -> dict:
+        return dict(self._stats)
@@ -1,9 +1,7 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
+import asyncio
 import logging
-from supabase import Client
-from app.config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
-from supabase import create_client
 
 
 logger = logging.getLogger(__name__)
@@ -12,9 +10,9 @@ logger = logging.getLogger(__name__)
 class ReportsService:
     """Service for generating weekly and monthly reports for Lana AI users."""
 
-    def __init__(self, supabase_url: str, supabase_key: str):
-        """Initialize with Supabase client."""
-        self.client: Client = create_client(supabase_url, supabase_key)
+    def __init__(self, client: Any):
+        """Initialize with the shared async PostgREST client."""
+        self.client = client
 
     async def get_weekly_report(self, user_id: str, start_date: Optional[datetime] = None) -> Dict[str, Any]:
         """Generate a weekly report for a user."""
@@ -46,14 +44,12 @@ class ReportsService:
     async def _generate_report(self, user_id: str, start_date: datetime, end_date: datetime, report_type: str) -> Dict[str, Any]:
         """Generate a report for a specific date range."""
         try:
-            # Get lesson data from searches table
-            lesson_data = await self._get_lesson_data(user_id, start_date, end_date)
-            
-            # Get user activity data from user_events table
-            activity_data = await self._get_activity_data(user_id, start_date, end_date)
-            
-            # Get engagement metrics
-            engagement_metrics = await self._get_engagement_metrics(user_id, start_date, end_date)
+            # Query plan: one scan each of searches and user_events, run concurrently;
+            # everything else is derived from those rows
+            lesson_data, activity_data = await asyncio.gather(
+                self._get_lesson_data(user_id, start_date, end_date),
+                self._get_activity_data(user_id, start_date, end_date),
+            )
             
             # Calculate summary statistics
             total_lessons = len(lesson_data)
@@ -62,6 +58,9 @@ class ReportsService:
             # Determine most active days
             active_days = self._get_active_days(activity_data)
             
+            # Engagement metrics from the same activity rows
+            engagement_metrics = self._calculate_engagement_metrics(activity_data, active_days)
+            
             # Get top performing topics
             top_topics = self._get_top_topics(lesson_data)
             
@@ -107,7 +106,7 @@ class ReportsService:
     async def _get_lesson_data(self, user_id: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
         """Get lesson data from the searches table."""
         try:
-            result = (
+            result = await (
                 self.client.table("searches")
                 .select("*")
                 .eq("uid", user_id)
@@ -124,7 +123,7 @@ class ReportsService:
     async def _get_activity_data(self, user_id: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
         """Get activity data from the user_events table."""
         try:
-            result = (
+            result = await (
                 self.client.table("user_events")
                 .select("*")
                 .eq("user_id", user_id)
@@ -138,60 +137,32 @@ class ReportsService:
             logger.error(f"Error fetching activity data: {e}")
             return []
 
-    async def _get_engagement_metrics(self, user_id: str, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Calculate engagement metrics."""
-        try:
-            # Get distinct days of activity
-            activity_result = (
-                self.client.table("user_events")
-                .select("timestamp")
-                .eq("user_id", user_id)
-                .gte("timestamp", start_date.isoformat())
-                .lte("timestamp", end_date.isoformat())
-                .execute()
-            )
-            
-            activity_data = activity_result.data or []
-            
-            if not activity_data:
-                return {
-                    "engagement_score": 0,
-                    "active_days": 0,
-                    "avg_daily_sessions": 0,
-                    "most_active_time": None
-                }
-            
-            # Calculate distinct active days
-            active_days = set()
-            for event in activity_data:
-                timestamp = datetime.fromisoformat(event['timestamp'].replace('Z', '+00:00'))
-                day_key = timestamp.date().isoformat()
-                active_days.add(day_key)
-            
-            # Calculate engagement score based on activity count and consistency
-            total_events = len(activity_data)
-            active_days_count = len(active_days)
-            avg_daily_events = total_events / active_days_count if active_days_count > 0 else 0
-            
-            # Engagement score (0-100) based on activity and consistency
-            activity_score = min(50, total_events * 2)  # Up to 50 points for activity
-            consistency_score = min(50, (active_days_count * 10))  # Up to 50 points for consistency
-            engagement_score = min(100, activity_score + consistency_score)
-            
-            return {
-                "engagement_score": engagement_score,
-                "active_days": active_days_count,
-                "total_events": total_events,
-                "avg_daily_events": avg_daily_events
-            }
-        except Exception as e:
-            logger.error(f"Error calculating engagement metrics: {e}")
+    def _calculate_engagement_metrics(self, activity_data: List[Dict[str, Any]], active_days: Dict[str, int]) -> Dict[str, Any]:
+        """Calculate engagement metrics from the activity rows and their per-day counts."""
+        if not activity_data:
             return {
                 "engagement_score": 0,
                 "active_days": 0,
                 "avg_daily_sessions": 0,
                 "most_active_time": None
             }
+        
+        # Calculate engagement score based on activity count and consistency
+        total_events = len(activity_data)
+        active_days_count = len(active_days)
+        avg_daily_events = total_events / active_days_count if active_days_count > 0 else 0
+        
+        # Engagement score (0-100) based on activity and consistency
+        activity_score = min(50, total_events * 2)  # Up to 50 points for activity
+        consistency_score = min(50, (active_days_count * 10))  # Up to 50 points for consistency
+        engagement_score = min(100, activity_score + consistency_score)
+        
+        return {
+            "engagement_score": engagement_score,
+            "active_days": active_days_count,
+            "total_events": total_events,
+            "avg_daily_events": avg_daily_events
+        }
 
     def _get_active_days(self, activity_data: List[Dict[str, Any]]) -> Dict[str, int]:
         """Organize activity by day."""
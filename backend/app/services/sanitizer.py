@@ -0,0 +1,71 @@
+"""
+Text sanitization for lesson fields, topics and chat history.
+
+Lesson text is HTML-escaped, stripped of script URL schemes and inline event
+handlers, whitespace-collapsed and truncated. Escaping comes first in effect,
+so no tag survives to be stripped separately.
+
+Most generated text needs no rewriting at all and only has its whitespace
+normalized. Text that may contain a scheme goes through one precompiled regex
+whose matches are rewritten via a dispatch table, escaping and scheme removal
+in a single pass; everything else is escaped with ``html.escape``, whose
+chained ``str.replace`` calls beat any per-match callback.
+"""
+import html
+import re
+from typing import Dict, Optional
+
+MAX_LENGTH = 1000
+
+_ESCAPES: Dict[str, str] = {
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+}
+
+_SCHEME = r"javascript:|vbscript:|onload=|onerror="
+_SANITIZE_PATTERN = re.compile(rf"(?P<scheme>{_SCHEME})|(?P<esc>[&<>\"'])", re.IGNORECASE)
+_SCHEME_PATTERN = re.compile(_SCHEME, re.IGNORECASE)
+
+# Characters that can change a string beyond its whitespace
+_SPECIAL = re.compile(r"[&<>\"':=]")
+
+_DISPATCH = {
+    "scheme": lambda token: "",
+    "esc": _ESCAPES.__getitem__,
+}
+
+
+def _rewrite(match: "re.Match") -> str:
+    return _DISPATCH[match.lastgroup](match.group())
+
+
+def _may_contain_scheme(text: str) -> bool:
+    # Endings of every scheme; they avoid "i" and "s", which case-fold to non-ASCII letters
+    lowered = text.lower()
+    return "pt:" in lowered or "ad=" in lowered or "or=" in lowered
+
+
+def sanitize_text(text: Optional[str], max_length: int = MAX_LENGTH) -> str:
+    """Escape HTML, drop script schemes and inline handlers, collapse whitespace, truncate."""
+    if not text:
+        return ""
+    if _SPECIAL.search(text) is None:
+        return " ".join(text.split())[:max_length]
+    if _may_contain_scheme(text):
+        text = _SANITIZE_PATTERN.sub(_rewrite, text)
+        # Removing one scheme can splice together another ("vbjavascript:script:")
+        while _SCHEME_PATTERN.search(text) is not None:
+            text = _SCHEME_PATTERN.sub("", text)
+    else:
+        text = html.escape(text)
+    return " ".join(text.split())[:max_length]
+
+
+def escape_text(text: Optional[str]) -> str:
+    """Escape HTML and collapse whitespace, without truncating."""
+    if not text:
+        return ""
+    return " ".join(html.escape(text).split())
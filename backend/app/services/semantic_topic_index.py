@@ -0,0 +1,305 @@
+"""
+Semantic near-duplicate lookup for lesson topics.
+
+Topics are embedded on the CPU with hashed TF-IDF features (content words plus
+character n-grams within words), so "photosynthesis", "Photosynthesis process"
+and "how does photosynthesis work" land close together without a model
+download. Each age band keeps its topics as sparse term-frequency rows in an
+inverted index: a lookup scores only the topics sharing the query's rarest
+features, with IDF weights taken from the band's current document
+frequencies, so adding a topic never rebuilds anything.
+
+Similarity alone is not enough to reuse a lesson. Numbers and roman numerals
+must match exactly ("World War I" is not "World War II"), as must single
+letters qualifying a word ("vitamin a"), and every content word of either topic
+needs a counterpart in the other, so "fractions" does not take the lesson for
+"adding fractions".
+
+The index maps a topic to the cache key of a lesson that already exists; it
+never stores lessons itself.
+"""
+import logging
+import math
+import re
+import weakref
+import zlib
+from difflib import SequenceMatcher
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MARGIN,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from app.services.age_bands import age_band
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_ROMAN = re.compile(r"^(?=[ivx])x{0,3}(ix|iv|v?i{0,3})$")
+_ROMAN_VALUES = {"i": 1, "v": 5, "x": 10}
+
+# Question scaffolding that says nothing about the subject of a lesson
+_STOPWORDS = frozenset(
+    "an the of to in on for and or is are was were be do does did how what why when where which who "
+    "can could would should will explain explained explaining describe tell me about learn learning "
+    "teach lesson lessons work works working happen happens please we you my our it its this that "
+    "with by from into process basics basic introduction intro overview simple kids guide meaning "
+    "definition facts".split()
+)
+
+_NGRAM_SIZES = (3, 4, 5)
+# Word features count more than any single character n-gram
+_WORD_WEIGHT = 2.0
+# Features per query whose postings are scored; the rarest ones say the most
+_PROBE_FEATURES = 8
+# Misspelled counterparts are only accepted for long words ("photosynthsis")
+_TYPO_MIN_LENGTH = 8
+_TYPO_RATIO = 0.9
+
+
+def _stem(word: str) -> str:
+    """Strip common inflections so "adding"/"add" and "volcanoes"/"volcano" share a word feature."""
+    for suffix in ("ing", "es", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _roman_value(token: str) -> int:
+    total = 0
+    for i, ch in enumerate(token):
+        value = _ROMAN_VALUES[ch]
+        if i + 1 < len(token) and _ROMAN_VALUES[token[i + 1]] > value:
+            total -= value
+        else:
+            total += value
+    return total
+
+
+class _Topic:
+    """Content words of a topic and the tokens that must match exactly."""
+
+    __slots__ = ("words", "exact")
+
+    def __init__(self, text: str):
+        words: List[str] = []
+        exact: Set[str] = set()
+        previous_content = False
+        for token in _WORD.findall(text.lower()):
+            if token.isdigit():
+                exact.add(str(int(token)))
+                previous_content = False
+            elif len(token) == 1:
+                # "world war i", "vitamin a"; a lone "a"/"i" elsewhere is just grammar
+                if previous_content:
+                    exact.add(str(_roman_value(token)) if token in _ROMAN_VALUES else token)
+                previous_content = False
+            elif _ROMAN.match(token):
+                exact.add(str(_roman_value(token)))
+                previous_content = False
+            elif token in _STOPWORDS:
+                previous_content = False
+            else:
+                words.append(token)
+                previous_content = True
+        self.words = words
+        self.exact: FrozenSet[str] = frozenset(exact)
+
+    def features(self) -> Dict[int, float]:
+        """Hashed term counts: content words, n-grams of each padded word and exact tokens."""
+        counts: Dict[int, float] = {}
+        for word in self.words:
+            token = zlib.crc32(b"w:" + _stem(word).encode())
+            counts[token] = counts.get(token, 0.0) + _WORD_WEIGHT
+            padded = f"<{word}>"
+            for n in _NGRAM_SIZES:
+                for i in range(len(padded) - n + 1):
+                    token = zlib.crc32(padded[i:i + n].encode())
+                    counts[token] = counts.get(token, 0.0) + 1.0
+        for value in self.exact:
+            token = zlib.crc32(b"x:" + value.encode())
+            counts[token] = counts.get(token, 0.0) + _WORD_WEIGHT
+        # Sublinear term frequency keeps a repeated word from dominating
+        return {token: math.log1p(count) for token, count in counts.items()}
+
+    def matches(self, other: "_Topic") -> bool:
+        """Same exact tokens, and every content word on each side has a counterpart on the other."""
+        if self.exact != other.exact:
+            return False
+        mine = {_stem(w) for w in self.words}
+        theirs = {_stem(w) for w in other.words}
+        return _covered(mine, theirs) and _covered(theirs, mine)
+
+
+def _covered(words: Set[str], others: Set[str]) -> bool:
+    for word in words - others:
+        if len(word) < _TYPO_MIN_LENGTH or not any(
+            len(other) >= _TYPO_MIN_LENGTH and SequenceMatcher(None, word, other).ratio() >= _TYPO_RATIO
+            for other in others
+        ):
+            return False
+    return True
+
+
+class _Tier:
+    """Topics of one age band as sparse rows, with postings per feature."""
+
+    def __init__(self):
+        # Insertion order approximates age
+        self.rows: Dict[str, Dict[int, float]] = {}
+        self.topics: Dict[str, Tuple[str, _Topic]] = {}
+        self.postings: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, key: str, topic: str, parsed: _Topic, row: Dict[int, float]) -> None:
+        self.rows[key] = row
+        self.topics[key] = (topic, parsed)
+        for token in row:
+            self.postings.setdefault(token, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        del self.topics[key]
+        for token in row:
+            keys = self.postings[token]
+            keys.discard(key)
+            if not keys:
+                del self.postings[token]
+
+    def remove_oldest(self, count: int) -> None:
+        for key in list(self.rows)[:count]:
+            self.remove(key)
+
+    def _idf(self, token: int) -> float:
+        return math.log((1.0 + len(self.rows)) / (1.0 + len(self.postings.get(token, ())))) + 1.0
+
+    def _norm(self, row: Dict[int, float]) -> float:
+        return math.sqrt(sum((value * self._idf(token)) ** 2 for token, value in row.items()))
+
+    def nearest(self, row: Dict[int, float], limit: int = 4) -> List[Tuple[float, str]]:
+        """Closest topics as ``(cosine similarity, key)``, best first."""
+        idf = {token: self._idf(token) for token in row}
+        query_norm = math.sqrt(sum((value * idf[token]) ** 2 for token, value in row.items()))
+        if query_norm == 0.0:
+            return []
+        # Query weights with both sides' IDF folded in, so a dot product is one multiply per shared feature
+        weights = {token: value * idf[token] ** 2 for token, value in row.items()}
+        probes = sorted((t for t in row if t in self.postings), key=lambda t: len(self.postings[t]))
+        candidates: Set[str] = set()
+        for token in probes[:_PROBE_FEATURES]:
+            candidates |= self.postings[token]
+        scored = []
+        for key in candidates:
+            other = self.rows[key]
+            dot = sum(weight * other[token] for token, weight in weights.items() if token in other)
+            norm = self._norm(other)
+            if norm:
+                scored.append((dot / (query_norm * norm), key))
+        scored.sort(reverse=True)
+        return scored[:limit]
+
+
+class SemanticTopicIndex:
+    """Per-age-band cosine index from topic text to an existing lesson's cache key."""
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        margin: float = SEMANTIC_CACHE_MARGIN,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.threshold = threshold
+        self._margin = margin
+        self._max_entries = max_entries
+        self._enabled = enabled
+        self._tiers: Dict[str, _Tier] = {}
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "ambiguous": 0, "stale_keys": 0, "indexed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def add(self, cache_key: str, topic: str, age: Optional[int]) -> bool:
+        """Index a topic whose lesson is cached under ``cache_key``."""
+        if not self._enabled or not topic:
+            return False
+        parsed = _Topic(topic)
+        row = parsed.features()
+        if not row:
+            return False
+        tier = self._tiers.get(age_band(age))
+        if tier is None:
+            tier = self._tiers[age_band(age)] = _Tier()
+        if cache_key in tier.rows:
+            return False
+        if len(tier) >= self._max_entries:
+            tier.remove_oldest(max(1, self._max_entries // 10))
+        tier.add(cache_key, topic, parsed, row)
+        self._stats["indexed"] += 1
+        return True
+
+    def lookup(self, topic: str, age: Optional[int]) -> Optional[Tuple[str, str, float]]:
+        """Return ``(cache_key, matched_topic, similarity)`` for the closest topic above the threshold."""
+        if not self._enabled:
+            return None
+        self._stats["lookups"] += 1
+        tier = self._tiers.get(age_band(age))
+        parsed = _Topic(topic)
+        row = parsed.features()
+        if tier is None or not len(tier) or not row:
+            self._stats["misses"] += 1
+            return None
+        best = None
+        runner_up = 0.0
+        for score, key in tier.nearest(row):
+            if best is None and score >= self.threshold and parsed.matches(tier.topics[key][1]):
+                best = (score, key)
+            elif not parsed.matches(tier.topics[key][1]):
+                # Other copies of the same topic are not competitors
+                runner_up = max(runner_up, score)
+        if best is None:
+            self._stats["misses"] += 1
+            return None
+        score, key = best
+        if score - runner_up < self._margin:
+            # Nearly as close to a different topic: too ambiguous to reuse
+            self._stats["ambiguous"] += 1
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return key, tier.topics[key][0], score
+
+    def discard(self, cache_key: str, age: Optional[int]) -> None:
+        """Forget a key whose lesson is no longer cached."""
+        tier = self._tiers.get(age_band(age))
+        if tier is not None and cache_key in tier.rows:
+            tier.remove(cache_key)
+            self._stats["stale_keys"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        lookups = stats["lookups"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["threshold"] = self.threshold
+        stats["enabled"] = self._enabled
+        stats["tiers"] = {name: len(tier) for name, tier in self._tiers.items()}
+        return stats
+
+
+# One index per cache: a key is only meaningful to the cache its lesson was stored in
+_indexes: "weakref.WeakKeyDictionary[Any, SemanticTopicIndex]" = weakref.WeakKeyDictionary()
+
+
+def get_semantic_topic_index(cache: Any) -> SemanticTopicIndex:
+    """Return the process-wide semantic topic index for a lesson cache backend."""
+    index = _indexes.get(cache)
+    if index is None:
+        index = _indexes[cache] = SemanticTopicIndex()
+    return index
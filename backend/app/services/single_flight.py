@@ -0,0 +1,229 @@
+"""
+Single-flight execution of expensive calls across processes.
+
+The first caller for a key becomes the leader and runs the computation; every
+other caller waits for the leader's result instead of repeating the work.
+``LocalSingleFlight`` coalesces within one process and is the stand-in used in
+tests. ``RedisSingleFlight`` adds a Redis lock (``SET NX PX``) and a pub/sub
+channel so followers in other workers read the leader's result too.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import orjson
+
+from app.config import (
+    SINGLE_FLIGHT_LOCK_TTL_MS,
+    SINGLE_FLIGHT_RESULT_TTL,
+    SINGLE_FLIGHT_WAIT_SECONDS,
+)
+from app.repositories.redis_client import get_async_redis, mark_redis_unavailable
+
+logger = logging.getLogger(__name__)
+
+# Deletes the lock only if this leader still owns it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+Encoder = Callable[[Any], Any]
+Decoder = Callable[[Any], Any]
+
+_registry: Dict[str, "LocalSingleFlight"] = {}
+
+
+class LocalSingleFlight:
+    """Coalesce concurrent calls for the same key within this process."""
+
+    def __init__(self, namespace: str = "default"):
+        self.namespace = namespace
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {
+            "leaders": 0,
+            "coalesced_local": 0,
+            "coalesced_remote": 0,
+            "timeouts": 0,
+            "fallbacks": 0,
+        }
+
+    def in_flight(self, key: str) -> bool:
+        """Whether this process is already running or waiting on ``key``."""
+        return key in self._inflight
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        encode: Optional[Encoder] = None,
+        decode: Optional[Decoder] = None,
+    ) -> Any:
+        """Run ``fn`` once per key and share its result with concurrent callers.
+
+        ``encode``/``decode`` convert the result to and from JSON-compatible data
+        so it can be handed to other processes; they are unused locally. The
+        computation runs in its own task, so a cancelled caller does not abort
+        it for the others.
+        """
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self._stats["coalesced_local"] += 1
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved when every caller has gone away
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+
+        async def _run():
+            try:
+                result = await self._execute(key, fn, encode, decode)
+            except Exception as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(result)
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.create_task(_run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(fut)
+
+    async def _execute(self, key, fn, encode, decode) -> Any:
+        self._stats["leaders"] += 1
+        return await fn()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return leader / coalesced counters for this namespace."""
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._inflight)
+        calls = stats["leaders"] + stats["coalesced_local"] + stats["coalesced_remote"] + stats["timeouts"]
+        coalesced = stats["coalesced_local"] + stats["coalesced_remote"]
+        stats["coalesced_ratio"] = round(coalesced / calls, 4) if calls else 0.0
+        return stats
+
+
+class RedisSingleFlight(LocalSingleFlight):
+    """Single-flight shared by every worker through a Redis lock and pub/sub.
+
+    Falls back to local coalescing when Redis is unavailable or the result has
+    no encoder. A follower whose leader disappears (lock gone, no result) or
+    exceeds the wait timeout computes the result itself.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "default",
+        lock_ttl_ms: int = SINGLE_FLIGHT_LOCK_TTL_MS,
+        wait_timeout: float = SINGLE_FLIGHT_WAIT_SECONDS,
+        result_ttl: int = SINGLE_FLIGHT_RESULT_TTL,
+    ):
+        super().__init__(namespace)
+        self._lock_ttl_ms = lock_ttl_ms
+        self._wait_timeout = wait_timeout
+        self._result_ttl = result_ttl
+
+    def _keys(self, key: str):
+        prefix = f"sf:{self.namespace}"
+        return f"{prefix}:lock:{key}", f"{prefix}:result:{key}", f"{prefix}:done:{key}"
+
+    async def _execute(self, key, fn, encode, decode) -> Any:
+        client = await get_async_redis()
+        if client is None or encode is None or decode is None:
+            return await super()._execute(key, fn, encode, decode)
+
+        lock_key, result_key, channel = self._keys(key)
+        token = uuid.uuid4().hex
+        try:
+            acquired = await client.set(lock_key, token, nx=True, px=self._lock_ttl_ms)
+        except Exception as e:
+            logger.debug(f"Single-flight lock failed for {self.namespace}:{key}: {e}")
+            await mark_redis_unavailable(e)
+            self._stats["fallbacks"] += 1
+            return await super()._execute(key, fn, encode, decode)
+
+        if acquired:
+            self._stats["leaders"] += 1
+            try:
+                result = await fn()
+                await self._publish(client, result_key, channel, orjson.dumps(encode(result)))
+                return result
+            finally:
+                await self._release(client, lock_key, token)
+
+        raw = await self._follow(client, lock_key, result_key, channel)
+        if raw is None:
+            self._stats["timeouts"] += 1
+            return await fn()
+        try:
+            result = decode(orjson.loads(raw))
+        except Exception as e:
+            logger.warning(f"Single-flight result for {self.namespace}:{key} could not be decoded: {e}")
+            self._stats["timeouts"] += 1
+            return await fn()
+        self._stats["coalesced_remote"] += 1
+        return result
+
+    async def _publish(self, client, result_key: str, channel: str, payload: bytes) -> None:
+        try:
+            await client.set(result_key, payload, ex=self._result_ttl)
+            await client.publish(channel, payload)
+        except Exception as e:
+            logger.warning(f"Single-flight publish failed for {result_key}: {e}")
+
+    async def _release(self, client, lock_key: str, token: str) -> None:
+        try:
+            await client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.debug(f"Single-flight lock release failed for {lock_key}: {e}")
+
+    async def _follow(self, client, lock_key: str, result_key: str, channel: str) -> Optional[bytes]:
+        """Wait for the leader's result; None if it never arrives."""
+        pubsub = client.pubsub()
+        try:
+            # Subscribe before reading the result key so a publish cannot be missed
+            await pubsub.subscribe(channel)
+            raw = await client.get(result_key)
+            if raw is not None:
+                return raw
+            deadline = time.monotonic() + self._wait_timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=min(remaining, 1.0)
+                )
+                if message is not None and message.get("type") == "message":
+                    return message["data"]
+                if not await client.exists(lock_key):
+                    # Leader finished or died; the result key tells which
+                    return await client.get(result_key)
+        except Exception as e:
+            logger.debug(f"Single-flight wait failed for {channel}: {e}")
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+def create_single_flight(namespace: str) -> LocalSingleFlight:
+    """Create the distributed single-flight for a namespace and register its stats."""
+    flight = RedisSingleFlight(namespace)
+    _registry[namespace] = flight
+    return flight
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Return stats for every registered single-flight namespace."""
+    return {name: flight.stats() for name, flight in _registry.items()}
@@ -0,0 +1,280 @@
+"""
+Process pool for SymPy work.
+
+``sympify``/``solve``/``simplify`` are CPU-bound and can run for minutes on
+pathological input, so they run in worker processes that import SymPy once at
+start-up. Each worker is its own single-process executor and takes one job at
+a time. A caller may give up sooner than the pool's timeout (canonicalization
+does) and gets ``SympyTimeoutError`` while the job finishes in the background;
+only a job still running after the pool's timeout gets its worker killed and
+replaced, leaving the other workers and their jobs alone.
+"""
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from app.config import SYMPY_POOL_WORKERS, SYMPY_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class SympyTimeoutError(TimeoutError):
+    """A SymPy job exceeded its caller's time budget."""
+
+
+def _init_worker() -> None:
+    """Import SymPy and warm its parser once per worker process."""
+    _parse("2x + 1")
+
+
+def _parse(text: str):
+    """Parse user math, accepting implicit multiplication (``2x``) and ``^`` for powers."""
+    from sympy.parsing.sympy_parser import (
+        convert_xor,
+        implicit_multiplication_application,
+        parse_expr,
+        standard_transformations,
+    )
+
+    transformations = standard_transformations + (implicit_multiplication_application, convert_xor)
+    return parse_expr(text.strip(), transformations=transformations)
+
+
+def solve_expression(question: str) -> Dict[str, Any]:
+    """Solve an equation or simplify an expression; runs inside a worker process.
+
+    Returns plain strings so results (and errors) pickle cleanly.
+    """
+    from sympy import Eq, simplify, solve
+
+    try:
+        if "=" in question:
+            lhs, rhs = question.split("=", 1)
+            equation = Eq(_parse(lhs), _parse(rhs))
+            solutions = solve(equation)
+            return {
+                "kind": "equation",
+                "expression": str(equation),
+                "solution": str(solutions[0]) if solutions else "No solution",
+            }
+        simplified = simplify(_parse(question))
+        return {"kind": "expression", "expression": str(simplified), "solution": str(simplified)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+# Canonical symbol names; user input never produces identifiers with this prefix
+CANONICAL_SYMBOL_PREFIX = "_m"
+# Try every renaming up to this many free symbols, otherwise rename in name order
+_MAX_PERMUTED_SYMBOLS = 4
+
+
+def canonical_form(question: str) -> Dict[str, Any]:
+    """Reduce a problem to a key shared by equivalent formulations; runs in a worker.
+
+    Equations become ``lhs - rhs`` with the sign normalized. SymPy's automatic
+    argument ordering sorts sums and products, and free symbols are renamed to
+    ``_m0, _m1, ...`` in the order giving the smallest key, so ``2x+3=7``,
+    ``3+2*x = 7`` and ``7 = 2y + 3`` share one key. ``symbols`` lists the
+    original names in canonical order.
+    """
+    from itertools import permutations
+
+    from sympy import Symbol
+
+    try:
+        if "=" in question:
+            lhs, rhs = question.split("=", 1)
+            expr = _parse(lhs) - _parse(rhs)
+            if expr.could_extract_minus_sign():
+                expr = -expr
+            kind = "eq"
+        else:
+            expr = _parse(question)
+            kind = "expr"
+        names = sorted(str(sym) for sym in expr.free_symbols)
+        by_name = {str(sym): sym for sym in expr.free_symbols}
+        orders = permutations(names) if len(names) <= _MAX_PERMUTED_SYMBOLS else [tuple(names)]
+        best = None
+        for order in orders:
+            mapping = {by_name[name]: Symbol(f"{CANONICAL_SYMBOL_PREFIX}{i}") for i, name in enumerate(order)}
+            candidate = f"{kind}:{expr.xreplace(mapping)}"
+            if best is None or candidate < best[0]:
+                best = (candidate, list(order))
+        return {"key": best[0], "symbols": best[1]}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+class _Worker:
+    """One SymPy process, replaced on its own when a job overruns."""
+
+    def __init__(self):
+        # spawn keeps the event loop, sockets and threads of this process out of the worker
+        self.executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def kill(self) -> None:
+        processes = list((getattr(self.executor, "_processes", None) or {}).values())
+        for process in processes:
+            try:
+                process.kill()
+            except Exception:
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SympyPool:
+    """Bounded set of SymPy worker processes with timeouts and per-worker recycling."""
+
+    def __init__(self, workers: int = SYMPY_POOL_WORKERS, timeout: float = SYMPY_TIMEOUT_SECONDS):
+        self._workers = max(1, workers)
+        self._timeout = timeout
+        self._all: List[_Worker] = []
+        self._idle: List[_Worker] = []
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Jobs whose callers gave up; held so they are not garbage collected while running
+        self._jobs: Set[asyncio.Future] = set()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "recycles": 0,
+            "pending": 0,
+        }
+
+    def _ensure_workers(self) -> None:
+        if not self._all:
+            self._all = [_Worker() for _ in range(self._workers)]
+            self._idle = list(self._all)
+
+    async def _acquire(self) -> _Worker:
+        self._ensure_workers()
+        if self._idle:
+            return self._idle.pop()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(waiter.result())
+            raise
+
+    def _release(self, worker: _Worker) -> None:
+        if worker not in self._all:
+            # Shut down while the job ran
+            worker.kill()
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(worker)
+                return
+        self._idle.append(worker)
+
+    def _recycle(self, worker: _Worker) -> _Worker:
+        """Kill a stuck or broken worker and put a fresh one in its place."""
+        self._stats["recycles"] += 1
+        worker.kill()
+        if worker not in self._all:
+            return worker
+        replacement = _Worker()
+        self._all[self._all.index(worker)] = replacement
+        return replacement
+
+    async def run(self, question: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Solve in a worker; raises ValueError on SymPy errors, SympyTimeoutError on timeout."""
+        return await self._submit(solve_expression, question, timeout)
+
+    async def canonicalize(self, question: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Compute the canonical key of a problem in a worker (see ``canonical_form``)."""
+        return await self._submit(canonical_form, question, timeout)
+
+    async def _execute(self, fn, question: str) -> Dict[str, Any]:
+        """Run one job on a free worker, recycling that worker if the job outlives the pool timeout."""
+        worker = await self._acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(worker.executor, fn, question), timeout=self._timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"SymPy job still running after {self._timeout}s; recycling its worker")
+            worker = self._recycle(worker)
+            raise SympyTimeoutError(f"SymPy timed out for: {question[:80]}")
+        except BrokenProcessPool as e:
+            worker = self._recycle(worker)
+            raise RuntimeError(f"SymPy worker broken: {e}") from e
+        finally:
+            self._release(worker)
+
+    async def _submit(self, fn, question: str, timeout: Optional[float]) -> Dict[str, Any]:
+        timeout = timeout or self._timeout
+        self._stats["submitted"] += 1
+        self._stats["pending"] += 1
+        job = asyncio.ensure_future(self._execute(fn, question))
+        # Callers that give up early leave the job to finish (or time out) on its own
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+        job.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            result = await asyncio.wait_for(asyncio.shield(job), timeout=timeout)
+        except (asyncio.TimeoutError, SympyTimeoutError):
+            self._stats["timeouts"] += 1
+            raise SympyTimeoutError(f"SymPy timed out for: {question[:80]}")
+        except RuntimeError:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._stats["pending"] -= 1
+
+        if "error" in result:
+            self._stats["failed"] += 1
+            raise ValueError(result["error"])
+        self._stats["completed"] += 1
+        return result
+
+    async def warm_up(self) -> None:
+        """Start the worker processes and wait until each has imported SymPy."""
+        self._ensure_workers()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(worker.executor, _init_worker) for worker in self._all))
+
+    def shutdown(self) -> None:
+        workers, self._all, self._idle = self._all, [], []
+        for worker in workers:
+            worker.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["workers"] = self._workers
+        stats["queue_depth"] = sum(1 for waiter in self._waiters if not waiter.done())
+        stats["running"] = bool(self._all)
+        return stats
+
+
+_pool: Optional[SympyPool] = None
+
+
+def get_sympy_pool() -> SympyPool:
+    """Return the process-wide SymPy pool."""
+    global _pool
+    if _pool is None:
+        _pool = SympyPool()
+    return _pool
+
+
+def get_sympy_pool_stats() -> Dict[str, Any]:
+    return get_sympy_pool().stats()
+
+
+def shutdown_sympy_pool() -> None:
+    if _pool is not None:
+        _pool.shutdown()
@@ -0,0 +1,193 @@
+"""
+Process-wide caches for bearer token verification.
+
+Supabase access tokens are RS256-signed with keys published as a JWKS. The
+key set is fetched once per URL with the async httpx client and refreshed in
+the background every ``JWKS_REFRESH_SECONDS``; a token signed by a key id we
+have not seen yet triggers one early refetch (at most every
+``JWKS_MIN_REFETCH_SECONDS``) so key rotation is picked up without a restart.
+
+Verified claims are kept in a small LRU keyed by the SHA-256 of the token
+until the token's ``exp``, so a client repeating the same bearer token skips
+signature checks entirely. Both caches are only touched from the event loop.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+import jwt
+
+from app.config import (
+    AUTH_CLAIMS_CACHE_SIZE,
+    AUTH_CLAIMS_MAX_TTL,
+    JWKS_MIN_REFETCH_SECONDS,
+    JWKS_REFRESH_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """Signing keys of one JWKS endpoint, rotated in the background."""
+
+    def __init__(
+        self,
+        url: str,
+        refresh_seconds: float = JWKS_REFRESH_SECONDS,
+        min_refetch_seconds: float = JWKS_MIN_REFETCH_SECONDS,
+    ):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._http: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"fetches": 0, "errors": 0, "unknown_kid": 0}
+
+    async def refresh(self, force: bool = True) -> None:
+        """Fetch the key set; without ``force`` skip it if fetched recently."""
+        async with self._lock:
+            # Requests queued behind a fetch that just finished reuse its result
+            if not force and self._fetched_at is not None and time.monotonic() - self._fetched_at < self.min_refetch_seconds:
+                return
+            if self._http is None:
+                self._http = httpx.AsyncClient(timeout=httpx.Timeout(5.0))
+            try:
+                response = await self._http.get(self.url)
+                response.raise_for_status()
+                key_set = jwt.PyJWKSet.from_dict(response.json())
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"JWKS fetch from {self.url} failed: {e}")
+                return
+            finally:
+                # Failed fetches count too, so an outage is not retried on every request
+                self._fetched_at = time.monotonic()
+            self._keys = {key.key_id: key for key in key_set.keys}
+            self._stats["fetches"] += 1
+
+    def _ensure_rotation(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._rotate())
+
+    async def _rotate(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            await self.refresh()
+
+    async def get_signing_key(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        """Key for ``kid`` (or the only key when the token names none), fetching if needed."""
+        self._ensure_rotation()
+        if self._fetched_at is None:
+            await self.refresh(force=False)
+        key = self._lookup(kid)
+        if key is None:
+            # Keys may have rotated since the last fetch
+            self._stats["unknown_kid"] += 1
+            await self.refresh(force=False)
+            key = self._lookup(kid)
+        return key
+
+    def _lookup(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        if kid is None:
+            return next(iter(self._keys.values())) if len(self._keys) == 1 else None
+        return self._keys.get(kid)
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+        http, self._http = self._http, None
+        if http is not None:
+            await http.aclose()
+
+    def stats(self) -> dict:
+        return {**self._stats, "keys": len(self._keys)}
+
+
+class ClaimsCache:
+    """LRU of verified token claims, keyed by token hash, each valid until its ``exp``."""
+
+    def __init__(
+        self,
+        maxsize: int = AUTH_CLAIMS_CACHE_SIZE,
+        max_ttl: float = AUTH_CLAIMS_MAX_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.maxsize = max(1, maxsize)
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8", "ignore")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        claims, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return claims
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        now = self._clock()
+        exp = claims.get("exp")
+        # Tokens without an expiry are only trusted for max_ttl
+        expires_at = float(exp) if isinstance(exp, (int, float)) else now + self.max_ttl
+        if expires_at <= now:
+            return
+        key = self._key(token)
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {**self._stats, "size": len(self._entries)}
+
+
+_jwks_caches: Dict[str, JWKSCache] = {}
+_claims_cache = ClaimsCache()
+
+
+def get_jwks_cache(url: str) -> JWKSCache:
+    """Return the shared key cache for ``url``, creating it on first use."""
+    cache = _jwks_caches.get(url)
+    if cache is None:
+        cache = _jwks_caches[url] = JWKSCache(url)
+    return cache
+
+
+def get_claims_cache() -> ClaimsCache:
+    return _claims_cache
+
+
+async def close_jwks_caches() -> None:
+    """Stop background rotation and close the JWKS HTTP clients."""
+    caches = list(_jwks_caches.values())
+    _jwks_caches.clear()
+    for cache in caches:
+        try:
+            await cache.close()
+        except Exception as e:
+            logger.warning(f"Error closing JWKS cache: {e}")
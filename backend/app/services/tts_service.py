@@ -5,7 +5,15 @@ import logging
 import wave
 import hashlib
 import asyncio
-from typing import Optional
+import collections
+import contextlib
+import functools
+import inspect
+import re
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional
 
 # Import Google GenAI SDK with proper error handling
 # Using try/except ImportError to handle cases where the package is not installed
@@ -21,44 +29,96 @@ except (ImportError, ModuleNotFoundError):
     genai_types = None
 
 from app.repositories.interfaces import ICacheRepository
-from app.config import TTS_MODEL, TTS_SAMPLE_RATE, TTS_CONCURRENT_LIMIT, TTS_CACHE_TTL
+from app.repositories.audio_cache import TieredAudioCache
+from app.config import TTS_MODEL, TTS_SAMPLE_RATE, TTS_CONCURRENT_LIMIT, TTS_CACHE_TTL, TTS_CHUNK_SIZE, TTS_PIPELINE_MIN_CHARS, TTS_PIPELINE_WINDOW
 from app.jobs.queue_config import get_tts_queue
 
 logger = logging.getLogger(__name__)
 
 
-class _InMemoryCache(ICacheRepository):
-    def __init__(self):
-        self._store = {}
-        self._stats = {"hits": 0, "misses": 0}
+_tts_executor: Optional[ThreadPoolExecutor] = None
+_tts_stats = {
+    "queued": 0,
+    "max_queued": 0,
+    "in_flight": 0,
+    "acquired": 0,
+    "total_wait_ms": 0.0,
+    "max_wait_ms": 0.0,
+    "pipeline_failures": 0,
+}
 
-    async def get(self, key: str, namespace: str = "default"):
-        val = self._store.get((namespace, key))
-        if val is None:
-            self._stats["misses"] += 1
-        else:
-            self._stats["hits"] += 1
-        return val
 
-    async def set(self, key: str, value, ttl: Optional[int] = None, namespace: str = "default"):
-        self._store[(namespace, key)] = value
-        return True
+def _get_tts_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for synchronous Gemini calls, sized to the TTS concurrency limit."""
+    global _tts_executor
+    if _tts_executor is None:
+        _tts_executor = ThreadPoolExecutor(max_workers=TTS_CONCURRENT_LIMIT, thread_name_prefix="tts")
+    return _tts_executor
+
+
+def get_tts_stats() -> dict:
+    """Return synthesis queue depth and slot wait-time metrics."""
+    stats = dict(_tts_stats)
+    acquired = stats["acquired"]
+    stats["avg_wait_ms"] = round(stats["total_wait_ms"] / acquired, 3) if acquired else 0.0
+    stats["total_wait_ms"] = round(stats["total_wait_ms"], 3)
+    stats["max_wait_ms"] = round(stats["max_wait_ms"], 3)
+    stats["limit"] = TTS_CONCURRENT_LIMIT
+    return stats
+
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
 
-    async def delete(self, key: str, namespace: str = "default"):
-        return bool(self._store.pop((namespace, key), None))
+def split_tts_chunks(blocks: List[str], min_chars: int = TTS_PIPELINE_MIN_CHARS) -> List[str]:
+    """Split text blocks (introduction, section title/content) into sentence chunks.
 
-    async def exists(self, key: str, namespace: str = "default"):
-        return (namespace, key) in self._store
+    Chunks never cross block boundaries and very short sentences are merged with
+    the next one, so the same block always yields the same chunks and their
+    audio is reused across full, summary and section readouts.
+    """
+    chunks: List[str] = []
+    for block in blocks:
+        pending = ""
+        for sentence in _SENTENCE_BOUNDARY.split(block or ""):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            pending = f"{pending} {sentence}" if pending else sentence
+            if len(pending) >= min_chars:
+                chunks.append(pending)
+                pending = ""
+        if pending:
+            chunks.append(pending)
+    return chunks
 
-    async def get_stats(self):
-        return dict(self._stats)
+
+def _wav_from_pcm(pcm: bytes) -> bytes:
+    """Wrap 16-bit mono PCM in a WAV container."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(TTS_SAMPLE_RATE)  # Configurable sample rate
+        wf.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _streaming_wav_header() -> bytes:
+    """WAV header for a stream of unknown length (sizes set to the maximum)."""
+    byte_rate = TTS_SAMPLE_RATE * 2
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, TTS_SAMPLE_RATE, byte_rate, 2, 16)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF - 36)
+    )
 
 
 class TTSService:
     """Text-to-speech service using Google's Gemini TTS when available, with WAV fallback."""
 
     def __init__(self, cache_repo: Optional[ICacheRepository] = None, gemini_client=None):
-        self.cache_repo = cache_repo or _InMemoryCache()
+        self.cache_repo = cache_repo or TieredAudioCache()
         self.gemini_client = gemini_client or self._init_gemini()
         # Add concurrent request limiting
         self._semaphore = asyncio.Semaphore(TTS_CONCURRENT_LIMIT)
@@ -123,50 +183,187 @@ class TTSService:
         job = await tts_queue.add("tts-generation", job_data)
         return job.id
 
+    def _gemini_ready(self) -> bool:
+        return bool(self.gemini_client and GOOGLE_GENAI_AVAILABLE and genai_types is not None)
+
+    def _generate_request(self, text: str, voice_name: str) -> dict:
+        # Use optimized model and configuration for faster response
+        return {
+            "model": TTS_MODEL,  # Configurable model
+            "contents": text,
+            "config": genai_types.GenerateContentConfig(
+                response_modalities=["AUDIO"],
+                speech_config=genai_types.SpeechConfig(
+                    voice_config=genai_types.VoiceConfig(
+                        prebuilt_voice_config=genai_types.PrebuiltVoiceConfig(
+                            voice_name=voice_name,
+                        )
+                    )
+                ),
+            ),
+        }
+
+    async def _generate_pcm(self, text: str, voice_name: str) -> bytes:
+        """Synthesize raw 16-bit mono PCM for text with Gemini TTS without blocking the loop.
+
+        Prefers an async surface (``client.aio``); a synchronous client runs on
+        the dedicated bounded TTS thread pool.
+        """
+        request = self._generate_request(text, voice_name)
+        generate = self.gemini_client.models.generate_content
+        aio = getattr(self.gemini_client, "aio", None)
+        aio_generate = getattr(getattr(aio, "models", None), "generate_content", None)
+        if inspect.iscoroutinefunction(generate):
+            response = await generate(**request)
+        elif inspect.iscoroutinefunction(aio_generate):
+            response = await aio_generate(**request)
+        else:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(_get_tts_executor(), functools.partial(generate, **request))
+        parts = response.candidates[0].content.parts
+        pcm = parts[0].inline_data.data
+        if isinstance(pcm, str):
+            pcm = base64.b64decode(pcm)
+        return pcm
+
+    @contextlib.asynccontextmanager
+    async def _synthesis_slot(self):
+        """Hold one of the TTS_CONCURRENT_LIMIT synthesis slots, recording queue metrics."""
+        _tts_stats["queued"] += 1
+        _tts_stats["max_queued"] = max(_tts_stats["max_queued"], _tts_stats["queued"])
+        start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            _tts_stats["queued"] -= 1
+        wait_ms = (time.perf_counter() - start) * 1000.0
+        _tts_stats["acquired"] += 1
+        _tts_stats["total_wait_ms"] += wait_ms
+        _tts_stats["max_wait_ms"] = max(_tts_stats["max_wait_ms"], wait_ms)
+        _tts_stats["in_flight"] += 1
+        try:
+            yield
+        finally:
+            _tts_stats["in_flight"] -= 1
+            self._semaphore.release()
+
+    @staticmethod
+    def _cache_key(text: str, voice_name: str) -> str:
+        return hashlib.md5(f"{text}:{voice_name}".encode()).hexdigest()[:16]
+
+    async def open_speech_stream(self, text: str, voice_name: str = "leda", chunk_size: int = TTS_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Return an iterator of WAV chunks for the text.
+
+        Hits in the tiered audio cache are streamed straight from memory or a
+        memory-mapped file; misses are synthesized first, so errors surface
+        before the response starts.
+        """
+        voice_name = (voice_name or "leda")
+        if isinstance(self.cache_repo, TieredAudioCache):
+            stream = await self.cache_repo.open_stream(self._cache_key(text, voice_name), namespace="tts", chunk_size=chunk_size)
+            if stream is not None:
+                logger.info("TTS cache hit")
+                return stream
+        audio_data = await self.generate_speech(text, voice_name)
+
+        async def chunker():
+            for i in range(0, len(audio_data), chunk_size):
+                yield audio_data[i:i + chunk_size]
+
+        return chunker()
+
+    async def synthesize_pcm_chunk(self, text: str, voice_name: str = "leda") -> bytes:
+        """Synthesize PCM for one pipeline chunk, cached per chunk so lessons share audio."""
+        voice_name = (voice_name or "leda")
+        cache_key = self._cache_key(text, voice_name)
+        cached_pcm = await self.cache_repo.get(cache_key, namespace="tts_pcm")
+        if cached_pcm:
+            return cached_pcm
+        if not self._gemini_ready():
+            raise RuntimeError("Text-to-speech service is currently unavailable. Please check system configuration.")
+        async with self._synthesis_slot():
+            try:
+                pcm = await self._generate_pcm(text, voice_name)
+            except Exception as e:
+                logger.error(f"Gemini TTS chunk error: {e}")
+                raise RuntimeError(f"TTS generation failed: {str(e)}") from e
+        await self.cache_repo.set(cache_key, pcm, ttl=TTS_CACHE_TTL, namespace="tts_pcm")
+        return pcm
+
+    async def open_pipelined_stream(self, blocks: List[str], voice_name: str = "leda") -> AsyncIterator[bytes]:
+        """Stream a WAV for text blocks, synthesizing sentence chunks concurrently.
+
+        At most TTS_PIPELINE_WINDOW chunks are in flight per stream, so one lesson
+        cannot hold every synthesis slot; PCM is emitted in order behind a streaming
+        WAV header. Failures are counted in the TTS stats. The first chunk is
+        awaited here so its failure surfaces before streaming; a later one aborts
+        the response instead of ending it as a shorter WAV.
+        """
+        chunks = split_tts_chunks(blocks)
+        if not chunks:
+            raise ValueError("No text content to synthesize")
+        pending = collections.deque()
+        upcoming = iter(chunks)
+
+        def schedule():
+            for chunk in upcoming:
+                task = asyncio.create_task(self.synthesize_pcm_chunk(chunk, voice_name))
+                # Mark failures of chunks that are never awaited as retrieved
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                pending.append(task)
+                if len(pending) >= TTS_PIPELINE_WINDOW:
+                    break
+
+        def cancel_pending():
+            while pending:
+                task = pending.popleft()
+                if not task.done():
+                    task.cancel()
+
+        schedule()
+        try:
+            first = await pending.popleft()
+        except BaseException:
+            _tts_stats["pipeline_failures"] += 1
+            cancel_pending()
+            raise
+        schedule()
+
+        async def stream():
+            try:
+                yield _streaming_wav_header()
+                yield first
+                while pending:
+                    pcm = await pending.popleft()
+                    schedule()
+                    yield pcm
+            except Exception as e:
+                _tts_stats["pipeline_failures"] += 1
+                logger.error(f"Pipelined TTS stopped early: {e}")
+                raise
+            finally:
+                cancel_pending()
+
+        return stream()
+
     async def generate_speech(self, text: str, voice_name: str = "leda") -> bytes:
         """Generate speech from text; uses cache, Gemini TTS, and WAV fallback."""
-        # Use semaphore to limit concurrent requests
-        async with self._semaphore:
-            # Normalize and default voice name
-            voice_name = (voice_name or "leda")
-            # Cache key
-            cache_key = hashlib.md5(f"{text}:{voice_name}".encode()).hexdigest()[:16]
-            cached_audio = await self.cache_repo.get(cache_key, namespace="tts")
-            if cached_audio:
-                logger.info("TTS cache hit")
-                return cached_audio
+        # Normalize and default voice name
+        voice_name = (voice_name or "leda")
+        # Cache key
+        cache_key = self._cache_key(text, voice_name)
+        # Cache hits are served without waiting for a synthesis slot
+        cached_audio = await self.cache_repo.get(cache_key, namespace="tts")
+        if cached_audio:
+            logger.info("TTS cache hit")
+            return cached_audio
 
-            # Try Gemini TTS with optimized settings
-            if (self.gemini_client and GOOGLE_GENAI_AVAILABLE and 
-                genai_types is not None):
+        # Try Gemini TTS with optimized settings
+        if self._gemini_ready():
+            # Use semaphore to limit concurrent requests
+            async with self._synthesis_slot():
                 try:
-                    # Use optimized model and configuration for faster response
-                    response = self.gemini_client.models.generate_content(
-                        model=TTS_MODEL,  # Configurable model
-                        contents=text,
-                        config=genai_types.GenerateContentConfig(
-                            response_modalities=["AUDIO"],
-                            speech_config=genai_types.SpeechConfig(
-                                voice_config=genai_types.VoiceConfig(
-                                    prebuilt_voice_config=genai_types.PrebuiltVoiceConfig(
-                                        voice_name=voice_name,
-                                    )
-                                )
-                            ),
-                        )
-                    )
-                    parts = response.candidates[0].content.parts
-                    pcm = parts[0].inline_data.data
-                    if isinstance(pcm, str):
-                        pcm = base64.b64decode(pcm)
-                    # Build WAV from PCM with optimized settings
-                    buf = io.BytesIO()
-                    with wave.open(buf, "wb") as wf:
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)
-                        wf.setframerate(TTS_SAMPLE_RATE)  # Configurable sample rate
-                        wf.writeframes(pcm)
-                    audio_data = buf.getvalue()
+                    audio_data = _wav_from_pcm(await self._generate_pcm(text, voice_name))
                     # Cache with longer TTL for better reuse
                     await self.cache_repo.set(cache_key, audio_data, ttl=TTS_CACHE_TTL, namespace="tts")
                     return audio_data
@@ -175,6 +372,17 @@ class TTSService:
                     # Re-raise the exception to signal failure instead of silent fallback
                     raise RuntimeError(f"TTS generation failed: {str(e)}") from e
 
-            # If we reach here, TTS service is not properly configured
-            logger.error("TTS service not properly configured - no Gemini client available")
-            raise RuntimeError("Text-to-speech service is currently unavailable. Please check system configuration.")
\ No newline at end of file
+        # If we reach here, TTS service is not properly configured
+        logger.error("TTS service not properly configured - no Gemini client available")
+        raise RuntimeError("Text-to-speech service is currently unavailable. Please check system configuration.")
+
+
+_shared_tts_service: Optional[TTSService] = None
+
+
+def get_tts_service() -> TTSService:
+    """Return the process-wide TTS service shared by routes and background jobs."""
+    global _shared_tts_service
+    if _shared_tts_service is None:
+        _shared_tts_service = TTSService()
+    return _shared_tts_service
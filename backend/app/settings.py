@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from typing import List, Optional
 from pydantic import BaseModel, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -36,6 +37,15 @@ class Settings(BaseSettings):
     redis_db: int = 0
     redis_password: Optional[str] = None
 
+    # Cache TTLs (seconds) per namespace
+    cache_ttl_lessons: int = 1800
+    # Lessons past cache_ttl_lessons are still served (and refreshed) for this long
+    cache_stale_lessons: int = 86400
+    cache_ttl_tts: int = 7200
+    cache_ttl_history: int = 300
+    cache_ttl_popular: int = 3600
+    cache_ttl_math: int = 3600
+
     @field_validator("cors_origins", mode="before")
     def parse_origins(cls, v):
         if isinstance(v, str):
@@ -73,5 +83,17 @@ def load_settings() -> Settings:
         "redis_port": int(os.getenv("REDIS_PORT", "6379")),
         "redis_db": int(os.getenv("REDIS_DB", "0")),
         "redis_password": os.getenv("REDIS_PASSWORD"),
+        "cache_ttl_lessons": int(os.getenv("CACHE_TTL_LESSONS", "1800")),
+        "cache_stale_lessons": int(os.getenv("CACHE_STALE_LESSONS", "86400")),
+        "cache_ttl_tts": int(os.getenv("CACHE_TTL_TTS", "7200")),
+        "cache_ttl_history": int(os.getenv("CACHE_TTL_HISTORY", "300")),
+        "cache_ttl_popular": int(os.getenv("CACHE_TTL_POPULAR", "3600")),
+        "cache_ttl_math": int(os.getenv("CACHE_TTL_MATH", "3600")),
     }
-    return Settings(**values)
\ No newline at end of file
+    return Settings(**values)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide settings, loaded once. Use ``load_settings()`` for a fresh read."""
+    return load_settings()
@@ -0,0 +1,127 @@
+"""
+get_current_user overhead: per-request JWKS client vs cached keys and claims.
+
+"before" is the previous dependency (copied below): settings re-read through
+load_settings() on every request, HS256 attempted first, then a fresh
+PyJWKClient fetching the key set over HTTP for every Supabase token. "after"
+is app.api.dependencies.auth with the memoized settings, the shared JWKS
+cache and the verified-claims LRU. A local HTTP server stands in for the
+Supabase JWKS endpoint, so "before" only pays loopback latency, not a real
+TLS round trip.
+
+- ``hs256``: a token signed with the local API secret
+- ``rs256``: a Supabase-style token signed with an RSA key from the JWKS
+
+Run from backend/:
+    python benchmarks/auth_dependency.py --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from jwt import PyJWKClient  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from app.api.dependencies.auth import CurrentUser, get_current_user  # noqa: E402
+from app.settings import get_settings, load_settings  # noqa: E402
+
+SECRET = "bench-secret-key-with-enough-bytes"
+
+
+def get_current_user_before(request, settings):
+    token = request.headers.get("Authorization").split(" ", 1)[1]
+    data = None
+    try:
+        data = jwt.decode(token, settings.api_secret_key, algorithms=["HS256"], options={"verify_aud": False})
+    except Exception:
+        data = None
+    if data is None and settings.supabase_url:
+        jwks_url = settings.supabase_url.rstrip("/") + "/auth/v1/jwks"
+        try:
+            jwk_client = PyJWKClient(jwks_url)
+            signing_key = jwk_client.get_signing_key_from_jwt(token)
+            data = jwt.decode(token, signing_key.key, algorithms=["RS256"], options={"verify_aud": False})
+        except Exception:
+            data = None
+    if data is None:
+        raise RuntimeError("Invalid token")
+    return CurrentUser(id=data["sub"], email=data.get("email"))
+
+
+def serve_jwks(public_key) -> ThreadingHTTPServer:
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(public_key))
+    jwk.update({"kid": "bench-key", "use": "sig", "alg": "RS256"})
+    body = json.dumps({"keys": [jwk]}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_request(token: str) -> Request:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/history",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 50000),
+    }
+    return Request(scope)
+
+
+async def main(iterations: int) -> None:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    server = serve_jwks(private_key.public_key())
+    os.environ["API_SECRET_KEY"] = SECRET
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    get_settings.cache_clear()
+
+    claims = {"sub": "user-1", "email": "a@example.com", "exp": int(time.time()) + 3600}
+    tokens = {
+        "hs256": jwt.encode(claims, SECRET, algorithm="HS256"),
+        "rs256": jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": "bench-key"}),
+    }
+    for name, token in tokens.items():
+        request = make_request(token)
+        assert get_current_user_before(request, load_settings()).id == "user-1"
+        assert (await get_current_user(request, get_settings())).id == "user-1"
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            get_current_user_before(request, load_settings())
+        before = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await get_current_user(request, get_settings())
+        after = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{name:<6} before {before:9.1f} us   after {after:6.1f} us   speedup {before / after:6.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().iterations))
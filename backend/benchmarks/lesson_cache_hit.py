@@ -0,0 +1,112 @@
+"""
+Structured lesson cache-hit latency: model round trip vs pre-serialized bytes.
+
+"before" reproduces the previous hit path: decode the cached dict, rebuild
+StructuredLessonResponse (running every sanitize_text validator) and let
+FastAPI re-serialize it through response_model. "after" is the current path:
+the cached entry already holds the validated lesson's JSON, which is returned
+as a raw Response.
+
+Both routes read the same lesson from the same in-process LessonCache, so the
+difference is the per-hit model and serialization work.
+
+Run from backend/:
+    python benchmarks/lesson_cache_hit.py --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the benchmark on the in-process cache even if a Redis URL is configured
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1/0"
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Response  # noqa: E402
+
+from app.repositories.cache_repository import CacheRepository  # noqa: E402
+from app.services.lesson_cache import LessonCache  # noqa: E402
+from main import StructuredLessonResponse  # noqa: E402
+
+KEY = "bench-lesson"
+
+
+def sample_lesson() -> dict:
+    """A lesson about the size of a 1200-token completion."""
+    paragraph = (
+        "Volcanoes form where molten rock called magma rises through cracks in the crust of the Earth. "
+        "When pressure builds up, the magma erupts as lava, ash and gas, building mountains over time. "
+        "Scientists watch for small earthquakes and swelling ground to predict eruptions. "
+    )
+    return StructuredLessonResponse(
+        id="00000000-0000-0000-0000-000000000000",
+        introduction=paragraph,
+        classifications=[{"type": f"Type {i}", "description": paragraph[:160]} for i in range(4)],
+        sections=[{"title": f"Section {i}", "content": paragraph * 2} for i in range(5)],
+        diagram="A cross-section of a stratovolcano showing the magma chamber, vent and ash cloud.",
+        quiz=[
+            {"q": f"Question {i}: what makes magma rise?", "options": ["Heat", "Pressure", "Gas", "All of these"], "answer": "All of these"}
+            for i in range(5)
+        ],
+    ).model_dump()
+
+
+def build_app(lesson_cache: LessonCache) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/before", response_model=StructuredLessonResponse)
+    async def before():
+        lesson, _ = await lesson_cache.get(KEY)
+        return StructuredLessonResponse(**lesson)
+
+    @app.post("/after")
+    async def after():
+        hit = await lesson_cache.get_entry(KEY)
+        return Response(content=hit.body, media_type="application/json")
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> list:
+    for _ in range(min(100, requests)):
+        await client.post(path)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.post(path)
+        timings.append((time.perf_counter() - start) * 1e6)
+        response.raise_for_status()
+    return timings
+
+
+def report(name: str, timings: list) -> float:
+    timings = sorted(timings)
+    mean = statistics.fmean(timings)
+    p50 = timings[len(timings) // 2]
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<8} mean {mean:8.1f} us   p50 {p50:8.1f} us   p99 {p99:8.1f} us")
+    return mean
+
+
+async def main(requests: int) -> None:
+    lesson_cache = LessonCache(CacheRepository(), soft_ttl=3600, hard_ttl=7200)
+    await lesson_cache.set(KEY, sample_lesson(), validated=True)
+    app = build_app(lesson_cache)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        before = await client.post("/before")
+        after = await client.post("/after")
+        assert before.json() == after.json(), "both paths must return the same lesson"
+        print(f"lesson JSON: {len(after.content)} bytes, {requests} requests per path")
+        slow = report("before", await measure(client, "/before", requests))
+        fast = report("after", await measure(client, "/after", requests))
+    print(f"speedup  {slow / fast:.2f}x per cache hit")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().requests))
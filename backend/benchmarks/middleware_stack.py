@@ -0,0 +1,146 @@
+"""
+Middleware stack throughput: BaseHTTPMiddleware vs pure ASGI.
+
+"before" wraps the application routes in the previous BaseHTTPMiddleware
+versions of the security header and request timing middleware (copied below);
+"after" uses the current pure ASGI ones. Both sit behind the same CORS
+middleware, as in main.py. Each path is driven by concurrent clients for a fixed
+time, reporting requests/sec and latency percentiles:
+
+- ``/health``: a tiny JSON response, dominated by middleware overhead
+- ``/api/tts/``: a cached ~190 KB WAV streamed in TTS_CHUNK_SIZE chunks
+
+Run from backend/:
+    python benchmarks/middleware_stack.py --seconds 5 --concurrency 32
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the benchmark on the in-process cache even if a Redis URL is configured
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1/0"
+
+import httpx  # noqa: E402
+from fastapi.middleware.cors import CORSMiddleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+import main  # noqa: E402
+from app.middleware.request_timing_middleware import RequestTimingMiddleware  # noqa: E402
+from app.middleware.security_headers_middleware import _API_CSP, SecurityHeadersMiddleware  # noqa: E402
+from app.services.tts_service import _wav_from_pcm, get_tts_service  # noqa: E402
+
+TTS_TEXT = "Volcanoes form where magma rises through the crust."
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        response.headers["Content-Security-Policy"] = _API_CSP.decode()
+        if request.url.scheme == "https":
+            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
+        if request.url.path.startswith("/api/"):
+            response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
+        return response
+
+
+_legacy_lock = threading.Lock()
+_legacy_metrics = {}
+
+
+def _legacy_record(path: str, duration_ms: float) -> None:
+    with _legacy_lock:
+        m = _legacy_metrics.setdefault(path, {"count": 0, "avg_ms": 0.0, "p95_ms": 0.0, "_samples": []})
+        m["count"] += 1
+        samples = m["_samples"]
+        samples.append(duration_ms)
+        if len(samples) > 100:
+            del samples[0: len(samples) - 100]
+        m["avg_ms"] = ((m["avg_ms"] * (m["count"] - 1)) + duration_ms) / m["count"]
+        sorted_samples = sorted(samples)
+        m["p95_ms"] = sorted_samples[max(0, int(0.95 * (len(sorted_samples) - 1)))]
+
+
+class LegacyRequestTimingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        duration_ms = (time.perf_counter() - start) * 1000.0
+        response.headers["X-Response-Time-ms"] = f"{duration_ms:.1f}"
+        _legacy_record(request.url.path, duration_ms)
+        return response
+
+
+def build_stack(security, timing):
+    inner = CORSMiddleware(main.app.router, allow_origins=["http://localhost:3001"], allow_credentials=True)
+    return timing(security(inner))
+
+
+async def drive(app, method: str, path: str, body, seconds: float, concurrency: int):
+    timings = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(20):
+            (await client.request(method, path, json=body)).raise_for_status()
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.request(method, path, json=body)
+                response.raise_for_status()
+                timings.append((time.perf_counter() - start) * 1000.0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        "rps": len(timings) / elapsed,
+        "p50": timings[len(timings) // 2],
+        "p99": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        "mean": statistics.fmean(timings),
+    }
+
+
+async def run(seconds: float, concurrency: int) -> None:
+    tts = get_tts_service()
+    wav = _wav_from_pcm(b"\0" * 192000)
+    await tts.cache_repo.set(tts._cache_key(TTS_TEXT, "default"), wav, namespace="tts")
+
+    stacks = {
+        "before": build_stack(LegacySecurityHeadersMiddleware, LegacyRequestTimingMiddleware),
+        "after": build_stack(SecurityHeadersMiddleware, RequestTimingMiddleware),
+    }
+    cases = [("GET", "/health", None), ("POST", "/api/tts/", {"text": TTS_TEXT})]
+    print(f"{concurrency} concurrent clients, {seconds:.0f}s per run")
+    for method, path, body in cases:
+        results = {name: await drive(app, method, path, body, seconds, concurrency) for name, app in stacks.items()}
+        for name, r in results.items():
+            print(
+                f"{path:<11} {name:<7} {r['rps']:8.0f} req/s   "
+                f"p50 {r['p50']:7.2f} ms   p99 {r['p99']:7.2f} ms"
+            )
+        print(f"{path:<11} throughput {results['after']['rps'] / results['before']['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args.seconds, args.concurrency))
@@ -0,0 +1,121 @@
+"""
+In-process rate limiter: timestamp lists vs GCRA buckets.
+
+"before" is the previous in-memory fallback of RateLimitMiddleware (copied
+below): a list of timestamps per client/endpoint/window, rebuilt on every
+check. "after" is app.services.gcra_limiter.GCRALimiter sized to hold every
+key, and "capped" the same limiter bounded to a quarter of them. All apply the
+default 60/min and 1000/hour limits, with a simulated clock advancing 1 ms per
+request:
+
+- ``spread``: 100k distinct client IPs, a few requests each
+- ``hot``: 20 clients each sending 50 requests/sec, far past the minute limit
+
+Reported per case: mean time per check and memory retained by the limiter
+(tracemalloc) once the traffic has been replayed.
+
+Run from backend/:
+    python benchmarks/rate_limiter.py --clients 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.gcra_limiter import GCRALimiter  # noqa: E402
+
+PER_MINUTE = 60
+PER_HOUR = 1000
+ENDPOINT = "/api/structured-lesson"
+
+
+class LegacyMemoryLimiter:
+    def __init__(self):
+        self.memory_store = {}
+
+    def check_rate_limit(self, key, limit, window, current_time):
+        if key not in self.memory_store:
+            self.memory_store[key] = []
+        window_start = current_time - window
+        self.memory_store[key] = [t for t in self.memory_store[key] if t > window_start]
+        self.memory_store[key].append(current_time)
+        return len(self.memory_store[key]) <= limit, len(self.memory_store[key])
+
+    def check_windows(self, identity, now):
+        minute_ok, minute_count = self.check_rate_limit(f"{identity}:minute", PER_MINUTE, 60, now)
+        if not minute_ok:
+            return 1, minute_count
+        hour_ok, _ = self.check_rate_limit(f"{identity}:hour", PER_HOUR, 3600, now)
+        return (0 if hour_ok else 2), minute_count
+
+
+class GCRAAdapter:
+    def __init__(self, max_keys):
+        self.limiter = GCRALimiter(max_keys=max_keys)
+        self.windows = [("minute", 60, PER_MINUTE), ("hour", 3600, PER_HOUR)]
+
+    def check_windows(self, identity, now):
+        return self.limiter.check_windows(identity, self.windows, now)
+
+
+def spread_traffic(clients: int, per_client: int) -> list:
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}:{ENDPOINT}" for i in range(clients)]
+    traffic = ips * per_client
+    random.Random(7).shuffle(traffic)
+    return traffic
+
+
+def hot_traffic(clients: int, per_client: int) -> list:
+    ips = [f"192.168.0.{i}:{ENDPOINT}" for i in range(clients)]
+    return [ips[i % clients] for i in range(clients * per_client)]
+
+
+def replay(limiter, traffic: list) -> tuple:
+    now = 1000.0
+    rejected = 0
+    start = time.perf_counter()
+    for identity in traffic:
+        now += 0.001
+        exceeded, _ = limiter.check_windows(identity, now)
+        rejected += exceeded != 0
+    return (time.perf_counter() - start) / len(traffic) * 1e6, rejected
+
+
+def measure(factory, traffic: list) -> tuple:
+    tracemalloc.start()
+    limiter = factory()
+    per_check, rejected = replay(limiter, traffic)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Timing again without tracemalloc overhead
+    per_check, _ = replay(factory(), traffic)
+    return per_check, retained, rejected
+
+
+def main(clients: int) -> None:
+    cases = {
+        "spread": spread_traffic(clients, 3),
+        "hot": hot_traffic(20, 950),
+    }
+    limiters = {
+        "before": LegacyMemoryLimiter,
+        "after": lambda: GCRAAdapter(max_keys=2 * clients + 64),
+        "capped": lambda: GCRAAdapter(max_keys=clients // 2),
+    }
+    for case, traffic in cases.items():
+        for name, factory in limiters.items():
+            per_check, retained, rejected = measure(factory, traffic)
+            print(
+                f"{case:<6} {name:<6} {len(traffic):>7} checks   {per_check:6.2f} us/check   "
+                f"{retained / 1e6:7.1f} MB retained   {rejected} rejected"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=100000)
+    main(parser.parse_args().clients)
@@ -0,0 +1,211 @@
+"""
+Report assembly latency: sequential queries vs the concurrent query plan.
+
+"before" is the previous ReportsService._generate_report (copied below): the
+searches scan, the user_events scan and a second user_events scan for the
+engagement metrics, awaited one after another. "after" is the current
+ReportsService, which runs the two scans concurrently and derives engagement
+from the activity rows it already has. Both use the shared async PostgREST
+client against a local PostgREST stand-in that answers every query after a
+fixed delay, standing in for the round trip to Supabase.
+
+Reported: per-report latency with one report at a time, and throughput with
+``--concurrency`` reports in flight.
+
+Run from backend/:
+    python benchmarks/reports_query_plan.py --latency-ms 20 --reports 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.repositories.supabase_client import close_supabase_clients, get_postgrest_client  # noqa: E402
+from app.services.reports_service import ReportsService  # noqa: E402
+
+START = datetime(2026, 3, 2)
+
+
+class LegacyReportsService(ReportsService):
+    async def _generate_report(self, user_id, start_date, end_date, report_type):
+        lesson_data = await self._get_lesson_data(user_id, start_date, end_date)
+        activity_data = await self._get_activity_data(user_id, start_date, end_date)
+        engagement_metrics = await self._get_engagement_metrics(user_id, start_date, end_date)
+        total_lessons = len(lesson_data)
+        total_activity_events = len(activity_data)
+        active_days = self._get_active_days(activity_data)
+        top_topics = self._get_top_topics(lesson_data)
+        completion_rate = self._calculate_completion_rate(lesson_data)
+        return {
+            "user_id": user_id,
+            "report_type": report_type,
+            "date_range": {"start": start_date.isoformat(), "end": end_date.isoformat()},
+            "summary": {
+                "total_lessons_completed": total_lessons,
+                "total_activity_events": total_activity_events,
+                "engagement_score": engagement_metrics.get("engagement_score", 0),
+                "completion_rate": completion_rate,
+            },
+            "lessons": {
+                "total": total_lessons,
+                "by_topic": top_topics,
+                "by_date": self._organize_lessons_by_date(lesson_data),
+            },
+            "activity": {
+                "total_events": total_activity_events,
+                "by_type": self._organize_activity_by_type(activity_data),
+                "by_day": active_days,
+            },
+            "engagement": engagement_metrics,
+            "recommendations": self._generate_recommendations(engagement_metrics, top_topics, completion_rate),
+            "generated_at": datetime.now().isoformat(),
+        }
+
+    async def _get_engagement_metrics(self, user_id, start_date, end_date):
+        activity_result = await (
+            self.client.table("user_events")
+            .select("timestamp")
+            .eq("user_id", user_id)
+            .gte("timestamp", start_date.isoformat())
+            .lte("timestamp", end_date.isoformat())
+            .execute()
+        )
+        activity_data = activity_result.data or []
+        if not activity_data:
+            return {"engagement_score": 0, "active_days": 0, "avg_daily_sessions": 0, "most_active_time": None}
+        active_days = set()
+        for event in activity_data:
+            timestamp = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
+            active_days.add(timestamp.date().isoformat())
+        total_events = len(activity_data)
+        active_days_count = len(active_days)
+        avg_daily_events = total_events / active_days_count if active_days_count > 0 else 0
+        activity_score = min(50, total_events * 2)
+        consistency_score = min(50, (active_days_count * 10))
+        engagement_score = min(100, activity_score + consistency_score)
+        return {
+            "engagement_score": engagement_score,
+            "active_days": active_days_count,
+            "total_events": total_events,
+            "avg_daily_events": avg_daily_events,
+        }
+
+
+def table_rows() -> dict:
+    topics = ["Volcanoes", "Fractions", "Photosynthesis", "The Water Cycle"]
+    kinds = ["lesson_start", "lesson_complete", "quiz_complete", "page_view"]
+    searches = [
+        {
+            "id": i,
+            "uid": "user-1",
+            "title": topics[i % len(topics)],
+            "content": "{}",
+            "created_at": (START + timedelta(hours=3 * i)).isoformat() + "Z",
+        }
+        for i in range(40)
+    ]
+    events = [
+        {
+            "id": i,
+            "user_id": "user-1",
+            "event_type": kinds[i % len(kinds)],
+            "metadata": {"topic": topics[i % len(topics)]},
+            "timestamp": (START + timedelta(minutes=45 * i)).isoformat() + "Z",
+        }
+        for i in range(200)
+    ]
+    return {"searches": json.dumps(searches).encode(), "user_events": json.dumps(events).encode()}
+
+
+def serve_postgrest(latency: float) -> ThreadingHTTPServer:
+    bodies = table_rows()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; avoid the delayed-ACK stall
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            table = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+            body = bodies.get(table, b"[]")
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.request_queue_size = 256
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def comparable(report: dict) -> dict:
+    return {key: value for key, value in report.items() if key != "generated_at"}
+
+
+async def sequential(service, reports: int) -> list:
+    timings = []
+    for _ in range(reports):
+        start = time.perf_counter()
+        await service.get_weekly_report("user-1", START)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+async def concurrent(service, reports: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await service.get_weekly_report("user-1", START)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(reports)))
+    return reports / (time.perf_counter() - start)
+
+
+async def main(latency_ms: float, reports: int, concurrency: int) -> None:
+    server = serve_postgrest(latency_ms / 1000.0)
+    client = get_postgrest_client(f"http://127.0.0.1:{server.server_address[1]}", "bench-key")
+    services = {"before": LegacyReportsService(client), "after": ReportsService(client)}
+
+    before, after = [await s.get_weekly_report("user-1", START) for s in services.values()]
+    assert comparable(before) == comparable(after)
+    # Open pooled connections before timing
+    await concurrent(services["after"], concurrency, concurrency)
+
+    print(f"PostgREST stand-in latency {latency_ms:.0f} ms per query, {reports} weekly reports")
+    for name, service in services.items():
+        timings = sorted(await sequential(service, reports))
+        rate = await concurrent(service, reports * 4, concurrency)
+        print(
+            f"{name:<6} p50 {timings[len(timings) // 2]:6.1f} ms   mean {statistics.fmean(timings):6.1f} ms   "
+            f"{rate:6.1f} reports/s at concurrency {concurrency}"
+        )
+    await close_supabase_clients()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--reports", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms, args.reports, args.concurrency))
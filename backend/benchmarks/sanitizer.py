@@ -0,0 +1,95 @@
+"""
+sanitize_text throughput over lesson-sized payloads.
+
+"before" is the previous implementation from main.py (imports on every call,
+ten uncompiled re.sub passes); "after" is app.services.sanitizer. Each
+iteration sanitizes every field of a ~1200-token lesson the way
+StructuredLessonResponse does: plain prose, prose with quotes, colons and
+ampersands, and prose carrying script schemes and inline handlers.
+
+Run from backend/:
+    python benchmarks/sanitizer.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.sanitizer import sanitize_text  # noqa: E402
+
+
+def sanitize_text_before(text: str) -> str:
+    import re, html
+    if not text:
+        return ""
+    text = html.escape(text)
+    text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<iframe[^>]*>.*?</iframe>', '', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<object[^>]*>.*?</object>', '', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<embed[^>]*>.*?</embed>', '', text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'vbscript:', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'onload=', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'onerror=', '', text, flags=re.IGNORECASE)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text[:1000]
+
+
+PLAIN = (
+    "Volcanoes form where molten rock called magma rises through cracks in the crust of the Earth. "
+    "When pressure builds up the magma erupts as lava, ash and gas, building mountains over time. "
+    "Scientists watch for small earthquakes and swelling ground to predict eruptions.\n"
+)
+MARKED = (
+    "Step 1: magma rises through the Earth's crust & collects in a chamber. "
+    "Step 2: pressure builds until the \"plug\" gives way, and lava = molten rock reaches the surface. "
+    "Scientists' instruments: seismometers & tiltmeters.\n"
+)
+HOSTILE = (
+    "Click <a href=\"javascript:alert(1)\">here</a> to see the volcano erupt. "
+    "<img src=x onerror=alert(1)> Lava flows downhill & cools into rock. "
+    "Step 2: the <body onload=steal()> trick does not work on us.\n"
+)
+
+
+def lesson_fields(paragraph: str) -> list:
+    """Every string StructuredLessonResponse sanitizes for a ~1200-token lesson."""
+    fields = []
+    for i in range(4):
+        fields += [f"Type {i}", paragraph[:160]]
+    for i in range(5):
+        fields += [f"Section {i}", paragraph * 2]
+    for i in range(5):
+        fields += [f"Question {i}: what makes magma rise?", "All of these", "Heat", "Pressure", "Gas", "All of these"]
+    return fields
+
+
+def measure(fn, fields: list, iterations: int) -> float:
+    for text in fields:
+        fn(text)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in fields:
+            fn(text)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int) -> None:
+    for name, paragraph in (("plain", PLAIN), ("marked", MARKED), ("hostile", HOSTILE)):
+        fields = lesson_fields(paragraph)
+        assert [sanitize_text_before(t) for t in fields] == [sanitize_text(t) for t in fields]
+        before = measure(sanitize_text_before, fields, iterations)
+        after = measure(sanitize_text, fields, iterations)
+        size = sum(len(t) for t in fields)
+        print(
+            f"{name:<7} {len(fields)} fields / {size} chars   "
+            f"before {before:8.1f} us   after {after:7.1f} us   speedup {before / after:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    main(parser.parse_args().iterations)
@@ -4,27 +4,47 @@ Simplified FastAPI application for Lana AI Backend.
 """
 
 import logging
+import os
 
 # FastAPI imports
-from fastapi import FastAPI, Response 
+from fastapi import FastAPI, Request, Response
 import uuid
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore
 from app.middleware.security_headers_middleware import SecurityHeadersMiddleware
-from app.middleware.request_timing_middleware import RequestTimingMiddleware, get_metrics_snapshot
+from app.middleware.request_timing_middleware import RequestTimingMiddleware, get_metrics_snapshot, render_prometheus
 from app.settings import load_settings
-from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.repositories.cache_repository import get_cache_repository
+from app.repositories.redis_client import close_async_redis
+from app.repositories.supabase_client import close_supabase_clients, get_postgrest_client, get_supabase_pool_stats
+from app.services.token_verifier import close_jwks_caches
+from app.repositories.lesson_store import get_lesson_store
+from app.services.age_bands import audience_label
+from app.services.lesson_cache import CachedLesson, LessonCache, lesson_cache_key
+from app.services.sanitizer import sanitize_text
+from app.services.semantic_topic_index import get_semantic_topic_index
 
 from app.api.router import api_router
 from fastapi.responses import StreamingResponse  # type: ignore
 import time
 import json
 import asyncio
-import hashlib
-try:
-    from groq import Groq  # type: ignore
-except Exception:
-    Groq = None
-
+import orjson
+from datetime import datetime
+from app.config import PREFETCH_ENABLED, PREFETCH_TTS
+from app.services.llm_gateway import (
+    GROQ_AVAILABLE,
+    chat_completion,
+    close_groq_client,
+    get_groq_client,
+    get_llm_stats,
+    stream_chat_completion,
+)
+from app.services.lesson_stream_parser import IncrementalLessonParser
+from app.services.single_flight import create_single_flight, get_single_flight_stats
+from app.services.tts_service import get_tts_service, get_tts_stats
+from app.services.prefetch_scheduler import PrefetchScheduler
+from app.services.sympy_pool import get_sympy_pool, get_sympy_pool_stats, shutdown_sympy_pool
+from app.services.math_solver_service import prewarm_math_cache
 
 from app.jobs.worker_manager import start_job_workers, stop_job_workers
 
@@ -63,33 +83,32 @@ logger.info(f"Supabase URL configured: {bool(settings.supabase_url)}")
 logger.info(f"Google API key configured: {bool(settings.google_api_key)}")
 
 # Initialize shared cache and Groq client for structured lessons
-_STRUCTURED_LESSON_CACHE = MemoryCacheRepository(default_ttl=1800)
-_GROQ_CLIENT = None
-if Groq and settings.groq_api_key:
-    try:
-        _GROQ_CLIENT = Groq(api_key=settings.groq_api_key)
-        logger.info("Groq client initialized successfully")
-        # Test the client with a simple request
-        try:
-            test_response = _GROQ_CLIENT.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=10
-            )
-            logger.info("Groq client test successful")
-        except Exception as test_error:
-            logger.error(f"Groq client test failed: {test_error}")
-            _GROQ_CLIENT = None  # Set to None if test fails
-    except Exception as e:
-        logger.error(f"Failed to initialize Groq client: {e}")
-        _GROQ_CLIENT = None
+_STRUCTURED_LESSON_CACHE = get_cache_repository()
+_LESSON_STORE = get_lesson_store()
+# Soft/hard TTL view of the "lessons" namespace: stale lessons are served while they refresh
+_LESSON_CACHE = LessonCache(_STRUCTURED_LESSON_CACHE, topic_index=get_semantic_topic_index(_STRUCTURED_LESSON_CACHE))
+_GROQ_CLIENT = get_groq_client(settings.groq_api_key)
+if _GROQ_CLIENT is not None:
+    logger.info("Groq client initialized successfully")
 else:
-    if not Groq:
+    if not GROQ_AVAILABLE:
         logger.warning("Groq library not available")
     if not settings.groq_api_key:
         logger.warning("No Groq API key provided")
 
-_INFLIGHT_LESSONS: dict[str, asyncio.Future] = {}
+# Coalesces concurrent generations of the same lesson across requests and workers
+_LESSON_FLIGHT = create_single_flight("structured_lessons")
+
+# The event loop only keeps weak references to tasks; fire-and-forget work is held here until done
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Run a coroutine in the background without it being garbage collected mid-flight."""
+    task = asyncio.create_task(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+    return task
 
 # Add CORS middleware
 # Use secure CORS configuration
@@ -118,6 +137,7 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     """Initialize job workers on startup."""
+    global _GROQ_CLIENT
     try:
         await start_job_workers()
         logger.info("Job workers started successfully")
@@ -126,16 +146,51 @@ async def startup_event():
         # Don't raise the exception to avoid crashing the application
         pass
 
+    # Smoke-test the shared Groq client without blocking the event loop
+    if _GROQ_CLIENT is not None:
+        try:
+            await chat_completion(
+                _GROQ_CLIENT,
+                model="llama-3.1-8b-instant",
+                messages=[{"role": "user", "content": "test"}],
+                max_tokens=10,
+            )
+            logger.info("Groq client test successful")
+        except Exception as test_error:
+            logger.error(f"Groq client test failed: {test_error}")
+            _GROQ_CLIENT = None  # Set to None if test fails
+
+    # Start SymPy workers now so the first math request does not pay process start-up,
+    # then solve the curriculum corpus so common problems hit the canonical cache
+    _spawn(_warm_up_math())
+
+
+async def _warm_up_math() -> None:
+    """Start the SymPy workers and pre-solve the math corpus once they are ready."""
+    try:
+        # Canonicalization has a short timeout; the corpus must not race worker start-up
+        await get_sympy_pool().warm_up()
+    except Exception as e:
+        logger.warning(f"SymPy pool warm-up failed: {e}")
+        return
+    await prewarm_math_cache(_STRUCTURED_LESSON_CACHE)
+
 # Shutdown event to stop job workers
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Stop job workers on shutdown."""
+    """Stop job workers, the SymPy pool and shared Groq/Redis/JWKS/Supabase connections on shutdown."""
     try:
         await stop_job_workers()
         logger.info("Job workers stopped successfully")
     except Exception as e:
         logger.error(f"Error stopping job workers: {e}")
         pass
+    await _PREFETCH_SCHEDULER.stop()
+    await close_groq_client()
+    await close_async_redis()
+    await close_jwks_caches()
+    await close_supabase_clients()
+    shutdown_sympy_pool()
 
 app.include_router(api_router, prefix="/api")
 
@@ -143,27 +198,6 @@ from pydantic import BaseModel, Field, field_validator  # type: ignore
 from typing import List, Optional
 
 
-def sanitize_text(text: str) -> str:
-    import re, html
-    if not text:
-        return ""
-    # Escape HTML entities
-    text = html.escape(text)
-    # Remove any script tags and other potentially dangerous content
-    text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'<iframe[^>]*>.*?</iframe>', '', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'<object[^>]*>.*?</object>', '', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'<embed[^>]*>.*?</embed>', '', text, flags=re.IGNORECASE | re.DOTALL)
-    text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'vbscript:', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'onload=', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'onerror=', '', text, flags=re.IGNORECASE)
-    # Normalize whitespace
-    text = re.sub(r"\s+", " ", text).strip()
-    # Limit length to prevent abuse
-    return text[:1000]
-
-
 class ClassificationItem(BaseModel):
     type: str
     description: str
@@ -227,6 +261,26 @@ class StructuredLessonResponse(BaseModel):
     diagram: str = ""
     quiz: List[QuizItem]
 
+    @field_validator("introduction")
+    def _san(cls, v):
+        return sanitize_text(v) if v is not None else v
+
+
+def _lesson_from_dump(data: dict) -> StructuredLessonResponse:
+    """Rebuild a lesson from its own ``model_dump()`` without re-running the validators.
+
+    Dumped text is already sanitized; validating it again would escape it twice
+    (``&gt;`` becoming ``&amp;gt;``).
+    """
+    return StructuredLessonResponse.model_construct(
+        id=data.get("id"),
+        introduction=data.get("introduction"),
+        classifications=[ClassificationItem.model_construct(**c) for c in data.get("classifications") or []],
+        sections=[SectionItem.model_construct(**s) for s in data.get("sections") or []],
+        diagram=data.get("diagram") or "",
+        quiz=[QuizItem.model_construct(**q) for q in data.get("quiz") or []],
+    )
+
 
 async def _stub_lesson(topic: str, age: Optional[int] = None) -> StructuredLessonResponse:
     """Generate a stub lesson with clear error messaging instead of generic templates."""
@@ -277,49 +331,248 @@ async def _stub_lesson(topic: str, age: Optional[int] = None) -> StructuredLesso
     return response
 
 
+def _build_lesson_messages(topic: str, age: Optional[int]) -> list[dict]:
+    """Build the system and user prompts for a structured lesson.
+
+    Only the age band reaches the prompt, so lessons are shared per band.
+    """
+
+    sys_prompt = (
+        "You are lana, a helpful tutor who produces a structured lesson as strict JSON. "
+        "Return ONLY valid JSON with these exact keys: "
+        "introduction (string), "
+        "classifications (array of objects with type and description string fields), "
+        "sections (array of objects with title and content string fields), "
+        "diagram (string), "
+        "quiz_questions (array of objects with question, options array, and answer string fields). "
+        "Each quiz question must have exactly 4 options. "
+        f"The learner is a {audience_label(age)}. "
+        "Keep each section content at least 100 words. Include 4 quiz questions with 4 options each. "
+        "IMPORTANT: Respond ONLY with valid JSON, no markdown code blocks, no extra text, no explanations. "
+        "Start your response with '{' and end with '}'. "
+        "Example format: {\"introduction\": \"...\", \"classifications\":[{\"type\":\"...\",\"description\":\"...\"}], \"sections\":[{\"title\":\"...\",\"content\":\"...\"}], \"diagram\":\"...\", \"quiz_questions\":[{\"question\":\"...\",\"options\":[\"...\",\"...\",\"...\",\"...\"],\"answer\":\"...\"}]}")
+
+    user_prompt = f"Topic: {topic}"
+    return [
+        {"role": "system", "content": sys_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _parse_lesson_json(raw_excerpt: str, topic: str) -> dict:
+    """Parse raw LLM output into a lesson dict, repairing common JSON issues."""
+    # Parse JSON - handle markdown code blocks and clean up the response
+    import orjson
+    import json
+
+    # Clean up the response - remove markdown code blocks if present
+    clean_excerpt = raw_excerpt.strip()
+
+    # More robust markdown removal
+    while clean_excerpt.startswith('```'):
+        if clean_excerpt.startswith('```json'):
+            clean_excerpt = clean_excerpt[7:].strip()  # Remove ```json
+        else:
+            clean_excerpt = clean_excerpt[3:].strip()  # Remove ```
+
+    # Remove trailing ```
+    while clean_excerpt.endswith('```'):
+        clean_excerpt = clean_excerpt[:-3].strip()
+
+    # Fix invalid control characters by removing them
+    # Remove incorrect escaping logic
+    # repaired = repaired.replace('\n', '\\n')
+    # repaired = repaired.replace('\r', '\\r')
+    # repaired = repaired.replace('\t', '\\t')
+    # Only escape unescaped backslashes
+    # repaired = re.sub(r'(?<!\\)\\(?!\\)', '\\\\', repaired)
+
+    # Instead, just ensure we have valid JSON by removing any control characters
+    # that might cause issues
+    import re
+    clean_excerpt = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', clean_excerpt)
+
+    # Try to parse with orjson first, fallback to json
+    try:
+        data = orjson.loads(clean_excerpt)
+    except Exception as orjson_error:
+        try:
+            # Fallback to standard json parser
+            data = json.loads(clean_excerpt)
+        except Exception as json_error:
+            # Try to handle incomplete JSON by finding the last complete object
+            try:
+                # Look for the last complete JSON object in the response
+                last_brace = clean_excerpt.rfind('}')
+                if last_brace != -1:
+                    truncated = clean_excerpt[:last_brace + 1]
+                    data = json.loads(truncated)
+                    logger.info(f"Successfully parsed truncated JSON for topic '{topic}'")
+                else:
+                    raise
+            except Exception:
+                # Try additional JSON repair techniques
+                try:
+                    # Attempt to fix common JSON issues
+                    repaired = clean_excerpt
+
+                    # Additional cleanup - remove any remaining markdown artifacts
+                    if repaired.startswith('```'):
+                        # Remove opening ``` if still present
+                        repaired = repaired[3:].strip()
+                    if repaired.endswith('```'):
+                        # Remove closing ``` if still present
+                        repaired = repaired[:-3].strip()
+
+                    repaired = re.sub(r'(?<!\\)\\(?!\\)', '\\\\', repaired)
+
+                    repaired = re.sub(r'}\s*{', '},{', repaired)
+
+                    repaired = re.sub(r'}\s*("[^"]+"\s*:)', r'},\1', repaired)
+
+                    quote_matches = [m.start() for m in re.finditer('"', repaired)]
+                    if len(quote_matches) % 2 != 0:
+
+                        repaired = repaired + '"'
+
+                    # Try to parse the repaired JSON
+                    data = json.loads(repaired)
+                    logger.info(f"Successfully parsed repaired JSON for topic '{topic}'")
+                except Exception as repair_error:
+                    # Last resort - try to parse whatever JSON we can get
+                    try:
+                        # Try to find and parse any valid JSON object in the response
+                        json_match = re.search(r'\{[^{]*(?:\{[^{]*\}[^{]*)*\}', repaired)
+                        if json_match:
+                            potential_json = json_match.group(0)
+                            data = json.loads(potential_json)
+                            logger.info(f"Successfully parsed extracted JSON for topic '{topic}'")
+                        else:
+                            raise
+                    except Exception:
+                        logger.warning(f"Failed to parse JSON with both orjson and json for topic '{topic}'. "
+                                      f"orjson error: {orjson_error}, json error: {json_error}, repair error: {repair_error}. "
+                                      f"Raw excerpt length: {len(clean_excerpt)}")
+                        raise
+    return data
+
+
+def _quiz_item_from_raw(q: object) -> Optional[QuizItem]:
+    """Build a QuizItem from one raw LLM quiz entry, or None if it is unusable."""
+    if not isinstance(q, dict) or "options" not in q or len(q["options"]) < 2:
+        return None
+    if "question" in q and "answer" in q:
+        question, answer = q["question"], q["answer"]
+    elif "question" in q and "correct_answer" in q:  # Keep backward compatibility
+        question, answer = q["question"], q["correct_answer"]
+    elif "q" in q and "answer" in q:  # Handle 'q' field directly
+        question, answer = q["q"], q["answer"]
+    else:
+        return None
+    # Handle options that might be objects with an "option" key
+    options = []
+    for opt in q["options"]:
+        if isinstance(opt, dict) and "option" in opt:
+            options.append(str(opt["option"]))
+        else:
+            options.append(str(opt))
+    return QuizItem(q=question, options=options, answer=answer)
+
+
+def _normalize_lesson(data: dict) -> StructuredLessonResponse:
+    """Normalize a parsed LLM lesson dict into a validated response model."""
+    # Handle introduction - could be string or dict with title/text
+    intro_data = data.get("introduction", "")
+    if isinstance(intro_data, dict):
+        # If it's a dict, try to get text or title
+        intro_norm = (intro_data.get("text", "") or intro_data.get("title", "") or "").strip()
+    else:
+        intro_norm = str(intro_data).strip()
+
+    # Handle diagram - could be in different fields
+    diagram_norm = (data.get("diagram_description", "") or data.get("diagram", "")).strip()
+
+    # Process classifications
+    classifications = []
+    for c in data.get("classifications", []):
+        if isinstance(c, dict) and "type" in c and "description" in c:
+            classifications.append(ClassificationItem(type=c["type"], description=c["description"]))
+
+    # Process sections
+    sections = []
+    for s in data.get("sections", []):
+        if isinstance(s, dict) and "title" in s and "content" in s:
+            sections.append(SectionItem(title=s["title"], content=s["content"]))
+
+    # Process quiz - handle both 'quiz' and 'quiz_questions' field names
+    quiz_data = data.get("quiz", data.get("quiz_questions", []))
+    quiz = []
+    for q in quiz_data:
+        item = _quiz_item_from_raw(q)
+        if item is not None:
+            quiz.append(item)
+
+    return StructuredLessonResponse(
+        id=str(uuid.uuid4()),
+        introduction=intro_norm,
+        classifications=classifications,
+        sections=sections,
+        diagram=diagram_norm,
+        quiz=quiz,
+    )
+
+
+async def _accept_lesson(cache_key: str, topic: str, age: Optional[int], resp: StructuredLessonResponse) -> tuple[StructuredLessonResponse, str]:
+    """Cache an LLM lesson if it meets the quality bar, otherwise fall back to stub."""
+    # Accept LLM response if it has at least one section with content
+    # This is more lenient to avoid falling back to stubs unnecessarily
+    has_minimal_content = (
+        resp.sections and len(resp.sections) >= 1 and  # At least 1 section
+        any(len(s.content) > 10 for s in resp.sections)  # At least one section with meaningful content
+    )
+
+    # Log detailed quality metrics for debugging
+    logger.info(f"LLM response quality check for '{topic}': "
+               f"Has sections: {bool(resp.sections)}, "
+               f"Has quiz: {bool(resp.quiz)}, "
+               f"Section count: {len(resp.sections) if resp.sections else 0}, "
+               f"Quiz count: {len(resp.quiz) if resp.quiz else 0}")
+
+    if resp.sections:
+        section_details = [(s.title, len(s.content)) for s in resp.sections]
+        logger.info(f"Section details: {section_details}")
+
+    if resp.quiz:
+        logger.info(f"Quiz questions: {len(resp.quiz)}")
+
+    if has_minimal_content:
+        lesson = resp.model_dump()
+        try:
+            await _LESSON_CACHE.set(cache_key, lesson, topic=topic, age=age, validated=True)
+            logger.info(f"LLM response for '{topic}' accepted and cached")
+        except Exception as cache_error:
+            logger.warning(f"Failed to cache LLM response for '{topic}': {cache_error}")
+        await _LESSON_STORE.put(cache_key, topic, age, lesson, sanitized=True)
+        return resp, "llm"
+
+    # Log when we're falling back to stub due to incomplete or low-quality LLM response
+    logger.warning(f"LLM response for '{topic}' was low-quality - falling back to stub. "
+                  f"Sections: {len(resp.sections) if resp.sections else 0}, "
+                  f"Quiz: {len(resp.quiz) if resp.quiz else 0}, "
+                  f"Section quality: {[len(s.content) for s in resp.sections] if resp.sections else []}")
+    return await _stub_lesson(topic, age), "stub"
+
+
 async def _compute_structured_lesson(cache_key: str, topic: str, age: Optional[int]) -> tuple[StructuredLessonResponse, str]:
     """Compute structured lesson using LLM or fallback to stub."""
     if _GROQ_CLIENT is not None:
         raw_excerpt = ""
         try:
-
-            age_str = ""
-            if age is not None:
-                if age <= 2:
-                    age_str = "toddler"
-                elif age <= 5:
-                    age_str = "preschooler"
-                elif age <= 12:
-                    age_str = "child"
-                elif age <= 18:
-                    age_str = "teenager"
-                else:
-                    age_str = "adult"
-            
-            sys_prompt = (
-                "You are lana, a helpful tutor who produces a structured lesson as strict JSON. "
-                "Return ONLY valid JSON with these exact keys: "
-                "introduction (string), "
-                "classifications (array of objects with type and description string fields), "
-                "sections (array of objects with title and content string fields), "
-                "diagram (string), "
-                "quiz_questions (array of objects with question, options array, and answer string fields). "
-                "Each quiz question must have exactly 4 options. "
-                f"The learner is a {age_str if age_str else 'general audience'}. "
-                "Keep each section content at least 100 words. Include 4 quiz questions with 4 options each. "
-                "IMPORTANT: Respond ONLY with valid JSON, no markdown code blocks, no extra text, no explanations. "
-                "Start your response with '{' and end with '}'. "
-                "Example format: {\"introduction\": \"...\", \"classifications\":[{\"type\":\"...\",\"description\":\"...\"}], \"sections\":[{\"title\":\"...\",\"content\":\"...\"}], \"diagram\":\"...\", \"quiz_questions\":[{\"question\":\"...\",\"options\":[\"...\",\"...\",\"...\",\"...\"],\"answer\":\"...\"}]}")
-
-            user_prompt = f"Topic: {topic}"
-
             # Call Groq API
-            response = _GROQ_CLIENT.chat.completions.create(
+            response = await chat_completion(
+                _GROQ_CLIENT,
                 model="llama-3.1-8b-instant",
-                messages=[
-                    {"role": "system", "content": sys_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=_build_lesson_messages(topic, age),
                 temperature=0.4,
                 max_tokens=1200,
                 top_p=0.9,
@@ -328,220 +581,12 @@ async def _compute_structured_lesson(cache_key: str, topic: str, age: Optional[i
 
             raw_excerpt = response.choices[0].message.content or ""
             raw_excerpt = raw_excerpt.strip()
-            
+
             # Log the raw response for debugging
             logger.info(f"Raw LLM response for topic '{topic}': {raw_excerpt[:200]}...")
 
-            # Parse JSON - handle markdown code blocks and clean up the response
-            import orjson
-            import json
-            
-            # Clean up the response - remove markdown code blocks if present
-            clean_excerpt = raw_excerpt.strip()
-            
-            # More robust markdown removal
-            while clean_excerpt.startswith('```'):
-                if clean_excerpt.startswith('```json'):
-                    clean_excerpt = clean_excerpt[7:].strip()  # Remove ```json
-                else:
-                    clean_excerpt = clean_excerpt[3:].strip()  # Remove ```
-            
-            # Remove trailing ```
-            while clean_excerpt.endswith('```'):
-                clean_excerpt = clean_excerpt[:-3].strip()
-            
-            # Fix invalid control characters by removing them
-            # Remove incorrect escaping logic
-            # repaired = repaired.replace('\n', '\\n')
-            # repaired = repaired.replace('\r', '\\r')
-            # repaired = repaired.replace('\t', '\\t')
-            # Only escape unescaped backslashes
-            # repaired = re.sub(r'(?<!\\)\\(?!\\)', '\\\\', repaired)
-                            
-            # Instead, just ensure we have valid JSON by removing any control characters
-            # that might cause issues
-            import re
-            clean_excerpt = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', clean_excerpt)
-            
-            # Try to parse with orjson first, fallback to json
-            try:
-                data = orjson.loads(clean_excerpt)
-            except Exception as orjson_error:
-                try:
-                    # Fallback to standard json parser
-                    data = json.loads(clean_excerpt)
-                except Exception as json_error:
-                    # Try to handle incomplete JSON by finding the last complete object
-                    try:
-                        # Look for the last complete JSON object in the response
-                        last_brace = clean_excerpt.rfind('}')
-                        if last_brace != -1:
-                            truncated = clean_excerpt[:last_brace + 1]
-                            data = json.loads(truncated)
-                            logger.info(f"Successfully parsed truncated JSON for topic '{topic}'")
-                        else:
-                            raise
-                    except Exception:
-                        # Try additional JSON repair techniques
-                        try:
-                            # Attempt to fix common JSON issues
-                            repaired = clean_excerpt
-                                                        
-                            import re
-                                                        
-                            # Additional cleanup - remove any remaining markdown artifacts
-                            if repaired.startswith('```'):
-                                # Remove opening ``` if still present
-                                repaired = repaired[3:].strip()
-                            if repaired.endswith('```'):
-                                # Remove closing ``` if still present
-                                repaired = repaired[:-3].strip()
-                                                        
-                            repaired = re.sub(r'(?<!\\)\\(?!\\)', '\\\\', repaired)
-                            
-                            repaired = re.sub(r'}\s*{', '},{', repaired)
-
-                            repaired = re.sub(r'}\s*("[^"]+"\s*:)', r'},\1', repaired)
-                                                        
-                            quote_matches = [m.start() for m in re.finditer('"', repaired)]
-                            if len(quote_matches) % 2 != 0:
-
-                                repaired = repaired + '"'
-                                                        
-                            # Try to parse the repaired JSON
-                            data = json.loads(repaired)
-                            logger.info(f"Successfully parsed repaired JSON for topic '{topic}'")
-                        except Exception as repair_error:
-                            # Last resort - try to parse whatever JSON we can get
-                            try:
-                                # Try to find and parse any valid JSON object in the response
-                                import re
-                                json_match = re.search(r'\{[^{]*(?:\{[^{]*\}[^{]*)*\}', repaired)
-                                if json_match:
-                                    potential_json = json_match.group(0)
-                                    data = json.loads(potential_json)
-                                    logger.info(f"Successfully parsed extracted JSON for topic '{topic}'")
-                                else:
-                                    raise
-                            except Exception:
-                                logger.warning(f"Failed to parse JSON with both orjson and json for topic '{topic}'. "
-                                              f"orjson error: {orjson_error}, json error: {json_error}, repair error: {repair_error}. "
-                                              f"Raw excerpt length: {len(clean_excerpt)}")
-                                raise
-            
-            # Normalize and validate response
-            # Handle introduction - could be string or dict with title/text
-            intro_data = data.get("introduction", "")
-            if isinstance(intro_data, dict):
-                # If it's a dict, try to get text or title
-                intro_norm = (intro_data.get("text", "") or intro_data.get("title", "") or "").strip()
-            else:
-                intro_norm = str(intro_data).strip()
-            
-            # Handle diagram - could be in different fields
-            diagram_norm = (data.get("diagram_description", "") or data.get("diagram", "")).strip()
-            
-            # Process classifications
-            classifications = []
-            for c in data.get("classifications", []):
-                if isinstance(c, dict) and "type" in c and "description" in c:
-                    classifications.append(ClassificationItem(type=c["type"], description=c["description"]))
-            
-            # Process sections
-            sections = []
-            for s in data.get("sections", []):
-                if isinstance(s, dict) and "title" in s and "content" in s:
-                    sections.append(SectionItem(title=s["title"], content=s["content"]))
-            
-            # Process quiz - handle both 'quiz' and 'quiz_questions' field names
-            quiz_data = data.get("quiz", data.get("quiz_questions", []))
-            quiz = []
-            for q in quiz_data:
-                if (isinstance(q, dict) and 
-                    "question" in q and 
-                    "options" in q and 
-                    "answer" in q and  # Changed from "correct_answer" to "answer"
-                    len(q["options"]) >= 2):
-                    # Handle options that might be objects with an "option" key
-                    options = []
-                    for opt in q["options"]:
-                        if isinstance(opt, dict) and "option" in opt:
-                            options.append(str(opt["option"]))
-                        else:
-                            options.append(str(opt))
-                    quiz.append(QuizItem(q=q["question"], options=options, answer=q["answer"]))
-                elif (isinstance(q, dict) and 
-                      "question" in q and 
-                      "options" in q and 
-                      "correct_answer" in q and  # Keep backward compatibility
-                      len(q["options"]) >= 2):
-                    # Handle options that might be objects with an "option" key
-                    options = []
-                    for opt in q["options"]:
-                        if isinstance(opt, dict) and "option" in opt:
-                            options.append(str(opt["option"]))
-                        else:
-                            options.append(str(opt))
-                    quiz.append(QuizItem(q=q["question"], options=options, answer=q["correct_answer"]))
-                elif (isinstance(q, dict) and 
-                      "q" in q and 
-                      "options" in q and 
-                      "answer" in q and  # Handle 'q' field directly
-                      len(q["options"]) >= 2):
-                    # Handle options that might be objects with an "option" key
-                    options = []
-                    for opt in q["options"]:
-                        if isinstance(opt, dict) and "option" in opt:
-                            options.append(str(opt["option"]))
-                        else:
-                            options.append(str(opt))
-                    quiz.append(QuizItem(q=q["q"], options=options, answer=q["answer"]))
-            
-            # Quiz items are already created with 'q' field, no need for additional conversion
-
-            resp = StructuredLessonResponse(
-                id=str(uuid.uuid4()),
-                introduction=intro_norm,
-                classifications=classifications,
-                sections=sections,
-                diagram=diagram_norm,
-                quiz=quiz,
-            )
-            # Accept LLM response if it has at least one section with content
-            # This is more lenient to avoid falling back to stubs unnecessarily
-            has_minimal_content = (
-                resp.sections and len(resp.sections) >= 1 and  # At least 1 section
-                any(len(s.content) > 10 for s in resp.sections)  # At least one section with meaningful content
-            )
-            
-            # Log detailed quality metrics for debugging
-            logger.info(f"LLM response quality check for '{topic}': "
-                       f"Has sections: {bool(resp.sections)}, "
-                       f"Has quiz: {bool(resp.quiz)}, "
-                       f"Section count: {len(resp.sections) if resp.sections else 0}, "
-                       f"Quiz count: {len(resp.quiz) if resp.quiz else 0}")
-            
-            if resp.sections:
-                section_details = [(s.title, len(s.content)) for s in resp.sections]
-                logger.info(f"Section details: {section_details}")
-            
-            if resp.quiz:
-                logger.info(f"Quiz questions: {len(resp.quiz)}")
-            
-            if has_minimal_content:
-                try:
-                    await _STRUCTURED_LESSON_CACHE.set(cache_key, resp.model_dump(), namespace="lessons")
-                    logger.info(f"LLM response for '{topic}' accepted and cached")
-                except Exception as cache_error:
-                    logger.warning(f"Failed to cache LLM response for '{topic}': {cache_error}")
-                return resp, "llm"
-            
-            # Log when we're falling back to stub due to incomplete or low-quality LLM response
-            logger.warning(f"LLM response for '{topic}' was low-quality - falling back to stub. "
-                          f"Sections: {len(resp.sections) if resp.sections else 0}, "
-                          f"Quiz: {len(resp.quiz) if resp.quiz else 0}, "
-                          f"Section quality: {[len(s.content) for s in resp.sections] if resp.sections else []}")
-            return await _stub_lesson(topic, age), "stub"
+            data = _parse_lesson_json(raw_excerpt, topic)
+            return await _accept_lesson(cache_key, topic, age, _normalize_lesson(data))
         except Exception as e:
             # Include raw excerpt to aid troubleshooting and reduce persistent stub fallbacks
             try:
@@ -555,38 +600,341 @@ async def _compute_structured_lesson(cache_key: str, topic: str, age: Optional[i
         return await _stub_lesson(topic, age), "stub"
 
 
+def _encode_lesson_result(result: tuple[StructuredLessonResponse, str]) -> dict:
+    lesson, src = result
+    return {"lesson": lesson.model_dump(), "source": src}
+
+
+def _decode_lesson_result(payload: dict) -> tuple[StructuredLessonResponse, str]:
+    # The leader's dump is already sanitized
+    return _lesson_from_dump(payload["lesson"]), payload["source"]
+
+
+async def _load_persisted_lesson(cache_key: str) -> Optional[tuple[StructuredLessonResponse, str]]:
+    """Serve a lesson from the persistent store and put it back in the cache."""
+    record = await _LESSON_STORE.get(cache_key)
+    if record is None:
+        return None
+    try:
+        # LessonService persists raw LLM text; only records flagged sanitized skip the validators
+        if record.get("sanitized"):
+            lesson = _lesson_from_dump(record["lesson"])
+        else:
+            lesson = StructuredLessonResponse(**record["lesson"])
+    except Exception as e:
+        logger.warning(f"Discarding unreadable persisted lesson {cache_key}: {e}")
+        return None
+    try:
+        await _LESSON_CACHE.set(
+            cache_key,
+            lesson.model_dump(),
+            written_at=record["written_at"],
+            topic=record["topic"],
+            age=record["age"],
+            validated=True,
+        )
+    except Exception:
+        pass
+    return lesson, "store"
+
+
 async def _get_or_compute_lesson(cache_key: str, topic: str, age: Optional[int]) -> tuple[StructuredLessonResponse, str]:
-    fut = _INFLIGHT_LESSONS.get(cache_key)
-    if fut and not fut.done():
-        return await fut
-    loop = asyncio.get_event_loop()
-    fut = loop.create_future()
-    _INFLIGHT_LESSONS[cache_key] = fut
-    async def _run():
+    async def _compute():
         try:
-            result = await _compute_structured_lesson(cache_key, topic, age)
-            fut.set_result(result)
+            persisted = await _load_persisted_lesson(cache_key)
+            if persisted is not None:
+                return persisted
+            return await _compute_structured_lesson(cache_key, topic, age)
         except Exception as e:
             logger.error(f"Structured lesson compute failed: {e}")
-            fut.set_result((await _stub_lesson(topic, age), "stub"))
+            return await _stub_lesson(topic, age), "stub"
+    return await _LESSON_FLIGHT.do(cache_key, _compute, _encode_lesson_result, _decode_lesson_result)
+
+
+async def _refresh_lesson(cache_key: str, topic: str, age: Optional[int]) -> tuple[StructuredLessonResponse, str]:
+    """Regenerate a lesson from the LLM, bypassing cached and persisted copies.
+
+    Failures fall back to a stub that is not cached, so a stale entry keeps
+    being served until it reaches its hard TTL.
+    """
+    async def _compute():
+        try:
+            return await _compute_structured_lesson(cache_key, topic, age)
+        except Exception as e:
+            logger.error(f"Structured lesson refresh failed: {e}")
+            return await _stub_lesson(topic, age), "stub"
+    return await _LESSON_FLIGHT.do(cache_key, _compute, _encode_lesson_result, _decode_lesson_result)
+
+
+async def _cached_lesson(cache_key: str, topic: str, age: Optional[int]) -> Optional[tuple[CachedLesson, str]]:
+    """Look up a cached lesson, refreshing it in the background when stale.
+
+    Exact-key misses fall back to the lesson of a near-duplicate topic.
+    """
+    hit = await _LESSON_CACHE.get_entry(cache_key)
+    source = "cache"
+    if hit is None:
+        similar = await _LESSON_CACHE.get_similar_entry(topic, age)
+        if similar is None:
+            return None
+        hit, topic = similar
+        source = "semantic"
+    if hit.stale:
+        key = hit.key
+        _LESSON_CACHE.refresh(key, lambda: _refresh_lesson(key, topic, age))
+        return hit, "stale"
+    return hit, source
+
+
+async def _validated_lesson_body(hit: CachedLesson) -> bytes:
+    """JSON of a cached lesson in response-model form.
+
+    Every writer records whether its lesson is already sanitized: dumps of the
+    response model are flagged and served as stored, since validating them again
+    would escape their text twice. Raw LLM lessons (LessonService, and store
+    records it wrote) go through the model once and are written back flagged.
+    """
+    if hit.validated:
+        return hit.body
+    body = orjson.dumps(StructuredLessonResponse(**hit.lesson).model_dump())
+    try:
+        await _LESSON_CACHE.mark_validated(hit, body)
+    except Exception as e:
+        logger.debug(f"Could not mark cached lesson {hit.key} validated: {e}")
+    return body
+
+
+def _sse(payload: dict) -> str:
+    """Format one server-sent event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _lesson_events(lesson: StructuredLessonResponse) -> list[dict]:
+    """Split a complete lesson into the incremental events used by the stream endpoint."""
+    events: list[dict] = []
+    if lesson.introduction:
+        events.append({"type": "introduction", "content": lesson.introduction})
+    for i, section in enumerate(lesson.sections):
+        events.append({"type": "section", "index": i, "section": section.model_dump()})
+    for i, item in enumerate(lesson.quiz):
+        events.append({"type": "quiz", "index": i, "item": item.model_dump()})
+    return events
+
+
+class _LessonBroadcast:
+    """Fan-out of one in-flight lesson stream to every SSE subscriber.
+
+    Events are kept in order so late subscribers replay what they missed before
+    following the live stream.
+    """
+
+    def __init__(self) -> None:
+        self.events: list[dict] = []
+        self.done = False
+        self._changed = asyncio.Event()
+        self._counts = {"section": 0, "quiz": 0}
+
+    def _publish(self, event: dict) -> None:
+        self.events.append(event)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish_partial(self, kind: str, value: object) -> None:
+        """Publish one object parsed from the token stream, sanitized like the final lesson."""
+        try:
+            if kind == "introduction":
+                text = str(value).strip()
+                if text:
+                    self._publish({"type": "introduction", "content": text})
+            elif kind == "section":
+                if isinstance(value, dict) and "title" in value and "content" in value:
+                    section = SectionItem(title=value["title"], content=value["content"])
+                    self._publish({"type": "section", "index": self._counts["section"], "section": section.model_dump()})
+                    self._counts["section"] += 1
+            elif kind == "quiz":
+                item = _quiz_item_from_raw(value)
+                if item is not None:
+                    self._publish({"type": "quiz", "index": self._counts["quiz"], "item": item.model_dump()})
+                    self._counts["quiz"] += 1
+        except Exception as e:
+            logger.debug(f"Dropping malformed streamed lesson {kind}: {e}")
+
+    def finish(self, lesson: StructuredLessonResponse, source: str) -> None:
+        """Publish the final lesson, replaying it as events unless exactly it was streamed.
+
+        When partial objects were streamed but the final lesson differs (a stub
+        fallback after a broken stream, or normalization changed it), a `reset`
+        event tells clients to drop what they have before the replay.
+        """
+        events = _lesson_events(lesson)
+        if self.events != events:
+            if self.events:
+                self._publish({"type": "reset", "source": source})
+            for event in events:
+                self._publish(event)
+        self._publish({"type": "done", "source": source, "lesson": lesson.model_dump()})
+        self.done = True
+
+    async def subscribe(self):
+        i = 0
+        while True:
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+_LESSON_STREAMS: dict[str, _LessonBroadcast] = {}
+
+
+async def _stream_structured_lesson(cache_key: str, topic: str, age: Optional[int], broadcast: _LessonBroadcast) -> tuple[StructuredLessonResponse, str]:
+    """Generate a lesson with a streaming LLM call, publishing objects as they complete."""
+    if _GROQ_CLIENT is None:
+        logger.info(f"Falling back to stub lesson for '{topic}' - no Groq client available")
+        return await _stub_lesson(topic, age), "stub"
+    parser = IncrementalLessonParser()
+    try:
+        async for delta in stream_chat_completion(
+            _GROQ_CLIENT,
+            model="llama-3.1-8b-instant",
+            messages=_build_lesson_messages(topic, age),
+            temperature=0.4,
+            max_tokens=1200,
+            top_p=0.9,
+        ):
+            for kind, value in parser.feed(delta):
+                broadcast.publish_partial(kind, value)
+        raw_excerpt = parser.text.strip()
+        logger.info(f"Raw streamed LLM response for topic '{topic}': {raw_excerpt[:200]}...")
+        data = _parse_lesson_json(raw_excerpt, topic)
+        return await _accept_lesson(cache_key, topic, age, _normalize_lesson(data))
+    except Exception as e:
+        logger.warning(f"Structured lesson stream error for topic '{topic}': {e}. raw_excerpt={parser.text[:300]}")
+        return await _stub_lesson(topic, age), "stub"
+
+
+def _subscribe_lesson_stream(cache_key: str, topic: str, age: Optional[int]) -> _LessonBroadcast:
+    """Join the in-flight stream for a lesson, starting one if needed.
+
+    Generation goes through `_LESSON_FLIGHT` like the non-streaming path. When
+    another request or worker is already computing the lesson, its result is
+    replayed as events instead of streaming a second completion.
+    """
+    broadcast = _LESSON_STREAMS.get(cache_key)
+    if broadcast is not None:
+        return broadcast
+    broadcast = _LessonBroadcast()
+    _LESSON_STREAMS[cache_key] = broadcast
+
+    async def _generate():
+        try:
+            persisted = await _load_persisted_lesson(cache_key)
+            if persisted is not None:
+                return persisted
+            return await _stream_structured_lesson(cache_key, topic, age, broadcast)
+        except Exception as e:
+            logger.error(f"Structured lesson stream failed: {e}")
+            return await _stub_lesson(topic, age), "stub"
+
+    async def _run():
+        try:
+            lesson, src = await _LESSON_FLIGHT.do(cache_key, _generate, _encode_lesson_result, _decode_lesson_result)
+        except Exception as e:
+            logger.error(f"Structured lesson stream failed: {e}")
+            lesson, src = await _stub_lesson(topic, age), "stub"
         finally:
-            _INFLIGHT_LESSONS.pop(cache_key, None)
-    asyncio.create_task(_run())
-    return await fut
+            _LESSON_STREAMS.pop(cache_key, None)
+        broadcast.finish(lesson, src)
+    _spawn(_run())
+    return broadcast
+
+
+async def _migrate_lesson_keys() -> int:
+    """One-time move of persisted and cached lessons from exact-age keys to age-band keys.
+
+    Cached entries can only be re-keyed when the store still has their topic and
+    age; any others simply expire on their TTL.
+    """
+    await _LESSON_STORE.open()
+    marker = _LESSON_STORE.marker_path("age-band-keys")
+    if not _LESSON_STORE.enabled or os.path.exists(marker):
+        return 0
+    # Every worker gets here at startup; the first one through migrates
+    async with _LESSON_STORE.exclusive("age-band-keys"):
+        if os.path.exists(marker):
+            # Migrated by another worker while we waited; pick up its re-keyed records
+            await _LESSON_STORE.reload()
+            return 0
+        moved = await _LESSON_STORE.rekey(lesson_cache_key)
+        migrated = 0
+        for old_key, new_key in moved.items():
+            hit = await _LESSON_CACHE.get_entry(old_key)
+            if hit is None:
+                continue
+            await _STRUCTURED_LESSON_CACHE.delete(old_key, namespace="lessons")
+            if await _STRUCTURED_LESSON_CACHE.exists(new_key, namespace="lessons"):
+                continue
+            record = await _LESSON_STORE.get(new_key)
+            if record is not None and await _LESSON_CACHE.set(
+                new_key,
+                hit.body,
+                written_at=record["written_at"],
+                topic=record["topic"],
+                age=record["age"],
+                validated=hit.validated,
+            ):
+                migrated += 1
+        with open(marker, "w") as f:
+            f.write(f"{time.time()}\n")
+    if moved:
+        logger.info("Re-keyed %d persisted lessons to age bands (%d cache entries moved)", len(moved), migrated)
+    return migrated
 
 
 @app.on_event("startup")
 async def warm_up_structured_lessons():
     """Warm the structured lesson pipeline to reduce first-request latency.
 
-    If a Groq client is configured, this primes the model and cache by generating
-    one small sample lesson. Otherwise, it seeds the in-memory cache with a stub.
+    Lessons persisted by previous runs are loaded back into the cache first,
+    most recent first, so a restart does not send every hot topic to Groq. If a
+    Groq client is configured, this then primes the model by generating one small
+    sample lesson. Otherwise, it seeds the in-memory cache with a stub.
     """
+    try:
+        started = time.perf_counter()
+        restored = 0
+        await _migrate_lesson_keys()
+        for record in await _LESSON_STORE.load_recent():
+            if await _STRUCTURED_LESSON_CACHE.exists(record["key"], namespace="lessons"):
+                # Already cached by another worker; still make it findable by similar topics
+                get_semantic_topic_index(_STRUCTURED_LESSON_CACHE).add(record["key"], record["topic"], record["age"])
+                continue
+            # Backdated so lessons older than the soft TTL come back stale and refresh on first use
+            if await _LESSON_CACHE.set(
+                record["key"],
+                record["lesson"],
+                written_at=record["written_at"],
+                topic=record["topic"],
+                age=record["age"],
+                validated=bool(record.get("sanitized")),
+            ):
+                restored += 1
+        logger.info(
+            "Restored %d persisted lessons in %.2fs",
+            restored,
+            time.perf_counter() - started,
+        )
+        if _LESSON_STORE.needs_compaction():
+            _spawn(_LESSON_STORE.compact())
+    except Exception as e:
+        logger.warning(f"Persisted lesson warm-up error: {e}")
     try:
         sample_topics = ["warm-up sample"]
         sample_age = 10
         for t in sample_topics:
-            cache_key = hashlib.md5(f"{t}|{sample_age}".encode()).hexdigest()[:16]
+            cache_key = lesson_cache_key(t, sample_age)
             await _get_or_compute_lesson(cache_key, t, sample_age)
         logger.info(
             "Structured lessons warm-up complete: topics=%d, llm=%s",
@@ -597,18 +945,78 @@ async def warm_up_structured_lessons():
         logger.warning(f"Structured lessons warm-up error: {e}")
 
 
+async def _prefetch_popular_topics(limit: int, since: Optional[datetime]) -> list[dict]:
+    from app.api.routes.lessons import get_lesson_service
+    return await get_lesson_service(get_postgrest_client()).get_popular_topics_by_age(limit, since)
+
+
+async def _prefetch_is_cached(topic: str, age: Optional[int]) -> bool:
+    cache_key = lesson_cache_key(topic, age)
+    return await _LESSON_CACHE.is_fresh(cache_key)
+
+
+async def _prefetch_lesson(topic: str, age: Optional[int]) -> tuple[dict, str]:
+    """Make sure a fresh lesson is cached; stale or restored copies are regenerated."""
+    cache_key = lesson_cache_key(topic, age)
+    hit = await _LESSON_CACHE.get(cache_key)
+    if hit is not None and not hit[1]:
+        return hit[0], "cache"
+    if hit is None:
+        lesson, src = await _get_or_compute_lesson(cache_key, topic, age)
+        if src != "store" or await _LESSON_CACHE.is_fresh(cache_key):
+            return lesson.model_dump(), src
+    lesson, src = await _refresh_lesson(cache_key, topic, age)
+    return lesson.model_dump(), src
+
+
+async def _prefetch_tts_summary(lesson: dict) -> None:
+    from app.api.routes.tts import _lesson_speech
+    from app.schemas import StructuredLessonTTSRequest
+    # Same text, voice default and cache key as a /api/tts/lesson summary request
+    blocks, voice = _lesson_speech(StructuredLessonTTSRequest(lesson=lesson, mode="summary"))
+    text = "\n\n".join(blocks)
+    if text.strip():
+        await get_tts_service().generate_speech(text, voice)
+
+
+_PREFETCH_SCHEDULER = PrefetchScheduler(
+    popular_topics=_prefetch_popular_topics,
+    generate_lesson=_prefetch_lesson,
+    is_cached=_prefetch_is_cached,
+    synthesize_summary=_prefetch_tts_summary if PREFETCH_TTS else None,
+)
+
+
+@app.on_event("startup")
+async def start_prefetch_scheduler():
+    """Pre-generate popular lessons in off-peak windows (see PREFETCH_* settings)."""
+    if PREFETCH_ENABLED:
+        _PREFETCH_SCHEDULER.start()
+
+
+@app.get("/api/prefetch/status")
+async def prefetch_status():
+    """Queue and progress of popularity-driven lesson pre-generation."""
+    return _PREFETCH_SCHEDULER.status()
+
+
 @app.post("/api/structured-lesson", response_model=StructuredLessonResponse, tags=["Lessons"]) 
 async def create_structured_lesson(req: StructuredLessonRequest, response: Response):
     """Create a structured lesson from a topic and optional age constraints."""
     topic = req.topic
     age = req.age
     # Build cache key and try cache first
-    cache_key = hashlib.md5(f"{topic}|{age}".encode()).hexdigest()[:16]
+    cache_key = lesson_cache_key(topic, age)
     try:
-        cached = await _STRUCTURED_LESSON_CACHE.get(cache_key, namespace="lessons")
+        cached = await _cached_lesson(cache_key, topic, age)
         if cached:
-            response.headers["X-Content-Source"] = "cache"
-            return StructuredLessonResponse(**cached)
+            hit, src = cached
+            # Hits are already serialized; skip the model and response_model re-encoding
+            return Response(
+                content=await _validated_lesson_body(hit),
+                media_type="application/json",
+                headers={"X-Content-Source": src},
+            )
     except Exception:
         pass
 
@@ -627,35 +1035,45 @@ async def health():
     """Liveness probe for Render and tests."""
     return {"status": "ok"}
 
+def _wants_prometheus(request: Request, format: Optional[str]) -> bool:
+    if format:
+        return format == "prometheus"
+    accept = request.headers.get("accept", "")
+    return ("text/plain" in accept or "openmetrics" in accept) and "application/json" not in accept
+
+
 # Simple metrics endpoint for monitoring
 @app.get("/api/metrics")
-async def metrics():
-    """Return basic per-path timing metrics collected in-process."""
-    return {"paths": get_metrics_snapshot()}
+async def metrics(request: Request, format: Optional[str] = None):
+    """Return in-process metrics: per-route latency histograms plus service stats.
+
+    Prometheus scrapers (Accept: text/plain) or ``?format=prometheus`` get the
+    latency histograms in the text exposition format.
+    """
+    if _wants_prometheus(request, format):
+        return Response(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+    return {
+        "routes": get_metrics_snapshot(),
+        "llm": get_llm_stats(),
+        "single_flight": get_single_flight_stats(),
+        "tts": get_tts_stats(),
+        "sympy": get_sympy_pool_stats(),
+        "lesson_store": _LESSON_STORE.stats(),
+        "lesson_cache": _LESSON_CACHE.stats(),
+        "semantic_topics": get_semantic_topic_index(_STRUCTURED_LESSON_CACHE).stats(),
+        "supabase_pool": get_supabase_pool_stats(),
+    }
 
 @app.post("/api/cache/reset")
 async def reset_cache(namespaces: Optional[list[str]] = None):
-    """Reset in-memory caches to eliminate stale or hardcoded responses.
+    """Reset the shared cache to eliminate stale or hardcoded responses.
 
     - If `namespaces` provided, clears only those; otherwise clears all.
-    - Targets the structured lesson cache; extendable for other caches if needed.
+    - Clears Redis entries fleet-wide and this worker's near-cache.
     """
     try:
-        if namespaces:
-            for ns in namespaces:
-                try:
-                    _STRUCTURED_LESSON_CACHE._caches.pop(ns, None)
-                except Exception:
-                    pass
-        else:
-            try:
-                _STRUCTURED_LESSON_CACHE._caches.clear()
-            except Exception:
-                pass
-        try:
-            _STRUCTURED_LESSON_CACHE._stats["last_reset"] = time.time()
-        except Exception:
-            pass
+        for ns in namespaces or [None]:
+            await _STRUCTURED_LESSON_CACHE.clear(ns)
         return {"ok": True, "namespaces": namespaces or "all"}
     except Exception as e:
         logger.warning(f"Cache reset error: {e}")
@@ -698,32 +1116,45 @@ class InMemoryChatRepository(IChatRepository):
 
 @app.post("/api/structured-lesson/stream", tags=["Lessons"])
 async def stream_structured_lesson(req: StructuredLessonRequest):
-    """Stream a structured lesson as a single SSE 'done' event for fast UI consumption."""
+    """Stream a structured lesson as incremental SSE events.
+
+    Emits `introduction`, `section` and `quiz` events as soon as each object is
+    complete in the LLM token stream, then a final `done` event carrying the
+    validated lesson. If the final lesson is not the one streamed (for example a
+    stub after the stream failed), a `reset` event precedes its replay.
+    Concurrent requests for the same topic share one upstream stream.
+    """
     try:
         topic = req.topic
         age = req.age
-        cache_key = hashlib.md5(f"{topic}|{age}".encode()).hexdigest()[:16]
-        source = "stub"
+        cache_key = lesson_cache_key(topic, age)
         # Try cache first
+        cached = None
         try:
-            cached = await _STRUCTURED_LESSON_CACHE.get(cache_key, namespace="lessons")
-            if cached:
-                lesson = StructuredLessonResponse(**cached)
-                source = "cache"
-            else:
-                raise Exception("no-cache")
+            cached = await _cached_lesson(cache_key, topic, age)
         except Exception:
-            # Compute lesson using single-flight; fallback handled inside helper
-            lesson, source = await _get_or_compute_lesson(cache_key, topic, age)
-        async def event_generator():
-            # Use model_dump for Pydantic v2 compatibility
-            try:
-                payload_lesson = lesson.model_dump()
-            except Exception:
-                payload_lesson = lesson.dict()
-            payload = {"type": "done", "source": source, "lesson": payload_lesson}
-            yield f"data: {json.dumps(payload)}\n\n"
-        stream_resp = StreamingResponse(event_generator(), media_type="text/event-stream")
+            cached = None
+        if cached:
+            hit = cached[0]
+            # Flagged entries are sanitized dumps; only raw ones go through the validators
+            lesson = _lesson_from_dump(hit.lesson) if hit.validated else StructuredLessonResponse(**hit.lesson)
+            source = cached[1]
+            async def event_generator():
+                for event in _lesson_events(lesson):
+                    yield _sse(event)
+                yield _sse({"type": "done", "source": source, "lesson": lesson.model_dump()})
+        else:
+            # Join or start the single-flight stream; fallback handled inside helper
+            broadcast = _subscribe_lesson_stream(cache_key, topic, age)
+            source = "stream"
+            async def event_generator():
+                async for event in broadcast.subscribe():
+                    yield _sse(event)
+        stream_resp = StreamingResponse(
+            event_generator(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
         try:
             stream_resp.headers["X-Content-Source"] = source
         except Exception:
@@ -732,5 +1163,5 @@ async def stream_structured_lesson(req: StructuredLessonRequest):
     except Exception as e:
         err = {"type": "error", "message": str(e)}
         async def error_stream():
-            yield f"data: {json.dumps(err)}\n\n"
-        return StreamingResponse(error_stream(), media_type="text/event-stream")
\ No newline at end of file
+            yield _sse(err)
+        return StreamingResponse(error_stream(), media_type="text/event-stream")
@@ -0,0 +1,66 @@
+"""
+Tests for the in-process GCRA rate limiter.
+"""
+import pytest
+
+from app.services.gcra_limiter import GCRALimiter
+
+
+def test_burst_of_limit_then_one_request_per_interval():
+    limiter = GCRALimiter()
+    # 6 requests per 60 seconds: a burst of 6, then one every 10 seconds
+    results = [limiter.check("client", 6, 60, now=0.0) for _ in range(7)]
+    assert results == [(True, 1), (True, 2), (True, 3), (True, 4), (True, 5), (True, 6), (False, 7)]
+
+    assert limiter.wait_time("client", 6, 60, now=0.0) == pytest.approx(10.0)
+    assert limiter.check("client", 6, 60, now=9.9)[0] is False
+    assert limiter.check("client", 6, 60, now=10.0) == (True, 6)
+    assert limiter.check("client", 6, 60, now=10.0)[0] is False
+
+
+def test_rejected_requests_consume_nothing():
+    limiter = GCRALimiter()
+    for _ in range(3):
+        limiter.check("client", 3, 30, now=0.0)
+    for _ in range(50):
+        assert not limiter.check("client", 3, 30, now=5.0)[0]
+    # Capacity comes back on schedule despite the rejected retries
+    assert limiter.check("client", 3, 30, now=10.0)[0]
+    assert limiter.stats()["rejected"] == 50
+
+
+def test_idle_clients_regain_the_full_burst():
+    limiter = GCRALimiter()
+    for _ in range(4):
+        limiter.check("client", 4, 60, now=0.0)
+    assert limiter.check("client", 4, 60, now=60.0) == (True, 1)
+
+
+def test_windows_are_checked_in_order():
+    limiter = GCRALimiter()
+    windows = [("minute", 60, 2), ("hour", 3600, 3)]
+    assert limiter.check_windows("client", windows, now=0.0) == (0, 1)
+    assert limiter.check_windows("client", windows, now=0.0) == (0, 2)
+    assert limiter.check_windows("client", windows, now=0.0) == (1, 3)
+    assert limiter.check_windows("client", windows, now=60.0) == (0, 1)
+    # The hour window only counted the three allowed requests
+    assert limiter.check_windows("client", windows, now=120.0) == (2, 1)
+
+
+def test_least_recently_seen_key_is_evicted():
+    limiter = GCRALimiter(max_keys=2)
+    limiter.check("a", 1, 60, now=0.0)
+    limiter.check("b", 1, 60, now=0.0)
+    assert not limiter.check("a", 1, 60, now=1.0)[0]
+    limiter.check("c", 1, 60, now=1.0)
+
+    assert len(limiter) == 2
+    assert limiter.stats()["evictions"] == 1
+    # "b" was evicted and starts over; "a" was touched more recently and is still limited
+    assert limiter.check("b", 1, 60, now=2.0)[0]
+    assert limiter.stats()["evictions"] == 2
+    assert not limiter.check("c", 1, 60, now=2.0)[0]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
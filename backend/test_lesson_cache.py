@@ -0,0 +1,87 @@
+"""
+Tests for the stale-while-revalidate lesson cache.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.services.lesson_cache import LessonCache
+
+LESSON = {"introduction": "Plants make food from light.", "sections": [], "quiz": []}
+
+
+def make_cache() -> LessonCache:
+    return LessonCache(MemoryCacheRepository(), soft_ttl=60, hard_ttl=600)
+
+
+async def test_entries_turn_stale_after_the_soft_ttl():
+    cache = make_cache()
+    await cache.set("fresh", LESSON)
+    await cache.set("stale", LESSON, written_at=time.time() - 120)
+
+    assert await cache.get("fresh") == (LESSON, False)
+    assert await cache.get("stale") == (LESSON, True)
+    assert await cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["fresh_hits"], stats["stale_hits"], stats["misses"]) == (1, 1, 1)
+
+
+async def test_entries_past_the_hard_ttl_are_not_written():
+    cache = make_cache()
+    assert not await cache.set("expired", LESSON, written_at=time.time() - 601)
+    assert await cache.get("expired") is None
+
+
+async def test_validated_flag_round_trips_and_keeps_lifetime():
+    cache = make_cache()
+    await cache.set("key", LESSON, written_at=time.time() - 120)
+    hit = await cache.get_entry("key")
+    assert not hit.validated
+
+    await cache.mark_validated(hit, b'{"introduction": "validated"}')
+    again = await cache.get_entry("key")
+    assert again.validated
+    assert again.stale
+    assert again.lesson == {"introduction": "validated"}
+
+
+async def test_refresh_runs_once_per_key():
+    cache = make_cache()
+    release = asyncio.Event()
+    calls = 0
+
+    async def regenerate():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        await cache.set("key", {"introduction": "refreshed"})
+
+    assert cache.refresh("key", regenerate)
+    assert not cache.refresh("key", regenerate)
+    assert cache.stats()["refreshing"] == 1
+    release.set()
+    await asyncio.sleep(0.01)
+
+    assert calls == 1
+    assert cache.stats()["refreshing"] == 0
+    assert await cache.get("key") == ({"introduction": "refreshed"}, False)
+
+
+async def test_failed_refresh_keeps_serving_the_stale_lesson():
+    cache = make_cache()
+    await cache.set("key", LESSON, written_at=time.time() - 120)
+
+    async def regenerate():
+        raise RuntimeError("Groq unavailable")
+
+    cache.refresh("key", regenerate)
+    await asyncio.sleep(0.01)
+
+    assert cache.stats()["refresh_failures"] == 1
+    assert await cache.get("key") == (LESSON, True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
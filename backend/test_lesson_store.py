@@ -0,0 +1,114 @@
+"""
+Tests for the persistent append-only lesson store.
+"""
+import hashlib
+import os
+import time
+
+import pytest
+
+from app.repositories import lesson_store
+from app.repositories.lesson_store import _HEADER, LessonStore
+
+
+def lesson_key(topic: str, age=None) -> str:
+    return hashlib.md5(f"{topic}|{age}".encode()).hexdigest()
+
+
+def lesson(title: str) -> dict:
+    return {"introduction": title, "sections": [{"title": title, "content": "..."}], "quiz": []}
+
+
+async def open_store(path, **kwargs) -> LessonStore:
+    store = LessonStore(directory=str(path), shards=kwargs.pop("shards", 2), **kwargs)
+    await store.open()
+    return store
+
+
+def segment_files(path):
+    return sorted(p for p in os.listdir(path) if p.endswith(".seg"))
+
+
+async def test_put_get_round_trip_survives_reopen(tmp_path):
+    store = await open_store(tmp_path)
+    key = lesson_key("photosynthesis", 10)
+    assert await store.put(key, "photosynthesis", 10, lesson("v1"), sanitized=True)
+    assert await store.put(key, "photosynthesis", 10, lesson("v2"))
+
+    reopened = await open_store(tmp_path)
+    record = await reopened.get(key)
+    assert record["lesson"] == lesson("v2")
+    assert record["topic"] == "photosynthesis"
+    assert record["sanitized"] is False
+    assert reopened.stats()["dead_records"] == 1
+    assert await reopened.get(lesson_key("missing")) is None
+
+
+async def test_torn_tail_is_truncated_on_reopen(tmp_path):
+    store = await open_store(tmp_path, shards=1)
+    key = lesson_key("gravity")
+    await store.put(key, "gravity", None, lesson("intact"))
+    segment = os.path.join(tmp_path, segment_files(tmp_path)[0])
+    size = os.path.getsize(segment)
+    with open(segment, "ab") as f:
+        f.write(_HEADER.pack(500, 0, time.time()) + b'{"key": "tor')
+
+    reopened = await open_store(tmp_path, shards=1)
+    assert os.path.getsize(segment) == size
+    assert reopened.stats()["corrupt_records"] == 1
+    assert (await reopened.get(key))["lesson"] == lesson("intact")
+
+
+async def test_crc_mismatch_is_not_served(tmp_path):
+    store = await open_store(tmp_path, shards=1)
+    key = lesson_key("volcanoes")
+    await store.put(key, "volcanoes", None, lesson("lava"))
+    segment = os.path.join(tmp_path, segment_files(tmp_path)[0])
+    with open(segment, "r+b") as f:
+        data = f.read()
+        f.seek(data.index(b"lava"))
+        f.write(b"LAVA")
+
+    assert await store.get(key) is None
+
+
+async def test_rekey_moves_records_and_newest_wins(tmp_path):
+    store = await open_store(tmp_path)
+    old_a, old_b = lesson_key("fractions", 9), lesson_key("fractions", 11)
+    await store.put(old_a, "fractions", 9, lesson("older"), sanitized=True)
+    await store.put(old_b, "fractions", 11, lesson("newer"), sanitized=True)
+
+    moved = await store.rekey(lambda topic, age: lesson_key(topic, "9-12"))
+    new_key = lesson_key("fractions", "9-12")
+    assert moved == {old_a: new_key, old_b: new_key}
+    assert await store.get(old_a) is None
+    record = await store.get(new_key)
+    assert record["lesson"] == lesson("newer")
+    assert record["sanitized"] is True
+
+
+async def test_compact_keeps_latest_unexpired_records(tmp_path, monkeypatch):
+    store = await open_store(tmp_path, shards=1, max_age=3600)
+    live, expired = lesson_key("cells"), lesson_key("atoms")
+    two_hours_ago = time.time() - 7200
+    monkeypatch.setattr(lesson_store.time, "time", lambda: two_hours_ago)
+    await store.put(expired, "atoms", None, lesson("old"))
+    monkeypatch.undo()
+    for version in ("v1", "v2", "v3"):
+        await store.put(live, "cells", None, lesson(version))
+    # A second worker with its own index of the same directory
+    other = await open_store(tmp_path, shards=1, max_age=3600)
+    before = os.path.getsize(os.path.join(tmp_path, segment_files(tmp_path)[0]))
+
+    assert await store.compact() == {"live": 1}
+    files = segment_files(tmp_path)
+    assert len(files) == 1
+    assert os.path.getsize(os.path.join(tmp_path, files[0])) < before
+    assert store.stats()["dead_records"] == 0
+    assert (await store.get(live))["lesson"] == lesson("v3")
+    # The other worker's offsets point into the deleted segment; its read rescans the shard
+    assert (await other.get(live))["lesson"] == lesson("v3")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
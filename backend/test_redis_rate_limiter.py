@@ -0,0 +1,82 @@
+"""
+Tests for the Redis Lua sliding-window rate limiter.
+"""
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from app.services import redis_rate_limiter
+from app.services.redis_rate_limiter import RedisRateLimiter
+
+WINDOWS = [("minute", 60, 3), ("hour", 3600, 5)]
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    unavailable = []
+
+    async def get_client():
+        return client
+
+    async def mark_unavailable(error):
+        unavailable.append(error)
+
+    monkeypatch.setattr(redis_rate_limiter, "get_async_redis", get_client)
+    monkeypatch.setattr(redis_rate_limiter, "mark_redis_unavailable", mark_unavailable)
+    client.unavailable = unavailable
+    return client
+
+
+async def test_windows_are_counted_in_order(redis_client):
+    limiter = RedisRateLimiter()
+    results = [await limiter.check("client-1", WINDOWS) for _ in range(4)]
+    assert results == [(0, 1), (0, 2), (0, 3), (1, 4)]
+    # Other identities have their own windows
+    assert await limiter.check("client-2", WINDOWS) == (0, 1)
+    assert limiter.stats()["rejected"] == 1
+
+
+async def test_later_windows_are_untouched_once_one_is_exceeded(redis_client):
+    limiter = RedisRateLimiter()
+    for _ in range(4):
+        await limiter.check("client-1", WINDOWS)
+    assert await redis_client.zcard("ratelimit:{client-1}:minute") == 4
+    assert await redis_client.zcard("ratelimit:{client-1}:hour") == 3
+
+
+async def test_script_is_reloaded_after_noscript(redis_client):
+    limiter = RedisRateLimiter()
+    assert await limiter.check("client-1", WINDOWS) == (0, 1)
+    await redis_client.script_flush()
+
+    assert await limiter.check("client-1", WINDOWS) == (0, 2)
+    stats = limiter.stats()
+    assert stats["script_loads"] == 2
+    assert stats["errors"] == 0
+    assert not redis_client.unavailable
+
+
+async def test_redis_failures_defer_to_the_local_limiter(redis_client, monkeypatch):
+    limiter = RedisRateLimiter()
+
+    async def broken(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis_client, "evalsha", broken)
+    assert await limiter.check("client-1", WINDOWS) is None
+    assert limiter.stats()["errors"] == 1
+    assert len(redis_client.unavailable) == 1
+
+
+async def test_missing_redis_returns_none(monkeypatch):
+    async def no_client():
+        return None
+
+    monkeypatch.setattr(redis_rate_limiter, "get_async_redis", no_client)
+    assert await RedisRateLimiter().check("client-1", WINDOWS) is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
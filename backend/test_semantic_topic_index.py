@@ -0,0 +1,89 @@
+"""
+Tests for the near-duplicate lesson topic index.
+"""
+import pytest
+
+from app.services.semantic_topic_index import SemanticTopicIndex
+
+
+def make_index(**kwargs) -> SemanticTopicIndex:
+    kwargs.setdefault("threshold", 0.75)
+    kwargs.setdefault("margin", 0.05)
+    index = SemanticTopicIndex(enabled=True, **kwargs)
+    for key, topic in [
+        ("photo", "photosynthesis"),
+        ("ww1", "World War I"),
+        ("ww2", "World War II"),
+        ("frac", "fractions"),
+        ("add-frac", "adding fractions"),
+        ("vit-a", "vitamin a"),
+    ]:
+        index.add(key, topic, 10)
+    return index
+
+
+@pytest.mark.parametrize(
+    "query, key",
+    [
+        ("Photosynthesis process", "photo"),
+        ("how does photosynthesis work", "photo"),
+        ("World War 2", "ww2"),
+        ("adding fraction", "add-frac"),
+        ("Vitamin A", "vit-a"),
+    ],
+)
+def test_rephrased_topics_reuse_the_lesson(query, key):
+    match = make_index().lookup(query, 10)
+    assert match is not None and match[0] == key
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["world war three", "subtracting fractions", "vitamin b", "volcanoes"],
+)
+def test_different_topics_do_not_match(query):
+    assert make_index().lookup(query, 10) is None
+
+
+def test_lookups_stay_within_the_age_band():
+    index = make_index()
+    assert index.lookup("photosynthesis", 10) is not None
+    assert index.lookup("photosynthesis", 17) is None
+
+
+def test_threshold_rejects_weaker_matches():
+    match = make_index().lookup("adding fraction", 10)
+    assert 0.75 <= match[2] < 0.95
+    assert make_index(threshold=0.95).lookup("adding fraction", 10) is None
+
+
+def test_margin_rejects_matches_close_to_another_topic():
+    # "fractions" is the match; "adding fractions" is a different topic scoring nearby
+    assert make_index(threshold=0.5).lookup("fraction", 10)[0] == "frac"
+    index = make_index(threshold=0.5, margin=0.3)
+    assert index.lookup("fraction", 10) is None
+    assert index.stats()["ambiguous"] == 1
+
+
+def test_discard_and_eviction():
+    index = make_index()
+    index.discard("photo", 10)
+    assert index.lookup("photosynthesis", 10) is None
+    assert index.stats()["stale_keys"] == 1
+
+    small = SemanticTopicIndex(max_entries=10, enabled=True)
+    for n in range(12):
+        small.add(f"k{n}", f"topic number {n} about {chr(97 + n) * 5}", 10)
+    assert small.stats()["tiers"]["child"] <= 10
+    assert small.lookup("topic number 0 about aaaaa", 10) is None
+    assert small.lookup("topic number 11 about lllll", 10)[0] == "k11"
+
+
+def test_disabled_index_never_matches():
+    index = SemanticTopicIndex(enabled=False)
+    assert not index.add("photo", "photosynthesis", 10)
+    assert index.lookup("photosynthesis", 10) is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
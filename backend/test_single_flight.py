@@ -0,0 +1,88 @@
+"""
+Tests for in-process single-flight coalescing of lesson generation.
+"""
+import asyncio
+
+import pytest
+
+from app.services.single_flight import LocalSingleFlight
+
+
+async def test_concurrent_callers_share_one_computation():
+    flight = LocalSingleFlight("test")
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"lesson": "photosynthesis"}
+
+    waiters = [asyncio.create_task(flight.do("topic", compute)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flight.in_flight("topic")
+    release.set()
+    results = await asyncio.gather(*waiters)
+
+    assert calls == 1
+    assert all(r == {"lesson": "photosynthesis"} for r in results)
+    assert not flight.in_flight("topic")
+    stats = flight.stats()
+    assert stats["leaders"] == 1
+    assert stats["coalesced_local"] == 4
+    assert stats["coalesced_ratio"] == 0.8
+
+
+async def test_different_keys_run_separately():
+    flight = LocalSingleFlight("test")
+
+    async def compute(value):
+        await asyncio.sleep(0)
+        return value
+
+    a, b = await asyncio.gather(flight.do("a", lambda: compute(1)), flight.do("b", lambda: compute(2)))
+    assert (a, b) == (1, 2)
+    assert flight.stats()["leaders"] == 2
+
+
+async def test_errors_reach_every_caller_and_clear_the_key():
+    flight = LocalSingleFlight("test")
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise RuntimeError("generation failed")
+
+    waiters = [asyncio.create_task(flight.do("topic", fail)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def succeed():
+        return "retried"
+
+    assert await flight.do("topic", succeed) == "retried"
+
+
+async def test_cancelled_caller_does_not_abort_the_others():
+    flight = LocalSingleFlight("test")
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("topic", compute))
+    second = asyncio.create_task(flight.do("topic", compute))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    release.set()
+    assert await second == "done"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
@@ -0,0 +1,63 @@
+"""
+Tests for SymPy canonicalization and the SymPy worker pool.
+"""
+import pytest
+
+pytest.importorskip("sympy")
+
+from app.services.sympy_pool import SympyPool, SympyTimeoutError, canonical_form
+
+
+def key(question: str) -> str:
+    result = canonical_form(question)
+    assert "error" not in result, result
+    return result["key"]
+
+
+@pytest.mark.parametrize(
+    "variant",
+    ["3+2*x = 7", "7 = 2y + 3", "2*t+3=7", "-7 = -2x - 3", "2 x + 3 = 7"],
+)
+def test_equivalent_equations_share_a_key(variant):
+    assert key(variant) == key("2x+3=7")
+
+
+def test_expressions_and_equations_do_not_collide():
+    assert key("2x + 3") != key("2x + 3 = 0")
+
+
+def test_symbol_renaming_is_order_independent():
+    first = canonical_form("x^2 + 3y = 1")
+    second = canonical_form("b^2 + 3a = 1")
+    assert first["key"] == second["key"]
+    # Symbols in the same canonical slot play the same role
+    assert dict(zip(first["symbols"], second["symbols"])) == {"x": "b", "y": "a"}
+
+
+def test_different_problems_keep_different_keys():
+    assert key("2x + 3 = 7") != key("2x + 3 = 8")
+    assert key("x^2 = 4") != key("x^3 = 4")
+
+
+def test_unparseable_input_reports_an_error():
+    assert "error" in canonical_form("2x + = ) 7")
+
+
+async def test_pool_solves_and_reports_timeouts():
+    pool = SympyPool(workers=1, timeout=60)
+    try:
+        # The first job waits for a fresh worker to import SymPy, far longer than 1 ms
+        with pytest.raises(SympyTimeoutError):
+            await pool.run("x + 1 = 2", timeout=0.001)
+        result = await pool.run("2x + 3 = 7")
+        assert result["solution"] == "2"
+        canonical = await pool.canonicalize("7 = 2y + 3")
+        assert canonical["key"] == key("2x+3=7")
+        with pytest.raises(ValueError):
+            await pool.run("2x + = ) 7")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
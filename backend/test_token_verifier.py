@@ -0,0 +1,104 @@
+"""
+Tests for the JWKS key cache and the verified-claims cache.
+"""
+import json
+
+import httpx
+import pytest
+
+from app.services.token_verifier import ClaimsCache, JWKSCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_claims_are_served_until_their_exp():
+    clock = FakeClock()
+    cache = ClaimsCache(clock=clock)
+    cache.put("token", {"sub": "user-1", "exp": clock.now + 60})
+
+    assert cache.get("token") == {"sub": "user-1", "exp": clock.now + 60}
+    clock.now += 59
+    assert cache.get("token") is not None
+    clock.now += 1
+    assert cache.get("token") is None
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 0, "size": 0}
+
+
+def test_expired_claims_are_not_cached():
+    clock = FakeClock()
+    cache = ClaimsCache(clock=clock)
+    cache.put("token", {"sub": "user-1", "exp": clock.now - 1})
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_claims_without_exp_expire_after_max_ttl():
+    clock = FakeClock()
+    cache = ClaimsCache(max_ttl=30, clock=clock)
+    cache.put("token", {"sub": "user-1"})
+    clock.now += 29
+    assert cache.get("token") == {"sub": "user-1"}
+    clock.now += 1
+    assert cache.get("token") is None
+
+
+def test_least_recently_used_claims_are_evicted():
+    clock = FakeClock()
+    cache = ClaimsCache(maxsize=2, clock=clock)
+    for token in ("a", "b"):
+        cache.put(token, {"sub": token, "exp": clock.now + 60})
+    cache.get("a")
+    cache.put("c", {"sub": "c", "exp": clock.now + 60})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def rsa_jwk(kid: str) -> dict:
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jwt.algorithms import RSAAlgorithm
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return jwk
+
+
+async def test_unknown_kid_refetches_at_most_once_per_interval():
+    published = {"keys": [rsa_jwk("key-1")]}
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=published)
+
+    cache = JWKSCache("https://auth.example/jwks", refresh_seconds=3600, min_refetch_seconds=0)
+    cache._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        assert (await cache.get_signing_key("key-1")).key_id == "key-1"
+        assert await cache.get_signing_key(None) is not None
+        assert len(requests) == 1
+
+        # Rotation: a token signed by a new key triggers one refetch
+        published = {"keys": [rsa_jwk("key-2")]}
+        assert (await cache.get_signing_key("key-2")).key_id == "key-2"
+        assert len(requests) == 2
+
+        cache.min_refetch_seconds = 3600
+        assert await cache.get_signing_key("key-3") is None
+        assert len(requests) == 2
+        assert cache.stats()["unknown_kid"] == 2
+    finally:
+        await cache.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
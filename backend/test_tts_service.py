@@ -0,0 +1,121 @@
+"""
+Tests for Gemini TTS synthesis running off the event loop.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.repositories.memory_cache_repository import MemoryCacheRepository
+from app.services import tts_service
+from app.services.tts_service import TTSService, get_tts_stats
+
+pytestmark = pytest.mark.skipif(not tts_service.GOOGLE_GENAI_AVAILABLE, reason="google-genai not installed")
+
+
+class BlockingGeminiClient:
+    """Synchronous client whose calls block like the real SDK does."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model, contents, config):
+        time.sleep(self.delay)
+        part = SimpleNamespace(inline_data=SimpleNamespace(data=contents.encode()))
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+def make_service(client) -> TTSService:
+    return TTSService(cache_repo=MemoryCacheRepository(), gemini_client=client)
+
+
+async def test_sync_client_does_not_block_the_event_loop():
+    service = make_service(BlockingGeminiClient(delay=0.2))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticking = asyncio.create_task(ticker())
+    try:
+        pcm = await service.synthesize_pcm_chunk("Plants turn light into sugar.")
+    finally:
+        ticking.cancel()
+    assert pcm == b"Plants turn light into sugar."
+    assert ticks >= 5
+
+
+async def test_synthesis_slots_record_queue_metrics():
+    service = make_service(BlockingGeminiClient())
+    service._semaphore = asyncio.Semaphore(1)
+    before = get_tts_stats()
+
+    await asyncio.gather(*(service.synthesize_pcm_chunk(f"Sentence {i}.") for i in range(3)))
+
+    after = get_tts_stats()
+    assert after["acquired"] - before["acquired"] == 3
+    assert after["max_queued"] >= 2
+    assert after["in_flight"] == before["in_flight"]
+    assert after["queued"] == before["queued"]
+
+
+async def test_cached_chunks_skip_synthesis():
+    client = BlockingGeminiClient()
+    service = make_service(client)
+    await service.synthesize_pcm_chunk("Cached sentence.")
+    before = get_tts_stats()["acquired"]
+    assert await service.synthesize_pcm_chunk("Cached sentence.") == b"Cached sentence."
+    assert get_tts_stats()["acquired"] == before
+
+
+class FailingGeminiClient(BlockingGeminiClient):
+    def generate_content(self, model, contents, config):
+        if "broken" in contents:
+            raise RuntimeError("quota exceeded")
+        return super().generate_content(model, contents, config)
+
+
+def lesson_blocks(count: int):
+    return [f"Block {i} explains one idea in a sentence long enough to be its own chunk." for i in range(count)]
+
+
+async def test_pipelined_stream_bounds_chunks_in_flight(monkeypatch):
+    monkeypatch.setattr(tts_service, "TTS_PIPELINE_WINDOW", 2)
+    service = make_service(BlockingGeminiClient(delay=0.02))
+    peak = 0
+    original = service._generate_pcm
+
+    async def tracked(text, voice_name):
+        nonlocal peak
+        peak = max(peak, get_tts_stats()["in_flight"])
+        return await original(text, voice_name)
+
+    service._generate_pcm = tracked
+    blocks = lesson_blocks(6)
+    stream = await service.open_pipelined_stream(blocks)
+    body = b"".join([chunk async for chunk in stream])
+
+    assert body.endswith(b"".join(block.encode() for block in blocks))
+    assert peak <= 2
+
+
+async def test_pipelined_stream_fails_loudly_after_the_header():
+    service = make_service(FailingGeminiClient(delay=0.0))
+    blocks = lesson_blocks(4)
+    blocks[2] = "This broken block fails to synthesize and must not end the WAV early."
+    before = get_tts_stats()["pipeline_failures"]
+
+    stream = await service.open_pipelined_stream(blocks)
+    with pytest.raises(RuntimeError):
+        async for _ in stream:
+            pass
+    assert get_tts_stats()["pipeline_failures"] == before + 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q", "--no-cov", "-p", "no:cacheprovider"]))
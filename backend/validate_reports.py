@@ -50,7 +50,7 @@ def validate_service_structure():
             '_generate_report',
             '_get_lesson_data',
             '_get_activity_data',
-            '_get_engagement_metrics'
+            '_calculate_engagement_metrics'
         ]
         
         for method in required_methods: